@@ -0,0 +1,132 @@
+"""学生门户及统计接口的异步版本
+
+部署在 ASGI 服务器（如 uvicorn）下时，这些视图在事件循环中执行，等待 SQLite 读取和缓存读写时
+不占用工作线程。响应格式与对应的 DRF 接口一致。
+"""
+import json
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from siqcs_backend.db_router import read_replica
+from .portal import aget_portal_entry, alookup_portal_entry, make_access_token, read_access_token
+from .statistics import acounter_statistics, format_statistics
+from .throttling import (
+    PortalGlobalThrottle, PortalIPThrottle, check_throttles, get_concurrency_semaphore
+)
+
+
+def _json(data, status=200, retry_after=None):
+    response = JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+    if retry_after is not None:
+        response['Retry-After'] = str(retry_after)
+    return response
+
+
+def portal_endpoint(view):
+    """为异步门户视图提供与 DRF 接口相同的令牌桶限流和并发上限"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # 令牌桶保存在数据库中，与其他 ORM 调用一样在同步线程中执行（使用同一个数据库连接）
+        wait = await sync_to_async(check_throttles)(
+            request, [PortalIPThrottle, PortalGlobalThrottle]
+        )
+        if wait is not None:
+            return _json({'detail': '请求过于频繁，请稍后重试'}, status=429, retry_after=wait)
+
+        semaphore = get_concurrency_semaphore('portal')
+        if semaphore is None:
+            return await view(request, *args, **kwargs)
+        if not semaphore.acquire(blocking=False):
+            return _json({'detail': '当前访问人数较多，请稍后重试'}, status=503,
+                         retry_after=settings.CONCURRENCY_RETRY_AFTER)
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            semaphore.release()
+    return wrapper
+
+
+@csrf_exempt
+@require_POST
+@portal_endpoint
+@read_replica
+async def lookup_by_name_and_id_suffix(request):
+    """通过姓名和身份证后6位查询学生信息"""
+    try:
+        data = json.loads(request.body or b'{}')
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return _json({'error': '请求数据格式错误'}, status=400)
+    if not isinstance(data, dict):
+        return _json({'error': '请求数据格式错误'}, status=400)
+
+    name = str(data.get('name', '')).strip()
+    id_suffix = str(data.get('id_suffix', '')).strip()
+
+    if not name or not id_suffix:
+        return _json({'error': '请提供姓名和身份证后6位'}, status=400)
+
+    if len(id_suffix) != 6:
+        return _json({'error': '身份证后6位长度不正确'}, status=400)
+
+    student_ids, entry = await alookup_portal_entry(name, id_suffix)
+
+    if not student_ids:
+        return _json({'error': '未找到匹配的学生信息，请检查姓名和身份证后6位是否正确'}, status=404)
+
+    if len(student_ids) > 1:
+        return _json({'error': '找到多个匹配的学生，请联系管理员'}, status=400)
+
+    return _json({
+        'message': '查询成功',
+        'student': entry['student_summary'],
+        'access_token': make_access_token(entry)
+    })
+
+
+@require_GET
+@portal_endpoint
+async def verify_access(request):
+    """验证访问token并返回学生信息（签名和有效期校验不查询数据库）"""
+    token = request.GET.get('token', '')
+
+    if not token:
+        return _json({'error': '缺少访问token'}, status=400)
+
+    try:
+        payload = read_access_token(token)
+    except signing.SignatureExpired:
+        return _json({'error': '访问token已过期，请重新查询'}, status=403)
+    except signing.BadSignature:
+        return _json({'error': '访问token无效'}, status=403)
+
+    entry = await aget_portal_entry(payload['s'])
+    if entry is None:
+        return _json({'error': '学生信息不存在'}, status=404)
+
+    return _json({
+        'student': entry['student'],
+        'valid': True
+    })
+
+
+@require_GET
+async def student_groups(request, pk):
+    """获取学生的分组信息（读取门户缓存）"""
+    entry = await aget_portal_entry(pk)
+    if entry is None:
+        return _json({'detail': '学生信息不存在'}, status=404)
+
+    return _json({
+        'student': entry['student_summary'],
+        'groups': entry['groups']
+    })
+
+
+@require_GET
+async def student_statistics(request):
+    """获取学生全量统计信息（读取统计计数器表）"""
+    return _json(format_statistics(await acounter_statistics()))
@@ -0,0 +1,159 @@
+import hashlib
+import threading
+from functools import partial, wraps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.response import Response
+from .models import DataVersion
+
+
+# 模型与数据版本名称的对应关系
+MODEL_VERSION_NAMES = {
+    'core.student': 'student',
+    'groups.groupinfo': 'group',
+    'groups.studentgroupassignment': 'assignment',
+}
+
+# 视图缓存默认有效期（秒）；数据变更通过版本号失效，过期时间只用于回收空间
+VIEW_CACHE_TIMEOUT = 24 * 3600
+
+
+def version_names(models):
+    """将模型列表转换为数据版本名称"""
+    return [MODEL_VERSION_NAMES[model._meta.label_lower] for model in models]
+
+
+def get_data_versions(names):
+    """一次查询读取多个数据版本号，返回 {名称: (版本号, 更新时间)}"""
+    versions = {name: (0, None) for name in names}
+    if names:
+        for name, version, updated_at in DataVersion.objects.filter(
+            name__in=names
+        ).values_list('name', 'version', 'updated_at'):
+            versions[name] = (version, updated_at)
+    return versions
+
+
+def _increment_versions(names):
+    now = timezone.now()
+    for name in names:
+        rows = DataVersion.objects.filter(name=name)
+        if not rows.update(version=F('version') + 1, updated_at=now):
+            DataVersion.objects.bulk_create([DataVersion(name=name)], ignore_conflicts=True)
+            rows.update(version=F('version') + 1, updated_at=now)
+
+
+# 各数据库连接已登记、尚未在提交后递增的数据版本名称 {连接别名: set}
+_pending = threading.local()
+
+
+def _pending_names(using):
+    if not hasattr(_pending, 'names'):
+        _pending.names = {}
+    return _pending.names.setdefault(using, set())
+
+
+def _flush_pending_versions(using, names):
+    """提交回调：递增本次登记的名称中尚未递增的部分
+
+    同一事务内多次登记同一名称时，第一个执行的回调递增并移出待递增集合，其余回调跳过。
+    """
+    pending = _pending_names(using)
+    names = sorted(pending.intersection(names))
+    if names:
+        pending.difference_update(names)
+        _increment_versions(names)
+
+
+def bump_versions(*names):
+    """递增数据版本号，使依赖这些数据的缓存在所有工作进程中同时失效
+
+    版本号存放在数据库中，事务提交后才递增，避免其他进程用新版本号缓存未提交前的旧数据；
+    同一事务内的多次调用（如批量导入）合并为提交后的一次递增。
+    每次调用各自登记提交回调：回滚的事务或保存点丢弃其中的回调，不会递增；
+    外层事务中登记的回调不受内层保存点回滚的影响。
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _increment_versions(names)
+        return
+
+    _pending_names(connection.alias).update(names)
+    transaction.on_commit(partial(_flush_pending_versions, connection.alias, names), robust=True)
+
+
+def bump_model_versions(*models):
+    """按模型递增数据版本号"""
+    bump_versions(*version_names(models))
+
+
+def _cache_key(view, request, versions):
+    """缓存键：视图、动作、路径及查询参数、依赖数据的版本号"""
+    query = sorted(request.query_params.lists())
+    raw = f'{request.path}?{query}|' + ','.join(
+        f'{name}={version}' for name, (version, _) in sorted(versions.items())
+    )
+    digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return f'siqcs:view:{view.__class__.__name__}:{view.action}:{digest}'
+
+
+def cached_response(view, request, producer, models=None):
+    """读穿缓存：命中时直接返回缓存内容，否则调用 producer 生成响应并写入缓存
+
+    models 为响应依赖的数据表，默认取视图集的 conditional_models；传入空列表表示与数据无关。
+    """
+    models = view.conditional_models if models is None else models
+    versions = get_request_versions(request, version_names(models))
+    key = _cache_key(view, request, versions)
+
+    cached = cache.get(key)
+    if cached is not None:
+        kind, payload = cached
+        if kind == 'data':
+            return Response(payload)
+        content, content_type, headers = payload
+        response = HttpResponse(content, content_type=content_type)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    response = producer()
+    if response.status_code == 200:
+        if isinstance(response, Response):
+            cache.set(key, ('data', response.data), VIEW_CACHE_TIMEOUT)
+        elif isinstance(response, HttpResponse) and not response.streaming:
+            headers = {
+                header: response[header]
+                for header in ('Content-Disposition',) if response.has_header(header)
+            }
+            cache.set(key, ('raw', (response.content, response['Content-Type'], headers)), VIEW_CACHE_TIMEOUT)
+    return response
+
+
+def get_request_versions(request, names):
+    """读取数据版本号，同一请求内只查询一次"""
+    versions = getattr(request, '_data_versions', None)
+    if versions is None or not set(names) <= set(versions):
+        versions = get_data_versions(names)
+        request._data_versions = versions
+    return {name: versions[name] for name in names}
+
+
+def cached_action(view_method=None, models=None):
+    """视图集动作的读穿缓存装饰器，可用 @cached_action 或 @cached_action(models=[...])"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return method(self, request, *args, **kwargs)
+            return cached_response(
+                self, request, lambda: method(self, request, *args, **kwargs), models=models
+            )
+        return wrapper
+
+    if view_method is not None:
+        return decorator(view_method)
+    return decorator
@@ -0,0 +1,86 @@
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .cache import cached_response, get_data_versions, get_request_versions, version_names
+
+
+def get_table_validators(models, request=None):
+    """根据各表的数据版本号生成 (ETag, Last-Modified)
+
+    数据版本号在保存、删除及批量操作时递增，一次主键查询即可读取，与表中数据量无关。
+    传入 request 时与读穿缓存共用同一次版本号查询，并把请求路径、排序后的查询参数及协商得到的媒体类型
+    计入 ETag：同一数据版本下不同页码、过滤条件或响应格式（JSON / 紧凑格式 / MessagePack）的响应各有不同的校验值。
+    """
+    names = version_names(models)
+    if request is not None:
+        versions = get_request_versions(request, names)
+    else:
+        versions = get_data_versions(names)
+
+    parts = [f"{name}:{version}" for name, (version, _) in sorted(versions.items())]
+    if request is not None:
+        query = urlencode(sorted(request.GET.lists()), doseq=True)
+        parts.append(f"{request.path}?{query}")
+        parts.append(getattr(request, 'accepted_media_type', '') or '')
+    timestamps = [updated_at for _, updated_at in versions.values() if updated_at]
+
+    etag = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    last_modified = max(timestamps) if timestamps else None
+    return quote_etag(etag), last_modified
+
+
+def conditional_get(view_method):
+    """为视图集动作提供条件请求支持（If-None-Match / If-Modified-Since）
+
+    校验值来自视图集 conditional_models 声明的数据表，命中时直接返回304，
+    不执行业务查询，也不进行序列化。
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_method(self, request, *args, **kwargs)
+
+        etag, last_modified = get_table_validators(self.conditional_models, request)
+        last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified_ts
+        )
+        if not_modified is not None:
+            patch_cache_control(not_modified, private=True, no_cache=True)
+            return not_modified
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified_ts is not None:
+                response['Last-Modified'] = http_date(last_modified_ts)
+            # 要求客户端每次都携带校验值重新验证
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """为列表和详情接口提供 ETag / Last-Modified 条件请求支持"""
+
+    # 响应内容依赖的数据表，任一表变化都会使校验值和缓存失效
+    conditional_models = []
+    # 启用读穿缓存的动作（'list' / 'retrieve'）
+    cached_actions = []
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        return self._maybe_cached(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return self._maybe_cached(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
+
+    def _maybe_cached(self, request, producer):
+        if self.action in self.cached_actions:
+            return cached_response(self, request, producer)
+        return producer()
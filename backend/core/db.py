@@ -0,0 +1,70 @@
+import random
+import time
+from functools import wraps
+from django.db import OperationalError, transaction
+
+
+# 数据库被锁定时的重试次数及退避时间（秒）
+LOCK_RETRY_ATTEMPTS = 5
+LOCK_RETRY_BASE_DELAY = 0.05
+LOCK_RETRY_MAX_DELAY = 1.0
+
+# IN 查询每块的值个数（低于旧版 SQLite 每条语句 999 个参数的上限），core 与 groups 共用
+LOOKUP_CHUNK_SIZE = 500
+
+
+def chunked(values, size=LOOKUP_CHUNK_SIZE):
+    """将值集合分块，用于 IN 查询"""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def is_locked_error(exc):
+    """判断是否为 SQLite 锁冲突（database is locked / database table is locked）"""
+    return isinstance(exc, OperationalError) and 'locked' in str(exc).lower()
+
+
+def retry_on_locked(func=None, *, attempts=LOCK_RETRY_ATTEMPTS,
+                    base_delay=LOCK_RETRY_BASE_DELAY, max_delay=LOCK_RETRY_MAX_DELAY):
+    """写操作遇到 SQLite 锁冲突时按指数退避（带随机抖动）整体重试
+
+    只在最外层事务之外重试：被包装的函数应当是一个完整的事务（或单条保存），
+    已处于 atomic 块中时锁冲突会使外层事务失效，此时直接抛出，由外层处理。
+    可用 @retry_on_locked 或 @retry_on_locked(attempts=...)。
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if transaction.get_connection().in_atomic_block:
+                return func(*args, **kwargs)
+
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    if not is_locked_error(e) or attempt == attempts - 1:
+                        raise
+                    delay = min(max_delay, base_delay * (2 ** attempt))
+                    time.sleep(delay / 2 + random.uniform(0, delay / 2))
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+class RetryOnLockedMixin:
+    """视图集的创建、更新、删除遇到 SQLite 锁冲突时自动重试"""
+
+    @retry_on_locked
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+
+    @retry_on_locked
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+    @retry_on_locked
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
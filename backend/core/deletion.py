@@ -0,0 +1,164 @@
+"""分块批量删除
+
+Django 的级联删除会把所有关联的分组分配读入内存再分批删除，并在一个事务中完成，
+删除全部学生时会长时间占用 SQLite 写锁。这里按主键顺序每次取一块对象，
+在各自的短事务中先用集合化的 DELETE 删除依赖的分配记录，再删除对象本身，
+同时写入删除记录、扣减统计计数器并删除门户缓存。
+
+每块对象用 Django 的 QuerySet.delete() 删除（绕过模型查询集上记录删除记录的 delete()，
+这些工作已在这里完成），因此之后新增的反向关联同样会按 on_delete 级联处理。
+
+返回值与 QuerySet.delete() 相同：(删除总数, {模型标签: 删除数量})，数量来自 DELETE 语句本身。
+progress 回调在每块提交后以当前的 {模型标签: 累计删除数量} 调用，用于报告进度（见 DeletionProgress）。
+"""
+from collections import Counter, defaultdict
+from django.db import transaction
+from .db import retry_on_locked
+from .models import Student, Tombstone
+
+
+# 每个事务删除的对象数量
+DELETE_CHUNK_SIZE = 1000
+
+
+class DeletionProgress:
+    """记录每块提交时新删除数量的 progress 回调，供接口返回删除进度
+
+    fields 为 {模型: 字段名}；totals 为 {字段名: 累计删除数量}，chunks 为每次提交的 {字段名: 删除数量}。
+    块之间互不回滚，中途失败时 totals 即已经删除的数量。
+    """
+
+    def __init__(self, fields):
+        self.fields = {model._meta.label: name for model, name in fields.items()}
+        self.totals = dict.fromkeys(self.fields.values(), 0)
+        self.chunks = []
+
+    def __call__(self, counts):
+        totals = {name: counts.get(label, 0) for label, name in self.fields.items()}
+        self.chunks.append({name: totals[name] - self.totals[name] for name in totals})
+        self.totals = totals
+
+
+def _delete(model, pks):
+    """用 QuerySet.delete() 删除一块对象（_base_manager 的查询集不含自定义的 delete()），返回 {模型标签: 删除数量}"""
+    deleted, counts = model._base_manager.filter(pk__in=pks).delete()
+    return Counter(counts)
+
+
+def _nonzero(counts):
+    return {label: count for label, count in counts.items() if count}
+
+
+def _finish(counts):
+    counts = _nonzero(counts)
+    return sum(counts.values()), counts
+
+
+@retry_on_locked
+def _delete_student_chunk(queryset, last_id, chunk_size):
+    """删除主键大于 last_id 的一块学生及其分组分配，返回 (本块最大ID, 删除数量)"""
+    from groups.models import StudentGroupAssignment
+    from .portal import invalidate_portal_entries
+    from .statistics import TRACKED_FIELDS, apply_deltas, merge_deltas, row_deltas
+
+    counts = Counter()
+    with transaction.atomic():
+        rows = list(
+            queryset.filter(pk__gt=last_id).order_by('pk').values('pk', *TRACKED_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return None, counts
+        student_ids = [row['pk'] for row in rows]
+
+        assignment_ids = list(
+            StudentGroupAssignment.objects.filter(student_id__in=student_ids).values_list('id', flat=True)
+        )
+        Tombstone.record('assignment', assignment_ids)
+        counts.update(_delete(StudentGroupAssignment, assignment_ids))
+
+        Tombstone.record('student', student_ids)
+        counts.update(_delete(Student, student_ids))
+
+        deltas = defaultdict(Counter)
+        for row in rows:
+            merge_deltas(deltas, row_deltas(row, sign=-1))
+        apply_deltas(deltas)
+        invalidate_portal_entries(student_ids)
+    return student_ids[-1], counts
+
+
+def delete_students(queryset, chunk_size=DELETE_CHUNK_SIZE, progress=None):
+    """分块删除学生及其分组分配"""
+    totals = Counter()
+    last_id = 0
+    while True:
+        last_id, counts = _delete_student_chunk(queryset, last_id, chunk_size)
+        if last_id is None:
+            return _finish(totals)
+        totals.update(counts)
+        if progress:
+            progress(_nonzero(totals))
+
+
+def _delete_group_assignments(group_ids, limit=None):
+    """删除指定分组下的分配记录（最多 limit 条），返回删除数量"""
+    from groups.models import StudentGroupAssignment
+    from .portal import invalidate_portal_entries
+
+    rows = StudentGroupAssignment.objects.filter(group_info_id__in=group_ids).order_by('pk').values_list(
+        'pk', 'student_id'
+    )
+    rows = list(rows[:limit] if limit else rows)
+    if not rows:
+        return 0
+    assignment_ids = [assignment_id for assignment_id, student_id in rows]
+    Tombstone.record('assignment', assignment_ids)
+    invalidate_portal_entries({student_id for assignment_id, student_id in rows})
+    return _delete(StudentGroupAssignment, assignment_ids)[StudentGroupAssignment._meta.label]
+
+
+@retry_on_locked
+def _delete_assignment_chunk(group_ids, chunk_size):
+    """删除指定分组下的一块分配记录，返回删除数量"""
+    with transaction.atomic():
+        return _delete_group_assignments(group_ids, limit=chunk_size)
+
+
+@retry_on_locked
+def _delete_group_chunk(group_ids):
+    """删除一块分组，返回 (分组删除数量, 期间新增而一并删除的分配记录数量)"""
+    from groups.models import GroupInfo
+
+    with transaction.atomic():
+        assignment_count = _delete_group_assignments(group_ids)
+        Tombstone.record('group', group_ids)
+        return _delete(GroupInfo, group_ids)[GroupInfo._meta.label], assignment_count
+
+
+def delete_groups(queryset, chunk_size=DELETE_CHUNK_SIZE, progress=None):
+    """分块删除分组：先分块删除分组下的分配记录，再删除分组本身"""
+    from groups.models import GroupInfo, StudentGroupAssignment
+
+    totals = Counter()
+    last_id = 0
+    while True:
+        group_ids = list(
+            queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not group_ids:
+            return _finish(totals)
+        last_id = group_ids[-1]
+
+        while True:
+            deleted = _delete_assignment_chunk(group_ids, chunk_size)
+            if not deleted:
+                break
+            totals[StudentGroupAssignment._meta.label] += deleted
+            if progress:
+                progress(_nonzero(totals))
+
+        group_count, assignment_count = _delete_group_chunk(group_ids)
+        totals[GroupInfo._meta.label] += group_count
+        totals[StudentGroupAssignment._meta.label] += assignment_count
+        if progress:
+            progress(_nonzero(totals))
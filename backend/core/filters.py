@@ -0,0 +1,65 @@
+import re
+from datetime import datetime, time, timezone as dt_timezone
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+
+# Unix 时间戳须为10位及以上的秒数（2001年以后），避免把 2024、20240101 这类日期误读为1970年的秒数
+UNIX_TIMESTAMP_PATTERN = re.compile(r'\d{10,}(\.\d+)?')
+
+
+# 布尔查询参数视为真的取值（不区分大小写）
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def parse_bool_param(request, name):
+    """读取布尔查询参数，如 ?partial_success=1；缺省或其他取值为 False"""
+    return request.query_params.get(name, '').lower() in TRUE_VALUES
+
+
+def parse_timestamp(value, param='updated_since'):
+    """解析时间参数，支持 ISO 8601 日期时间、日期（当天零点，本地时区）或 Unix 时间戳"""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            if parsed_date is not None:
+                parsed = datetime.combine(parsed_date, time.min)
+    except ValueError:
+        parsed = None
+
+    if parsed is None and UNIX_TIMESTAMP_PATTERN.fullmatch(value):
+        try:
+            return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            pass
+
+    if parsed is None:
+        raise serializers.ValidationError({
+            param: '时间格式不正确，请使用ISO 8601日期时间（如 2025-08-01T08:00:00+08:00）、'
+                   '日期（如 2025-08-01）或10位以上的Unix时间戳'
+        })
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class UpdatedSinceFilter(BaseFilterBackend):
+    """增量同步过滤器：?updated_since=<时间> 只返回此后变更的记录
+
+    视图可通过 updated_since_field 指定比较的时间字段，默认为 updated_at。
+    边界时间点的记录会被包含在内，客户端按ID去重即可。
+    """
+
+    query_param = 'updated_since'
+
+    def filter_queryset(self, request, queryset, view):
+        value = request.query_params.get(self.query_param)
+        if not value:
+            return queryset
+
+        field = getattr(view, 'updated_since_field', 'updated_at')
+        return queryset.filter(**{f'{field}__gte': parse_timestamp(value, self.query_param)})
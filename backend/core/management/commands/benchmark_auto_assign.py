@@ -0,0 +1,51 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from groups.auto_assign import plan_assignment
+
+
+class Command(BaseCommand):
+    """测量自动分组方案计算耗时随学生数 × 分组数的变化，并输出均衡程度
+
+    使用随机生成的分层编号和容量，不访问数据库，只衡量分配算法本身；
+    均衡程度为各分组中第一层学生占比与总体占比的最大偏差。
+    """
+
+    help = '自动分组算法基准测试（学生数 × 分组数）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, nargs='+', default=[5000, 20000, 100000],
+                            help='学生数量')
+        parser.add_argument('--groups', type=int, nargs='+', default=[50, 400, 2000], help='分组数量')
+        parser.add_argument('--strata', type=int, default=12, help='分层数量（均衡维度取值组合数）')
+        parser.add_argument('--repeat', type=int, default=5, help='每种规模的重复次数，取中位数')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        for student_count in options['students']:
+            for group_count in options['groups']:
+                strata = rng.integers(0, options['strata'], student_count)
+                current = rng.integers(0, 5, group_count)
+                # 总容量约为学生数的 1.1 倍
+                average = max(1, int(student_count * 1.1 / group_count))
+                remaining = rng.integers(average // 2, average * 3 // 2 + 1, group_count)
+
+                timings = []
+                for seed in range(options['repeat']):
+                    started = time.perf_counter()
+                    plan = plan_assignment(strata, current, remaining, seed)
+                    timings.append(time.perf_counter() - started)
+
+                assigned = plan >= 0
+                added = np.bincount(plan[assigned], minlength=group_count)
+                first = np.bincount(plan[assigned & (strata == 0)], minlength=group_count)
+                overall = first.sum() / max(assigned.sum(), 1)
+                share = first[added > 0] / added[added > 0]
+                deviation = np.abs(share - overall).max() if len(share) else 0.0
+
+                self.stdout.write(
+                    f'{student_count:>8} 名学生 × {group_count:>5} 个分组  '
+                    f'中位数 {np.median(timings) * 1000:8.1f}ms  '
+                    f'已分配 {int(assigned.sum()):>8}  超出容量 {int((added > remaining).sum())}  '
+                    f'第一层占比最大偏差 {deviation:.3f}（平均每组 {added.mean():.1f} 人）'
+                )
@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.cache import get_data_versions
+from core.models import Student
+from core.statistics import _distribution_counts, distribution_statistics, rebuild_counters
+
+
+CACHE_KEY = 'siqcs:benchmark:distributions'
+
+
+class Command(BaseCommand):
+    """测量分布统计的耗时随学生数的变化
+
+    在事务中批量生成测试学生并重建计数器，逐级扩大数据量后分别测量无过滤参数时读取联合计数行、
+    读取+NumPy 计算（未命中缓存），带过滤参数时的分组计数查询+计算（以全部学生为过滤结果，即最坏情况）
+    以及命中缓存（读取数据版本号 + 读取缓存）的耗时，结束时回滚并删除临时缓存，不会留下测试数据。
+    """
+
+    help = '身高、体重、BMI、年龄分布统计耗时基准测试（测试数据在结束时回滚）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000],
+                            help='逐级生成的测试学生数量')
+        parser.add_argument('--repeat', type=int, default=5, help='每级数据量的重复次数，取中位数')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        created = 0
+
+        with transaction.atomic():
+            for size in sorted(options['sizes']):
+                self._create_students(rng, created, size)
+                created = max(created, size)
+                # bulk_create 不维护计数器，这里整体重建（不计入耗时）
+                rebuild_counters()
+
+                queryset = Student.objects.all()
+                load = self._measure(options['repeat'], _distribution_counts)
+                total = self._measure(options['repeat'], distribution_statistics)
+                filtered = self._measure(options['repeat'], lambda: distribution_statistics(queryset))
+
+                cache.set(CACHE_KEY, distribution_statistics())
+                hit = self._measure(options['repeat'], lambda: (get_data_versions(['student']), cache.get(CACHE_KEY)))
+                cache.delete(CACHE_KEY)
+
+                self.stdout.write(
+                    f'{created:>8} 名测试学生  读取计数行 中位数 {load:7.1f}ms  '
+                    f'读取+计算 中位数 {total:7.1f}ms  带过滤（分组计数）中位数 {filtered:8.1f}ms  '
+                    f'命中缓存 中位数 {hit:6.2f}ms'
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('基准测试完成，测试数据已回滚'))
+
+    @staticmethod
+    def _create_students(rng, start, stop):
+        for offset in range(start, stop, 5000):
+            students = []
+            for n in range(offset, min(offset + 5000, stop)):
+                filled = rng.random() < 0.7
+                students.append(Student(
+                    name=f'基准测试{n}',
+                    id_card_number=f'{900000 + n // 1000:06d}{2005 + n % 3}{n % 12 + 1:02d}{n % 28 + 1:02d}{n % 1000:03d}X',
+                    notification_number=f'BENCH{n}',
+                    gender='MF'[n % 2],
+                    residence_status=rng.choice(['RESIDENT', 'NON_RESIDENT', 'UNKNOWN']),
+                    height=rng.randint(150, 190) if filled else None,
+                    weight=rng.randint(40, 90) if filled else None,
+                    import_batch='__benchmark__',
+                ))
+            Student.objects.bulk_create(students)
+
+    @staticmethod
+    def _measure(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """对运行中的服务做并发压测，输出每秒请求数及延迟分位数
+
+    用于比较同一接口在 WSGI（gunicorn）和 ASGI（uvicorn）部署下的表现，例如：
+    python manage.py benchmark_http --url http://127.0.0.1:8000/api/students/statistics/
+    python manage.py benchmark_http --url http://127.0.0.1:8001/api/async/students/statistics/
+    """
+
+    help = 'HTTP并发压测（请求数/秒、P50/P99延迟）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', required=True, help='压测地址（仅支持 http）')
+        parser.add_argument('--concurrency', type=int, default=500, help='并发客户端数量')
+        parser.add_argument('--requests', type=int, default=5000, help='请求总数')
+        parser.add_argument('--timeout', type=float, default=30, help='单个请求超时秒数')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('仅支持 http:// 开头的完整地址')
+
+        latencies, statuses, elapsed = asyncio.run(self._run(url, options))
+
+        latencies.sort()
+        total = len(latencies)
+        if not total:
+            raise CommandError('没有完成任何请求')
+
+        def percentile(p):
+            return latencies[min(total - 1, int(total * p))] * 1000
+
+        self.stdout.write(f"地址 {options['url']}，并发 {options['concurrency']}，请求 {total}")
+        self.stdout.write(f'吞吐量 {total / elapsed:.1f} 请求/秒，用时 {elapsed:.2f} 秒')
+        self.stdout.write(f'延迟 P50 {percentile(0.5):.1f}ms / P95 {percentile(0.95):.1f}ms / P99 {percentile(0.99):.1f}ms')
+        self.stdout.write('状态码 ' + ', '.join(f'{code}: {count}' for code, count in sorted(statuses.items())))
+
+    async def _run(self, url, options):
+        path = url.path or '/'
+        if url.query:
+            path += '?' + url.query
+        request = (
+            f'GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n'
+            f'Accept: application/json\r\nConnection: close\r\n\r\n'
+        ).encode()
+
+        queue = asyncio.Queue()
+        for _ in range(options['requests']):
+            queue.put_nowait(None)
+
+        latencies = []
+        statuses = Counter()
+
+        async def client():
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(
+                        self._fetch(url.hostname, url.port or 80, request), options['timeout']
+                    )
+                except (OSError, asyncio.TimeoutError) as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        return latencies, statuses, time.perf_counter() - started
+
+    @staticmethod
+    async def _fetch(host, port, request):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
@@ -0,0 +1,125 @@
+import statistics
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from core.models import Student
+from core.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from core.serializers import StudentListSerializer
+from groups.auto_assign import plan_assignment, summarize_plan
+from groups.models import GroupInfo, StudentGroupAssignment
+from groups.serializers import StudentGroupAssignmentSerializer
+
+
+class Command(BaseCommand):
+    """比较各渲染器对学生列表、分配列表和自动分组预览响应的编码耗时和字节数
+
+    响应数据由序列化器对内存中构造的对象生成，不访问数据库，只衡量编码本身。
+    """
+
+    help = '响应渲染器基准测试（JSON / orjson / MessagePack）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='学生列表、分配列表的条数')
+        parser.add_argument('--groups', type=int, default=400, help='自动分组预览的分组数量')
+        parser.add_argument('--students', type=int, default=20000, help='自动分组预览的学生数量')
+        parser.add_argument('--repeat', type=int, default=20, help='每种组合的重复次数，取中位数')
+
+    def handle(self, *args, **options):
+        renderers = [('JSONRenderer', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('FastJSONRenderer(orjson)', FastJSONRenderer()))
+        else:
+            self.stdout.write(self.style.WARNING('未安装 orjson，FastJSONRenderer 与 JSONRenderer 相同，跳过'))
+        if msgpack is not None:
+            renderers.append(('MessagePackRenderer', MessagePackRenderer()))
+        else:
+            self.stdout.write(self.style.WARNING('未安装 msgpack，跳过 MessagePackRenderer'))
+
+        students = self._students(options['rows'])
+        groups = self._groups(options['groups'])
+        payloads = [
+            ('学生列表', self._page(StudentListSerializer(students, many=True).data)),
+            ('分配列表', self._page(StudentGroupAssignmentSerializer(
+                self._assignments(students, groups), many=True
+            ).data)),
+            ('自动分组预览', self._preview(options['students'], groups)),
+        ]
+
+        for payload_name, data in payloads:
+            self.stdout.write(f'{payload_name}：')
+            baseline = None
+            for renderer_name, renderer in renderers:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    content = renderer.render(data, renderer.media_type, {})
+                    timings.append(time.perf_counter() - started)
+                elapsed = statistics.median(timings)
+                baseline = baseline or elapsed
+                self.stdout.write(
+                    f'  {renderer_name:<26} 中位数 {elapsed * 1000:8.2f}ms  '
+                    f'{len(content):>10} 字节  相对标准库 {baseline / elapsed:5.1f}x'
+                )
+
+    @staticmethod
+    def _page(results):
+        return {'count': len(results), 'next': None, 'previous': None, 'results': results}
+
+    @staticmethod
+    def _students(count):
+        now = timezone.now()
+        students = []
+        for i in range(count):
+            student = Student(
+                id=i + 1, name=f'基准测试{i}', id_card_number=f'110101200{i % 10}0101{i % 1000:03d}X',
+                notification_number=f'B{i:08d}', import_batch='2025级', created_at=now, updated_at=now,
+            )
+            if i % 2:
+                student.residence_status = 'RESIDENT'
+                student.height, student.weight, student.uniform_purchase = 160 + i % 30, 50 + i % 25, True
+            student.derive_fields()
+            students.append(student)
+        return students
+
+    @staticmethod
+    def _groups(count):
+        now = timezone.now()
+        groups = []
+        for i in range(count):
+            group = GroupInfo(
+                id=i + 1, group_name=f'第{i + 1}组', group_teacher=f'教师{i}', teacher_phone='13800000000',
+                report_location=f'教学楼{i % 10}01', capacity=60, created_at=now, updated_at=now,
+            )
+            group.student_count = 50
+            groups.append(group)
+        return groups
+
+    @staticmethod
+    def _assignments(students, groups):
+        now = timezone.now()
+        return [
+            StudentGroupAssignment(
+                id=index + 1, student=student, group_info=groups[index % len(groups)],
+                assigned_at=now, updated_at=now, remarks='自动分配',
+            )
+            for index, student in enumerate(students)
+        ]
+
+    @staticmethod
+    def _preview(student_count, groups):
+        rng = np.random.default_rng(0)
+        genders = rng.choice(['M', 'F'], student_count)
+        residences = rng.choice(['RESIDENT', 'NON_RESIDENT'], student_count)
+        strata = np.unique(np.char.add(genders, residences), return_inverse=True)[1]
+        current = np.zeros(len(groups), dtype=np.int64)
+        remaining = np.full(len(groups), student_count, dtype=np.int64)
+        plan = {
+            'student_ids': np.arange(1, student_count + 1),
+            'group_indexes': plan_assignment(strata, current, remaining, seed=0),
+            'values': {'gender': genders.tolist(), 'residence_status': residences.tolist()},
+            'groups': groups,
+            'current': current,
+        }
+        return {'seed': 0, 'dry_run': True, **summarize_plan(plan)}
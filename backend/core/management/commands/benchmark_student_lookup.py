@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import Student
+
+
+class Command(BaseCommand):
+    """测量学生门户按姓名+身份证后6位查询的延迟随数据量的变化
+
+    在事务中批量生成测试学生，逐级扩大数据量后分别测量联合索引查询和原有的
+    exists/count/first + endswith 查询，结束时回滚，不会留下测试数据。
+    """
+
+    help = '学生姓名+身份证后6位查询延迟基准测试（测试数据在结束时回滚）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                            help='逐级生成的测试学生数量')
+        parser.add_argument('--lookups', type=int, default=200, help='每级数据量的查询次数')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        created = 0
+
+        with transaction.atomic():
+            for size in sorted(options['sizes']):
+                self._create_students(created, size)
+                created = max(created, size)
+
+                samples = [self._sample(rng, created) for _ in range(options['lookups'])]
+                indexed = self._measure(samples, self._indexed_lookup)
+                legacy = self._measure(samples, self._legacy_lookup)
+                self.stdout.write(
+                    f'{created:>8} 名测试学生  '
+                    f'联合索引 中位数 {indexed[0]:.3f}ms / P95 {indexed[1]:.3f}ms  '
+                    f'原查询 中位数 {legacy[0]:.3f}ms / P95 {legacy[1]:.3f}ms'
+                )
+
+            name, id_suffix = self._sample(rng, created)
+            self.stdout.write('查询计划：')
+            self.stdout.write(Student.objects.by_name_and_id_suffix(name, id_suffix).order_by().values('id')[:2].explain())
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('基准测试完成，测试数据已回滚'))
+
+    @staticmethod
+    def _id_card(n):
+        return f'9{n:016d}X'
+
+    @staticmethod
+    def _name(n):
+        return f'基准测试{n % 5000}'
+
+    def _create_students(self, start, stop):
+        for offset in range(start, stop, 5000):
+            Student.objects.bulk_create([
+                Student(
+                    name=self._name(n),
+                    id_card_number=self._id_card(n),
+                    id_suffix=self._id_card(n)[-6:],
+                    notification_number=f'BENCH{n}',
+                    gender='M',
+                    import_batch='__benchmark__',
+                )
+                for n in range(offset, min(offset + 5000, stop))
+            ])
+
+    def _sample(self, rng, count):
+        n = rng.randrange(count)
+        return self._name(n), self._id_card(n)[-6:]
+
+    @staticmethod
+    def _indexed_lookup(name, id_suffix):
+        return list(Student.objects.by_name_and_id_suffix(name, id_suffix).order_by().values_list('id', flat=True)[:2])
+
+    @staticmethod
+    def _legacy_lookup(name, id_suffix):
+        students = Student.objects.filter(name=name, id_card_number__endswith=id_suffix)
+        if students.exists() and students.count() == 1:
+            return students.first()
+        return None
+
+    @staticmethod
+    def _measure(samples, lookup):
+        timings = []
+        for name, id_suffix in samples:
+            started = time.perf_counter()
+            lookup(name, id_suffix)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
@@ -0,0 +1,56 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.deletion import DELETE_CHUNK_SIZE
+from core.models import Student
+from groups.models import GroupInfo
+
+
+class Command(BaseCommand):
+    """分块删除大量学生或分组（含分配记录），每块一个短事务并输出进度
+
+    删除期间其他写请求只需等待单个块的事务，例如：
+    python manage.py bulk_delete students --batch 2025级
+    python manage.py bulk_delete groups --all
+    """
+
+    help = '分块删除学生或分组并输出进度'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=['students', 'groups'], help='删除学生或分组')
+        parser.add_argument('--batch', action='append', dest='batches', default=[],
+                            help='只删除指定导入批次的学生，可重复指定')
+        parser.add_argument('--all', action='store_true', help='删除全部')
+        parser.add_argument('--chunk-size', type=int, default=DELETE_CHUNK_SIZE, help='每个事务删除的数量')
+
+    def handle(self, *args, **options):
+        if options['target'] == 'students':
+            if options['batches']:
+                queryset = Student.objects.filter(import_batch__in=options['batches'])
+            elif options['all']:
+                queryset = Student.objects.all()
+            else:
+                raise CommandError('请指定 --batch 或 --all')
+        else:
+            if options['batches']:
+                raise CommandError('--batch 只用于删除学生')
+            if not options['all']:
+                raise CommandError('删除分组请指定 --all')
+            queryset = GroupInfo.objects.all()
+
+        started = time.perf_counter()
+
+        def progress(counts):
+            self.stdout.write(f'{time.perf_counter() - started:7.1f}s  ' + self._format(counts))
+
+        deleted, counts = queryset.delete_in_chunks(chunk_size=options['chunk_size'], progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'共删除 {deleted} 条记录（{self._format(counts)}），用时 {elapsed:.1f} 秒'))
+
+    @staticmethod
+    def _format(counts):
+        labels = {
+            Student._meta.label: '学生',
+            GroupInfo._meta.label: '分组',
+            'groups.StudentGroupAssignment': '分配记录',
+        }
+        return '，'.join(f'{labels[label]} {count}' for label, count in counts.items()) or '无'
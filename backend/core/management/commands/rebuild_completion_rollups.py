@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.statistics import rebuild_completion_rollups
+
+
+class Command(BaseCommand):
+    """根据学生的资料完成时间重建按小时、按天的完成情况汇总表"""
+
+    help = '重建资料完成时间序列汇总表'
+
+    def handle(self, *args, **options):
+        count = rebuild_completion_rollups()
+        self.stdout.write(self.style.SUCCESS(f'已重建 {count} 条汇总记录'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from core.statistics import rebuild_counters
+
+
+class Command(BaseCommand):
+    """根据学生表重算统计计数器，修正增量维护中可能出现的偏差（建议定时执行）"""
+
+    help = '重新计算学生统计计数器并报告偏差'
+
+    def handle(self, *args, **options):
+        drift = rebuild_counters()
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('统计计数器与学生数据一致'))
+            return
+
+        for item in drift:
+            self.stdout.write(
+                f"{item['dimension']}={item['key']} {item['field']}: "
+                f"计数器 {item['actual']} -> 实际 {item['expected']}"
+            )
+        self.stdout.write(self.style.WARNING(f'已修正 {len(drift)} 处偏差'))
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from core.models import Student
+from core.services import StudentImportService
+
+
+STRESS_PORTAL_BATCH = '__stress_portal__'
+STRESS_IMPORT_BATCH = '__stress_import__'
+
+
+class Command(BaseCommand):
+    """SQLite 并发写入压力测试：Excel 导入进行期间，多个线程同时模拟学生完善资料
+
+    用于验证 WAL、busy_timeout 及锁冲突重试配置，测试数据在结束时删除。
+    """
+
+    help = 'SQLite并发写入压力测试（导入 + 并发完善资料）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=200, help='并发完善资料的线程数')
+        parser.add_argument('--import-size', type=int, default=2000, help='同时导入的学生数量')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('该命令仅用于 SQLite 数据库')
+        if Student.objects.filter(import_batch__in=[STRESS_PORTAL_BATCH, STRESS_IMPORT_BATCH]).exists():
+            raise CommandError('存在上次压测遗留的数据，请先删除测试批次')
+
+        writers = options['writers']
+        student_ids = self._create_portal_students(writers)
+        import_file = self._write_import_file(options['import_size'])
+
+        errors = []
+        latencies = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(writers + 1)
+
+        def run_import():
+            barrier.wait()
+            try:
+                result = StudentImportService().import_students_from_excel(import_file, STRESS_IMPORT_BATCH)
+                if not result['success']:
+                    with lock:
+                        errors.append(f"导入失败: {result['error']}")
+                return result
+            finally:
+                connections.close_all()
+
+        def complete_profile(index, student_id):
+            barrier.wait()
+            started = time.perf_counter()
+            try:
+                student = Student.objects.get(pk=student_id)
+                student.height = 150 + index % 40
+                student.weight = 40 + index % 30
+                student.residence_status = 'RESIDENT'
+                student.uniform_purchase = True
+                student.save()
+            except Exception as e:
+                with lock:
+                    errors.append(f'学生 {student_id}: {e}')
+            finally:
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                connections.close_all()
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=writers + 1) as executor:
+                import_future = executor.submit(run_import)
+                for index, student_id in enumerate(student_ids):
+                    executor.submit(complete_profile, index, student_id)
+                import_result = import_future.result()
+            elapsed = time.perf_counter() - started
+
+            latencies.sort()
+            completed = Student.objects.filter(import_batch=STRESS_PORTAL_BATCH, info_status='COMPLETE').count()
+            self.stdout.write(f"导入 {import_result['success_count']} 名学生，用时 {elapsed:.2f} 秒")
+            self.stdout.write(
+                f'{writers} 个并发写入完成 {completed} 个，延迟 P50 {latencies[len(latencies) // 2] * 1000:.0f}ms'
+                f' / 最大 {latencies[-1] * 1000:.0f}ms'
+            )
+        finally:
+            os.unlink(import_file)
+            Student.objects.filter(import_batch__in=[STRESS_PORTAL_BATCH, STRESS_IMPORT_BATCH]).delete()
+
+        if errors:
+            for error in errors[:20]:
+                self.stdout.write(self.style.ERROR(error))
+            raise CommandError(f'出现 {len(errors)} 个错误')
+        self.stdout.write(self.style.SUCCESS('没有出现锁冲突错误，测试数据已删除'))
+
+    def _create_portal_students(self, count):
+        students = []
+        for n in range(count):
+            student = Student(
+                name=f'压测学生{n}',
+                id_card_number=f'8{n:016d}X',
+                notification_number=f'STRESS-P{n}',
+                import_batch=STRESS_PORTAL_BATCH,
+            )
+            student.save()
+            students.append(student.id)
+        return students
+
+    def _write_import_file(self, count):
+        df = pd.DataFrame({
+            '姓名': [f'压测导入{n}' for n in range(count)],
+            '身份证号': [f'7{n:016d}X' for n in range(count)],
+            '通知书编号': [f'STRESS-I{n}' for n in range(count)],
+        })
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
+            path = temp_file.name
+        df.to_excel(path, index=False)
+        return path
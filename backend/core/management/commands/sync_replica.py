@@ -0,0 +1,45 @@
+import sqlite3
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from siqcs_backend.db_router import REPLICA_DB_ALIAS
+
+
+class Command(BaseCommand):
+    """将 SQLite 主库复制到只读副本（用于在本地模拟主从复制）
+
+    使用 SQLite 在线备份接口逐页复制，复制期间主库可以继续读写。
+    使用 PostgreSQL 等数据库的流复制时不需要此命令。
+    """
+
+    help = '使用 SQLite 备份接口将主库同步到 replica 数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='持续同步的间隔秒数（模拟复制延迟），默认只同步一次')
+
+    def handle(self, *args, **options):
+        if REPLICA_DB_ALIAS not in connections.settings:
+            raise CommandError('未配置 replica 数据库，请设置 DATABASE_REPLICA_PATH')
+
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite' or connections[REPLICA_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('sync_replica 仅用于 SQLite 主库和副本')
+
+        while True:
+            started = time.perf_counter()
+            self._sync(source, str(connections.settings[REPLICA_DB_ALIAS]['NAME']))
+            self.stdout.write(f'已同步到副本，用时 {(time.perf_counter() - started) * 1000:.0f}ms')
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def _sync(source, replica_path):
+        source.ensure_connection()
+        target = sqlite3.connect(replica_path)
+        try:
+            source.connection.backup(target, pages=1024)
+        finally:
+            target.close()
@@ -0,0 +1,19 @@
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.views import APIView
+
+
+class VaryOnAcceptMiddleware(MiddlewareMixin):
+    """DRF 视图按 Accept 协商响应格式（JSON / MessagePack），为其全部响应加上 Vary: Accept
+
+    在中间件中设置而不是在渲染器中修改响应，304、读穿缓存命中等不经过渲染器的响应同样带有该头。
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        request.negotiates_format = isinstance(view_class, type) and issubclass(view_class, APIView)
+
+    def process_response(self, request, response):
+        if getattr(request, 'negotiates_format', False):
+            patch_vary_headers(response, ['Accept'])
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_student_notification_number'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='student',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='更新时间'),
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('student', '学生'), ('group', '分组'), ('assignment', '分组分配')], max_length=20, verbose_name='对象类型')),
+                ('object_id', models.BigIntegerField(verbose_name='对象ID')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='删除时间')),
+            ],
+            options={
+                'verbose_name': '删除记录',
+                'verbose_name_plural': '删除记录',
+                'ordering': ['deleted_at', 'id'],
+                'indexes': [models.Index(fields=['kind', 'deleted_at'], name='core_tombst_kind_b598e7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.3 on 2026-10-19 03:12
+
+from django.db import migrations, models
+
+
+# 计数规则与编写本迁移时的 core.statistics 相同，这里单独保留一份，不引用随代码变化的模块；
+# 之后计数规则或学生字段变化时执行 python manage.py reconcile_statistics 重建计数器
+COUNTER_DIMENSIONS = ['gender', 'residence_status', 'uniform_purchase', 'info_status', 'import_batch']
+HISTOGRAM_DIMENSIONS = ['height', 'weight']
+
+
+def _counter_key(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def populate_counters(apps, schema_editor):
+    """根据已有学生数据初始化统计计数器"""
+    Student = apps.get_model('core', 'Student')
+    StudentStatisticCounter = apps.get_model('core', 'StudentStatisticCounter')
+
+    sums = {
+        'count': models.Count('id'),
+        'height_count': models.Count('height'),
+        'height_sum': models.Sum('height'),
+        'height_square_sum': models.Sum(models.F('height') * models.F('height')),
+        'weight_count': models.Count('weight'),
+        'weight_sum': models.Sum('weight'),
+        'weight_square_sum': models.Sum(models.F('weight') * models.F('weight')),
+    }
+    students = Student.objects.order_by()
+    total = students.aggregate(**sums)
+    if not total['count']:
+        return
+
+    counters = [StudentStatisticCounter(dimension='total', key='', **{field: total[field] or 0 for field in sums})]
+    for dimension in COUNTER_DIMENSIONS:
+        for row in students.values(dimension).annotate(**sums):
+            counters.append(StudentStatisticCounter(
+                dimension=dimension, key=_counter_key(row[dimension]), **{field: row[field] or 0 for field in sums}
+            ))
+    for dimension in HISTOGRAM_DIMENSIONS:
+        rows = students.exclude(**{f'{dimension}__isnull': True}).values(dimension).annotate(count=models.Count('id'))
+        for row in rows:
+            counters.append(StudentStatisticCounter(
+                dimension=dimension, key=_counter_key(row[dimension]), count=row['count']
+            ))
+    StudentStatisticCounter.objects.bulk_create(counters, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_student_updated_at_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentStatisticCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=30, verbose_name='统计维度')),
+                ('key', models.CharField(blank=True, max_length=50, verbose_name='维度取值')),
+                ('count', models.BigIntegerField(default=0, verbose_name='人数')),
+                ('height_count', models.BigIntegerField(default=0, verbose_name='已填身高人数')),
+                ('height_sum', models.BigIntegerField(default=0, verbose_name='身高合计')),
+                ('height_square_sum', models.BigIntegerField(default=0, verbose_name='身高平方和')),
+                ('weight_count', models.BigIntegerField(default=0, verbose_name='已填体重人数')),
+                ('weight_sum', models.BigIntegerField(default=0, verbose_name='体重合计')),
+                ('weight_square_sum', models.BigIntegerField(default=0, verbose_name='体重平方和')),
+            ],
+            options={
+                'verbose_name': '学生统计计数器',
+                'verbose_name_plural': '学生统计计数器',
+                'unique_together': {('dimension', 'key')},
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
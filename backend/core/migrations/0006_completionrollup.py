@@ -0,0 +1,77 @@
+# Generated by Django 5.2.3 on 2026-10-19 03:15
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDay, TruncHour
+
+
+# 汇总规则与编写本迁移时的 core.statistics.rebuild_completion_rollups 相同，这里单独保留一份，
+# 不引用随代码变化的模块；分组维度按学生当前的有效分组统计
+def populate_rollups(apps, schema_editor):
+    """根据已有学生的资料完成时间初始化时间序列汇总表"""
+    Student = apps.get_model('core', 'Student')
+    StudentGroupAssignment = apps.get_model('groups', 'StudentGroupAssignment')
+    CompletionRollup = apps.get_model('core', 'CompletionRollup')
+
+    completed = Student.objects.filter(profile_completed_at__isnull=False).order_by()
+    assignments = StudentGroupAssignment.objects.filter(
+        is_active=True, student__profile_completed_at__isnull=False
+    ).order_by()
+
+    rollups = []
+    for granularity, trunc in {'hour': TruncHour, 'day': TruncDay}.items():
+        rows = completed.annotate(bucket=trunc('profile_completed_at')).values('bucket').annotate(
+            count=models.Count('id')
+        )
+        rollups.extend(
+            CompletionRollup(granularity=granularity, bucket=row['bucket'], dimension='all', key='', count=row['count'])
+            for row in rows
+        )
+
+        rows = completed.exclude(import_batch='').annotate(
+            bucket=trunc('profile_completed_at')
+        ).values('bucket', 'import_batch').annotate(count=models.Count('id'))
+        rollups.extend(
+            CompletionRollup(granularity=granularity, bucket=row['bucket'], dimension='batch',
+                             key=row['import_batch'], count=row['count'])
+            for row in rows
+        )
+
+        rows = assignments.annotate(
+            bucket=trunc('student__profile_completed_at')
+        ).values('bucket', 'group_info_id').annotate(count=models.Count('student_id', distinct=True))
+        rollups.extend(
+            CompletionRollup(granularity=granularity, bucket=row['bucket'], dimension='group',
+                             key=str(row['group_info_id']), count=row['count'])
+            for row in rows
+        )
+
+    CompletionRollup.objects.bulk_create(rollups, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_studentstatisticcounter'),
+        ('groups', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompletionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', '按小时'), ('day', '按天')], max_length=10, verbose_name='时间粒度')),
+                ('bucket', models.DateTimeField(verbose_name='时间段起点')),
+                ('dimension', models.CharField(choices=[('all', '全部'), ('batch', '导入批次'), ('group', '分组')], max_length=10, verbose_name='汇总维度')),
+                ('key', models.CharField(blank=True, max_length=100, verbose_name='维度取值')),
+                ('count', models.BigIntegerField(default=0, verbose_name='完成人数')),
+            ],
+            options={
+                'verbose_name': '资料完成汇总',
+                'verbose_name_plural': '资料完成汇总',
+                'ordering': ['bucket'],
+                'unique_together': {('granularity', 'dimension', 'key', 'bucket')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 03:22
+
+from django.db import migrations, models
+from django.db.models.functions import Right, Upper
+
+
+def populate_id_suffix(apps, schema_editor):
+    """根据身份证号填充已有学生的身份证后6位（一条UPDATE语句）"""
+    Student = apps.get_model('core', 'Student')
+    Student.objects.update(id_suffix=Upper(Right('id_card_number', 6)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='id_suffix',
+            field=models.CharField(default='', editable=False, max_length=6, verbose_name='身份证后6位'),
+        ),
+        migrations.RunPython(populate_id_suffix, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['name', 'id_suffix'], name='student_name_id_suffix_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-19 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_student_id_suffix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, unique=True, verbose_name='限流键')),
+                ('tokens', models.FloatField(verbose_name='剩余令牌')),
+                ('updated_at', models.FloatField(db_index=True, verbose_name='更新时间戳')),
+            ],
+            options={
+                'verbose_name': '限流令牌桶',
+                'verbose_name_plural': '限流令牌桶',
+            },
+        ),
+    ]
@@ -1,6 +1,208 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import RegexValidator
+from functools import reduce
+import operator
 import re
+from .db import retry_on_locked
+
+
+class Tombstone(models.Model):
+    """删除记录表（墓碑），供下游系统增量同步硬删除"""
+    
+    KIND_CHOICES = [
+        ('student', '学生'),
+        ('group', '分组'),
+        ('assignment', '分组分配'),
+    ]
+    
+    kind = models.CharField('对象类型', max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField('对象ID')
+    deleted_at = models.DateTimeField('删除时间', auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = '删除记录'
+        verbose_name_plural = '删除记录'
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['kind', 'deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id}"
+    
+    @classmethod
+    def record(cls, kind, object_ids):
+        """批量记录被删除的对象ID，并递增对应的数据版本号"""
+        from .cache import bump_versions
+        
+        cls.objects.bulk_create(
+            [cls(kind=kind, object_id=object_id) for object_id in object_ids],
+            batch_size=500
+        )
+        bump_versions(kind)
+
+
+class DataVersion(models.Model):
+    """数据版本号表（每张业务表一行，数据变更时递增，用于缓存失效和条件请求）"""
+    
+    name = models.CharField('数据表', max_length=30, unique=True)
+    version = models.BigIntegerField('版本号', default=0)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    class Meta:
+        verbose_name = '数据版本'
+        verbose_name_plural = '数据版本'
+    
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+
+class StudentStatisticCounter(models.Model):
+    """学生统计计数器表（随学生数据增量维护）"""
+    
+    dimension = models.CharField('统计维度', max_length=30)
+    key = models.CharField('维度取值', max_length=50, blank=True)
+    count = models.BigIntegerField('人数', default=0)
+    height_count = models.BigIntegerField('已填身高人数', default=0)
+    height_sum = models.BigIntegerField('身高合计', default=0)
+    height_square_sum = models.BigIntegerField('身高平方和', default=0)
+    weight_count = models.BigIntegerField('已填体重人数', default=0)
+    weight_sum = models.BigIntegerField('体重合计', default=0)
+    weight_square_sum = models.BigIntegerField('体重平方和', default=0)
+    
+    class Meta:
+        verbose_name = '学生统计计数器'
+        verbose_name_plural = '学生统计计数器'
+        unique_together = ['dimension', 'key']
+    
+    def __str__(self):
+        return f"{self.dimension}={self.key}: {self.count}"
+
+
+class ThrottleBucket(models.Model):
+    """门户限流令牌桶表（每个限流键一行，见 core.throttling）"""
+    
+    key = models.CharField('限流键', max_length=200, unique=True)
+    tokens = models.FloatField('剩余令牌')
+    updated_at = models.FloatField('更新时间戳', db_index=True)
+    
+    class Meta:
+        verbose_name = '限流令牌桶'
+        verbose_name_plural = '限流令牌桶'
+    
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f}"
+
+
+class CompletionRollup(models.Model):
+    """资料完成情况时间序列汇总表（按小时、按天）"""
+    
+    GRANULARITY_CHOICES = [
+        ('hour', '按小时'),
+        ('day', '按天'),
+    ]
+    
+    DIMENSION_CHOICES = [
+        ('all', '全部'),
+        ('batch', '导入批次'),
+        ('group', '分组'),
+    ]
+    
+    granularity = models.CharField('时间粒度', max_length=10, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField('时间段起点')
+    dimension = models.CharField('汇总维度', max_length=10, choices=DIMENSION_CHOICES)
+    key = models.CharField('维度取值', max_length=100, blank=True)
+    count = models.BigIntegerField('完成人数', default=0)
+    
+    class Meta:
+        verbose_name = '资料完成汇总'
+        verbose_name_plural = '资料完成汇总'
+        unique_together = ['granularity', 'dimension', 'key', 'bucket']
+        ordering = ['bucket']
+    
+    def __str__(self):
+        return f"{self.granularity} {self.bucket} {self.dimension}={self.key}: {self.count}"
+
+
+class StudentQuerySet(models.QuerySet):
+    """学生查询集"""
+    
+    def by_name_and_id_suffix(self, name, id_suffix):
+        """按姓名和身份证后6位筛选学生（使用 name + id_suffix 联合索引）"""
+        return self.filter(name=name, id_suffix=id_suffix.upper())
+    
+    @retry_on_locked
+    def delete(self):
+        """删除学生，同时为学生及级联删除的分组分配记录写入删除记录"""
+        from groups.models import StudentGroupAssignment
+        from .portal import invalidate_portal_entries
+        from .statistics import apply_deltas, queryset_deltas
+        
+        with transaction.atomic(using=self.db):
+            apply_deltas(queryset_deltas(self, sign=-1))
+            student_ids = list(self.values_list('id', flat=True))
+            invalidate_portal_entries(student_ids)
+            Tombstone.record(
+                'assignment',
+                StudentGroupAssignment.objects.filter(student_id__in=student_ids).values_list('id', flat=True)
+            )
+            Tombstone.record('student', student_ids)
+            return super().delete()
+    
+    @staticmethod
+    def profile_status(values):
+        """返回统一设置 values 后的信息完整度 SQL 表达式，以及设置后资料完整的条件（不可能完整时为 None）
+        
+        判断规则与 Student._calculate_info_status 相同：本次设置的字段按新值判断，其余字段按各行原有的值判断。
+        """
+        checks = [
+            ('residence_status', lambda value: value != 'UNKNOWN', ~models.Q(residence_status='UNKNOWN')),
+            ('height', lambda value: value is not None, models.Q(height__isnull=False)),
+            ('weight', lambda value: value is not None, models.Q(weight__isnull=False)),
+            ('uniform_purchase', lambda value: value is not None, models.Q(uniform_purchase__isnull=False)),
+        ]
+        fixed = [check(values[field]) for field, check, condition in checks if field in values]
+        pending = [condition for field, check, condition in checks if field not in values]
+        
+        # 所有字段均已确定时完整度是常量，否则按未设置字段的现有取值逐行计算
+        complete = None
+        if all(fixed):
+            complete = reduce(operator.and_, pending) if pending else models.Q(pk__isnull=False)
+        if not pending:
+            status = 'COMPLETE' if all(fixed) else 'PARTIAL' if any(fixed) else 'IMPORTED'
+            return models.Value(status, output_field=models.CharField()), complete
+        
+        whens = []
+        if complete is not None:
+            whens.append(models.When(complete, then=models.Value('COMPLETE')))
+        if any(fixed):
+            default = 'PARTIAL'
+        else:
+            whens.append(models.When(reduce(operator.or_, pending), then=models.Value('PARTIAL')))
+            default = 'IMPORTED'
+        info_status = models.Case(*whens, default=models.Value(default), output_field=models.CharField())
+        return info_status, complete
+    
+    def update_profiles(self, values, now):
+        """用一条 UPDATE 统一设置扩展信息，并在 SQL 中同时重新计算信息完整度（见 profile_status）
+        
+        更新时间设为 now；变为完整的学生的资料完成时间同样设为 now。返回更新的行数。
+        """
+        info_status, complete = self.profile_status(values)
+        updates = {**values, 'info_status': info_status, 'updated_at': now}
+        if complete is not None:
+            updates['profile_completed_at'] = models.Case(
+                models.When(~models.Q(info_status='COMPLETE') & complete, then=models.Value(now)),
+                default=models.F('profile_completed_at'),
+                output_field=models.DateTimeField()
+            )
+        return self.update(**updates)
+    
+    def delete_in_chunks(self, chunk_size=None, progress=None):
+        """分块删除学生（每块一个短事务），适用于大批量删除，参见 core.deletion"""
+        from .deletion import DELETE_CHUNK_SIZE, delete_students
+        
+        return delete_students(self, chunk_size=chunk_size or DELETE_CHUNK_SIZE, progress=progress)
 
 
 class Student(models.Model):
@@ -39,6 +241,7 @@ class Student(models.Model):
     )
     notification_number = models.CharField('通知书编号', max_length=50, unique=True)
     gender = models.CharField('性别', max_length=1, choices=GENDER_CHOICES, editable=False)
+    id_suffix = models.CharField('身份证后6位', max_length=6, editable=False, default='')
     
     # 扩展信息（选填，学生后续补充）
     residence_status = models.CharField(
@@ -70,36 +273,96 @@ class Student(models.Model):
     
     # 系统字段
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
-    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True, db_index=True)
     profile_completed_at = models.DateTimeField('资料完成时间', null=True, blank=True)
     
+    objects = StudentQuerySet.as_manager()
+    
     class Meta:
         verbose_name = '学生信息'
         verbose_name_plural = '学生信息'
         ordering = ['-created_at']
+        indexes = [
+            # 学生门户按姓名+身份证后6位查询
+            models.Index(fields=['name', 'id_suffix'], name='student_name_id_suffix_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.notification_number})"
     
+    @retry_on_locked
     def save(self, *args, **kwargs):
         """保存时自动处理相关逻辑"""
-        # 自动根据身份证号计算性别
-        if self.id_card_number:
-            self.gender = self._get_gender_from_id_card()
+        # 自动根据身份证号计算性别及身份证后6位
+        self.derive_fields()
         
-        # 自动更新信息完整度状态
-        old_status = None
-        if self.pk:
-            old_status = Student.objects.get(pk=self.pk).info_status
+        from .statistics import (
+            TRACKED_FIELDS, apply_deltas, merge_deltas, record_completions, row_deltas
+        )
         
-        self.info_status = self._calculate_info_status()
-        
-        # 如果状态变为完整，记录完成时间
-        if old_status != 'COMPLETE' and self.info_status == 'COMPLETE':
-            from django.utils import timezone
-            self.profile_completed_at = timezone.now()
+        with transaction.atomic():
+            # 在写事务内读取原有数据（IMMEDIATE 事务使并发的保存依次执行），用于判断状态变化并计算统计计数器增量
+            old_row = None
+            if self.pk:
+                old_row = Student.objects.filter(pk=self.pk).values(*TRACKED_FIELDS).first()
+            old_status = old_row['info_status'] if old_row else None
+            
+            # 保存后的取值：指定 update_fields 时只有这些字段写入数据库，其余字段保持原值
+            new_row = {
+                field: self._meta.get_field(field).to_python(getattr(self, field))
+                for field in TRACKED_FIELDS
+            }
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and old_row:
+                new_row = {
+                    field: new_row[field] if field in update_fields else old_row[field]
+                    for field in TRACKED_FIELDS
+                }
+            
+            # 如果状态变为完整，记录完成时间
+            completed_now = old_status != 'COMPLETE' and new_row['info_status'] == 'COMPLETE'
+            if completed_now:
+                from django.utils import timezone
+                self.profile_completed_at = timezone.now()
+                if update_fields is not None:
+                    kwargs['update_fields'] = [*update_fields, 'profile_completed_at']
+            
+            super().save(*args, **kwargs)
+            
+            deltas = row_deltas(new_row)
+            if old_row:
+                merge_deltas(deltas, row_deltas(old_row, sign=-1))
+            apply_deltas(deltas)
+            
+            if completed_now:
+                group_ids = []
+                if old_row:
+                    group_ids = list(
+                        self.group_assignments.filter(is_active=True).values_list('group_info_id', flat=True)
+                    )
+                record_completions([(self.profile_completed_at, new_row['import_batch'], group_ids)])
+    
+    @retry_on_locked
+    def delete(self, *args, **kwargs):
+        """删除学生时记录删除信息（含级联删除的分组分配）"""
+        from .portal import invalidate_portal_entries
+        from .statistics import TRACKED_FIELDS, apply_deltas, row_deltas
         
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            old_row = Student.objects.filter(pk=self.pk).values(*TRACKED_FIELDS).first()
+            if old_row:
+                apply_deltas(row_deltas(old_row, sign=-1))
+            invalidate_portal_entries([self.pk])
+            Tombstone.record('assignment', self.group_assignments.values_list('id', flat=True))
+            Tombstone.record('student', [self.pk])
+            return super().delete(*args, **kwargs)
+    
+    def derive_fields(self):
+        """计算派生字段：根据身份证号计算性别及身份证后6位，根据扩展信息计算信息完整度"""
+        if self.id_card_number:
+            self.gender = self._get_gender_from_id_card()
+            self.id_suffix = self.id_card_number[-6:].upper()
+        self.info_status = self._calculate_info_status()
     
     def _get_gender_from_id_card(self):
         """根据身份证号码计算性别"""
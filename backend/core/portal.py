@@ -0,0 +1,242 @@
+import hashlib
+from collections import Counter
+from django.core import signing
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework import serializers
+from .models import Student
+from .serializers import StudentSerializer, StudentListSerializer
+
+
+# 学生自助查询门户使用的缓存别名及有效期（秒）
+PORTAL_CACHE_ALIAS = 'portal'
+PORTAL_CACHE_TIMEOUT = 6 * 3600
+
+# 门户访问token的签名盐值及有效期（秒）
+ACCESS_TOKEN_SALT = 'siqcs.portal.access'
+ACCESS_TOKEN_MAX_AGE = 24 * 3600
+
+
+def portal_cache():
+    return caches[PORTAL_CACHE_ALIAS]
+
+
+def _student_key(student_id):
+    return f'siqcs:portal:student:{student_id}'
+
+
+def _lookup_key(name, id_suffix):
+    digest = hashlib.md5(f'{name}|{id_suffix.upper()}'.encode(), usedforsecurity=False).hexdigest()
+    return f'siqcs:portal:lookup:{digest}'
+
+
+def _active_assignments(student_ids):
+    from groups.models import StudentGroupAssignment
+
+    return StudentGroupAssignment.objects.using(DEFAULT_DB_ALIAS).filter(
+        student_id__in=student_ids, is_active=True
+    ).select_related('group_info').order_by('id')
+
+
+def _format_portal_entries(students, assignments):
+    groups_by_student = {student.id: [] for student in students}
+    for assignment in assignments:
+        groups_by_student[assignment.student_id].append({
+            'assignment_id': assignment.id,
+            'group_info': {
+                'id': assignment.group_info.id,
+                'group_name': assignment.group_info.group_name,
+                'group_teacher': assignment.group_info.group_teacher,
+                'teacher_phone': assignment.group_info.teacher_phone,
+                'report_location': assignment.group_info.report_location,
+            },
+            'assigned_at': serializers.DateTimeField().to_representation(assignment.assigned_at),
+            'remarks': assignment.remarks
+        })
+
+    return {
+        student.id: {
+            'name': student.name,
+            'id_card_number': student.id_card_number,
+            'student': dict(StudentSerializer(student).data),
+            'student_summary': dict(StudentListSerializer(student).data),
+            'groups': groups_by_student[student.id],
+        }
+        for student in students
+    }
+
+
+def build_portal_entries(students):
+    """为一组学生生成门户缓存内容（序列化后的学生信息及有效分组），分组信息一次查询加载"""
+    students = list(students)
+    return _format_portal_entries(students, _active_assignments([student.id for student in students]))
+
+
+async def abuild_portal_entries(students):
+    """build_portal_entries 的异步版本"""
+    assignments = [
+        assignment async for assignment in _active_assignments([student.id for student in students])
+    ]
+    return _format_portal_entries(students, assignments)
+
+
+def get_portal_entry(student_id):
+    """读取学生的门户缓存，未命中时从数据库加载并写入缓存；学生不存在时返回 None"""
+    cache = portal_cache()
+    entry = cache.get(_student_key(student_id))
+    if entry is None:
+        # 缓存内容始终从主库加载，避免把副本上尚未同步的旧数据写入缓存
+        student = Student.objects.using(DEFAULT_DB_ALIAS).filter(pk=student_id).first()
+        if student is None:
+            return None
+        entry = build_portal_entries([student])[student.id]
+        cache.set(_student_key(student.id), entry, PORTAL_CACHE_TIMEOUT)
+    return entry
+
+
+def lookup_portal_entry(name, id_suffix):
+    """按姓名和身份证后6位查找学生，返回 (匹配的学生ID列表（最多2个）, 唯一匹配时的门户缓存)
+
+    仅缓存唯一匹配的结果；命中后校验缓存内容中的姓名和身份证号，学生改名或删除后自动回源。
+    未命中时只需一次走联合索引的查询。
+    """
+    cache = portal_cache()
+    key = _lookup_key(name, id_suffix)
+
+    student_ids = cache.get(key)
+    if student_ids:
+        entry = get_portal_entry(student_ids[0])
+        if (entry is not None and entry['name'] == name
+                and entry['id_card_number'].upper().endswith(id_suffix.upper())):
+            return student_ids, entry
+
+    # 一次查询最多取2条即可区分未找到、唯一匹配和多个匹配
+    student_ids = list(
+        Student.objects.by_name_and_id_suffix(name, id_suffix).order_by().values_list('id', flat=True)[:2]
+    )
+    if len(student_ids) != 1:
+        return student_ids, None
+
+    entry = get_portal_entry(student_ids[0])
+    if entry is None:
+        return [], None
+    cache.set(key, student_ids, PORTAL_CACHE_TIMEOUT)
+    return student_ids, entry
+
+
+async def aget_portal_entry(student_id):
+    """get_portal_entry 的异步版本（异步缓存读写及异步ORM）"""
+    cache = portal_cache()
+    entry = await cache.aget(_student_key(student_id))
+    if entry is None:
+        student = await Student.objects.using(DEFAULT_DB_ALIAS).filter(pk=student_id).afirst()
+        if student is None:
+            return None
+        entry = (await abuild_portal_entries([student]))[student.id]
+        await cache.aset(_student_key(student.id), entry, PORTAL_CACHE_TIMEOUT)
+    return entry
+
+
+async def alookup_portal_entry(name, id_suffix):
+    """lookup_portal_entry 的异步版本"""
+    cache = portal_cache()
+    key = _lookup_key(name, id_suffix)
+
+    student_ids = await cache.aget(key)
+    if student_ids:
+        entry = await aget_portal_entry(student_ids[0])
+        if (entry is not None and entry['name'] == name
+                and entry['id_card_number'].upper().endswith(id_suffix.upper())):
+            return student_ids, entry
+
+    student_ids = [
+        student_id async for student_id in
+        Student.objects.by_name_and_id_suffix(name, id_suffix).order_by().values_list('id', flat=True)[:2]
+    ]
+    if len(student_ids) != 1:
+        return student_ids, None
+
+    entry = await aget_portal_entry(student_ids[0])
+    if entry is None:
+        return [], None
+    await cache.aset(key, student_ids, PORTAL_CACHE_TIMEOUT)
+    return student_ids, entry
+
+
+def make_access_token(entry):
+    """生成门户访问token：使用 SECRET_KEY 签名并带时间戳，载荷为学生ID（s）
+
+    分组信息在验证时从门户缓存读取，token 中不携带，签发后分组调整不影响 token 的有效性。
+    """
+    return signing.dumps({'s': entry['student']['id']}, salt=ACCESS_TOKEN_SALT)
+
+
+def read_access_token(token):
+    """校验门户访问token的签名和有效期并返回载荷，不查询数据库
+
+    签名无效时抛出 signing.BadSignature，过期时抛出 signing.SignatureExpired（BadSignature 的子类）。
+    """
+    payload = signing.loads(token, salt=ACCESS_TOKEN_SALT, max_age=ACCESS_TOKEN_MAX_AGE)
+    if not isinstance(payload, dict) or not isinstance(payload.get('s'), int):
+        raise signing.BadSignature('访问token载荷格式不正确')
+    return payload
+
+
+def _delete_entries(student_ids, lookups):
+    keys = [_student_key(student_id) for student_id in student_ids]
+    keys += [_lookup_key(name, id_card_number[-6:]) for name, id_card_number in lookups]
+    if keys:
+        portal_cache().delete_many(keys)
+
+
+def invalidate_portal_entries(student_ids, lookups=()):
+    """学生或分组分配变化后删除对应的门户缓存（事务提交后执行）
+
+    lookups 为 (姓名, 身份证号) 列表，用于同时删除姓名+身份证后6位的查找缓存，
+    以便新增同名同后缀的学生后重新判断是否存在多个匹配。
+    """
+    student_ids = list(student_ids)
+    lookups = list(lookups)
+    transaction.on_commit(lambda: _delete_entries(student_ids, lookups))
+
+
+def invalidate_group_portal_entries(group_ids):
+    """分组信息变化后删除该分组下学生的门户缓存"""
+    from groups.models import StudentGroupAssignment
+
+    invalidate_portal_entries(set(
+        StudentGroupAssignment.objects.filter(group_info_id__in=group_ids).values_list('student_id', flat=True)
+    ))
+
+
+def warm_portal_cache(queryset, chunk_size=500):
+    """分块预加载学生的门户缓存，返回写入的学生数量"""
+    cache = portal_cache()
+    total = 0
+    last_id = 0
+    queryset = queryset.order_by('id')
+
+    while True:
+        students = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not students:
+            break
+
+        entries = build_portal_entries(students)
+        cache.set_many({_student_key(student_id): entry for student_id, entry in entries.items()},
+                       PORTAL_CACHE_TIMEOUT)
+
+        # 只预加载唯一匹配的查找缓存，同名同后缀的学生留给查询时判断
+        lookups = Counter(
+            Student.objects.filter(
+                name__in={student.name for student in students}
+            ).values_list('name', 'id_suffix')
+        )
+        cache.set_many({
+            _lookup_key(student.name, student.id_suffix): [student.id]
+            for student in students
+            if lookups[(student.name, student.id_suffix)] == 1
+        }, PORTAL_CACHE_TIMEOUT)
+        total += len(students)
+        last_id = students[-1].id
+
+    return total
@@ -0,0 +1,107 @@
+import datetime
+import decimal
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时使用标准库 json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，未安装时不提供 MessagePack 格式
+    msgpack = None
+
+
+_drf_encoder = JSONEncoder()
+
+
+def _orjson_default(obj):
+    """orjson 不支持的类型：Decimal 与 DRF 一致转为浮点数，其余交给 DRF 的编码器"""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return _drf_encoder.default(obj)
+
+
+def _msgpack_default(obj):
+    """MessagePack 不支持的类型，与 JSON 输出保持相同的表示"""
+    if isinstance(obj, datetime.datetime):
+        representation = obj.isoformat()
+        if representation.endswith('+00:00'):
+            representation = representation[:-6] + 'Z'
+        return representation
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return _drf_encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON渲染器：安装了 orjson 时使用 orjson 编码，否则与 DRF 的 JSONRenderer 相同
+
+    输出格式与 JSONRenderer 相同（紧凑格式、UTF-8、UTC 时间以 Z 结尾、Decimal 为数字、
+    非字符串键转为字符串）；请求 indent 时回退到标准库以支持任意缩进。
+    使用 orjson 时有两处差异，解析后的取值不受影响：
+    - NaN、Infinity 输出为 null，而 JSONRenderer（STRICT_JSON）会抛出 ValueError；
+      逐项检查浮点数的开销与编码本身相当，因此不做检查，接口数据中不应出现这些值；
+    - 浮点数的指数写法不同（如 1e16 与 1e+16、1e-7 与 1e-07），有效数字相同。
+    """
+
+    orjson_options = (
+        orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if orjson is not None else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_orjson_default, option=self.orjson_options)
+        # 与 JSONRenderer 相同，转义 U+2028/U+2029 以便嵌入 JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack渲染器（Accept: application/msgpack），需要安装 msgpack
+
+    数据结构与 JSON 响应相同，时间为 ISO 8601 字符串。同一地址按 Accept 返回不同格式，
+    Vary: Accept 由 core.middleware.VaryOnAcceptMiddleware 设置。
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True, datetime=False)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """NDJSON渲染器（每行一个JSON对象）
+
+    流式导出接口直接返回 StreamingHttpResponse，本渲染器主要用于内容协商
+    以及渲染错误响应。
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(
+            json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode(self.charset)
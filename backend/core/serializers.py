@@ -1,5 +1,13 @@
+from collections import Counter, defaultdict
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Student
+from .db import chunked, retry_on_locked
+from .models import Student, Tombstone
+
+
+# bulk_create 每批插入的行数
+BULK_CREATE_BATCH_SIZE = 500
 
 
 class StudentSerializer(serializers.ModelSerializer):
@@ -115,3 +123,258 @@ class StudentProfileUpdateSerializer(serializers.ModelSerializer):
         if value and not value.startswith('1'):
             raise serializers.ValidationError("手机号码必须以1开头")
         return value
+
+
+def validate_profile_fields(value):
+    """校验批量更新的扩展信息字段（只允许 StudentProfileUpdateSerializer 中的字段）"""
+    if not isinstance(value, dict) or not value:
+        raise serializers.ValidationError('请提供要更新的字段')
+    
+    allowed = StudentProfileUpdateSerializer.Meta.fields
+    unknown = [field for field in value if field not in allowed]
+    if unknown:
+        raise serializers.ValidationError(f"不允许批量更新的字段: {', '.join(unknown)}")
+    
+    serializer = StudentProfileUpdateSerializer(data=value, partial=True)
+    if not serializer.is_valid():
+        raise serializers.ValidationError(serializer.errors)
+    return serializer.validated_data
+
+
+class BulkItemListSerializer(serializers.ListSerializer):
+    """批量接口的条目列表序列化器：逐条校验，错误按提交列表中的位置返回
+    
+    逐条校验字段后调用 check_items 做集合化检查（如一次查询确认主键存在、检查重复），
+    错误记录为 [{'index': 0, 'errors': {...}}, ...]。
+    context 中 partial_success 为真时，有错误的条目被跳过，其余条目照常写入，
+    错误记录在 item_errors 中；否则只要有一条错误就整体校验失败。
+    """
+    
+    # 错误提示中的条目名称，如 '学生信息'
+    item_label = '条目'
+    
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': [f'请提供{self.item_label}列表']})
+        if not data and not self.allow_empty:
+            raise serializers.ValidationError({'non_field_errors': [f'{self.item_label}列表不能为空']})
+        
+        valid = []
+        errors = {}
+        for index, item in enumerate(data):
+            try:
+                valid.append((index, self.child.run_validation(item)))
+            except serializers.ValidationError as exc:
+                errors[index] = exc.detail
+        
+        self.check_items(valid, errors)
+        
+        self.item_errors = [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+        if self.item_errors and not self.context.get('partial_success'):
+            raise serializers.ValidationError(self.item_errors)
+        self.valid_items = [(index, attrs) for index, attrs in valid if index not in errors]
+        return [attrs for index, attrs in self.valid_items]
+    
+    def check_items(self, valid, errors):
+        """对逐条校验通过的 [(位置, 字段)] 做集合化检查，有错误的条目以位置为键记入 errors"""
+
+
+class StudentProfileBulkItemListSerializer(BulkItemListSerializer):
+    """资料批量更新条目列表：用一次查询确认学生存在，并检查提交数据内部的重复"""
+    
+    item_label = '资料更新'
+    
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('allow_empty', False)
+        super().__init__(*args, **kwargs)
+    
+    def check_items(self, valid, errors):
+        student_ids = {attrs['id'] for index, attrs in valid}
+        existing = set()
+        for chunk in chunked(student_ids):
+            existing.update(Student.objects.filter(id__in=chunk).order_by().values_list('id', flat=True))
+        
+        first_seen = {}
+        for index, attrs in valid:
+            if attrs['id'] not in existing:
+                errors[index] = {'id': ['学生不存在']}
+            elif attrs['id'] in first_seen:
+                errors[index] = {'id': [f"与索引 {first_seen[attrs['id']]} 的条目重复"]}
+            else:
+                first_seen[attrs['id']] = index
+
+
+class StudentProfileBulkItemSerializer(serializers.Serializer):
+    """按学生逐个指定的资料更新条目：{"id": 1, "fields": {...}}"""
+    
+    id = serializers.IntegerField(min_value=1)
+    fields = serializers.JSONField()
+    
+    class Meta:
+        list_serializer_class = StudentProfileBulkItemListSerializer
+    
+    def validate_fields(self, value):
+        return validate_profile_fields(value)
+
+
+class StudentProfileBulkFilterSerializer(serializers.Serializer):
+    """按条件批量更新资料时的筛选条件（至少提供一项）"""
+    
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    import_batch = serializers.CharField(required=False)
+    gender = serializers.ChoiceField(choices=Student.GENDER_CHOICES, required=False)
+    residence_status = serializers.ChoiceField(choices=Student.RESIDENCE_CHOICES, required=False)
+    uniform_purchase = serializers.BooleanField(required=False, allow_null=True)
+    info_status = serializers.ChoiceField(choices=Student.INFO_STATUS_CHOICES, required=False)
+    
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError('请至少提供一项筛选条件')
+        return data
+
+
+class StudentProfileBulkFilterUpdateSerializer(serializers.Serializer):
+    """按条件批量更新资料：{"filter": {...}, "fields": {...}}"""
+    
+    filter = StudentProfileBulkFilterSerializer()
+    fields = serializers.JSONField()
+    
+    def validate_fields(self, value):
+        return validate_profile_fields(value)
+    
+    def get_queryset(self):
+        """按筛选条件返回要更新的学生"""
+        lookups = dict(self.validated_data['filter'])
+        if 'ids' in lookups:
+            lookups['id__in'] = lookups.pop('ids')
+        return Student.objects.filter(**lookups)
+
+
+class StudentBulkListSerializer(BulkItemListSerializer):
+    """学生批量创建列表序列化器
+    
+    逐条校验字段后，对身份证号、通知书编号做一次集合化的唯一性检查（分块 IN 查询数据库，
+    同时检查提交数据内部的重复），再分批 bulk_create 插入。错误返回方式及 partial_success
+    的含义见 BulkItemListSerializer。
+    """
+    
+    item_label = '学生信息'
+    unique_fields = ['id_card_number', 'notification_number']
+    
+    def check_items(self, valid, errors):
+        for field in self.unique_fields:
+            self._check_unique(field, valid, errors)
+    
+    def _check_unique(self, field, valid, errors):
+        """检查字段在数据库中及提交数据内部是否重复，重复的条目记入 errors"""
+        values = {attrs[field] for index, attrs in valid if index not in errors}
+        existing = set()
+        for chunk in chunked(values):
+            existing.update(
+                Student.objects.filter(**{f'{field}__in': chunk}).order_by().values_list(field, flat=True)
+            )
+        
+        label = Student._meta.get_field(field).verbose_name
+        first_seen = {}
+        for index, attrs in valid:
+            if index in errors:
+                continue
+            value = attrs[field]
+            if value in existing:
+                message = f'{label}已存在'
+            elif value in first_seen:
+                message = f'{label}与索引 {first_seen[value]} 的条目重复'
+            else:
+                first_seen[value] = index
+                continue
+            errors[index] = {field: [message]}
+    
+    def _insert(self, items):
+        """插入 [(位置, 字段)] 中的学生，返回创建的学生对象（应在事务内调用）
+        
+        校验之后、写入之前，其他请求可能已插入相同的身份证号或通知书编号，因此在写事务内重新检查唯一性。
+        SQLite 的写事务以 BEGIN IMMEDIATE 开始，检查时已持有写锁；其他数据库在检查之后仍可能冲突，
+        插入违反唯一约束时回滚到保存点后再次检查。冲突的条目记入 item_errors：
+        partial_success 时跳过这些条目，否则抛出 ValidationError。
+        """
+        # retry_on_locked 重试时丢弃上一次写入时记录的冲突
+        indexes = {index for index, attrs in items}
+        self.item_errors = [item for item in getattr(self, 'item_errors', []) if item['index'] not in indexes]
+        
+        integrity_error = None
+        while True:
+            errors = {}
+            for field in self.unique_fields:
+                self._check_unique(field, items, errors)
+            if not errors and integrity_error is not None:
+                # 违反的不是这里检查的唯一约束
+                raise integrity_error
+            
+            if errors:
+                self.item_errors = sorted(
+                    self.item_errors + [{'index': index, 'errors': errors[index]} for index in errors],
+                    key=lambda item: item['index']
+                )
+                if not self.context.get('partial_success'):
+                    raise serializers.ValidationError(self.item_errors)
+                items = [(index, attrs) for index, attrs in items if index not in errors]
+            
+            now = timezone.now()
+            students = []
+            for index, attrs in items:
+                student = Student(**attrs)
+                student.derive_fields()
+                if student.info_status == 'COMPLETE':
+                    student.profile_completed_at = now
+                students.append(student)
+            
+            try:
+                with transaction.atomic():
+                    return Student.objects.bulk_create(students, batch_size=BULK_CREATE_BATCH_SIZE)
+            except IntegrityError as exc:
+                integrity_error = exc
+    
+    @retry_on_locked
+    def create(self, validated_data):
+        """分批插入学生，并一次性更新统计计数器、完成时间序列、数据版本号及门户缓存"""
+        from .cache import bump_model_versions
+        from .portal import invalidate_portal_entries
+        from .statistics import TRACKED_FIELDS, apply_deltas, merge_deltas, record_completions, row_deltas
+        
+        with transaction.atomic():
+            # 带上条目在提交列表中的位置，写入时发现冲突仍按位置返回错误
+            created = self._insert(getattr(self, 'valid_items', list(enumerate(validated_data))))
+            
+            deltas = defaultdict(Counter)
+            for student in created:
+                merge_deltas(deltas, row_deltas({field: getattr(student, field) for field in TRACKED_FIELDS}))
+            apply_deltas(deltas)
+            record_completions([
+                (student.profile_completed_at, student.import_batch, [])
+                for student in created if student.profile_completed_at
+            ])
+            
+            # bulk_create 不发送 post_save 信号，这里统一递增版本号并删除查找缓存
+            bump_model_versions(Student)
+            invalidate_portal_entries([], [(student.name, student.id_card_number) for student in created])
+        return created
+
+
+class StudentBulkCreateSerializer(StudentSerializer):
+    """学生批量创建序列化器（唯一性由 StudentBulkListSerializer 集合化检查）"""
+    
+    class Meta(StudentSerializer.Meta):
+        list_serializer_class = StudentBulkListSerializer
+        # 去掉逐条查询数据库的 UniqueValidator
+        extra_kwargs = {
+            'id_card_number': {'validators': [Student.id_card_validator]},
+            'notification_number': {'validators': []},
+        }
+
+
+class TombstoneSerializer(serializers.ModelSerializer):
+    """删除记录序列化器"""
+    
+    class Meta:
+        model = Tombstone
+        fields = ['id', 'kind', 'object_id', 'deleted_at']
@@ -1,10 +1,19 @@
 import pandas as pd
 import re
+from collections import Counter, defaultdict
 from datetime import datetime
-from django.db import transaction
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from core.cache import bump_model_versions
+from core.db import is_locked_error, retry_on_locked
 from core.models import Student
-from groups.models import GroupInfo
+from core.portal import invalidate_portal_entries
+from core.statistics import (
+    TRACKED_FIELDS, apply_deltas, batched_counter_updates, merge_deltas, queryset_deltas, record_completions,
+    row_deltas
+)
+from groups.models import GroupInfo, StudentGroupAssignment
 
 
 class StudentImportService:
@@ -49,14 +58,7 @@ class StudentImportService:
             if missing_columns:
                 raise ValueError(f"缺少必要的列: {', '.join(missing_columns)}")
             
-            # 处理每一行数据
-            with transaction.atomic():
-                for index, row in df.iterrows():
-                    try:
-                        self._process_student_row(row, index + 2, batch_name)  # +2因为Excel从第2行开始
-                    except Exception as e:
-                        self.errors.append(f"第{index + 2}行: {str(e)}")
-                        continue
+            self._import_rows(df, batch_name)
             
             return {
                 'success': True,
@@ -78,6 +80,30 @@ class StudentImportService:
                 'warnings': self.warnings
             }
     
+    @retry_on_locked
+    def _import_rows(self, df, batch_name):
+        """在一个事务内处理所有行；数据库被锁定时整个事务回滚后重试
+        
+        每行在各自的保存点中处理：该行的任何异常（数据校验失败、违反唯一约束、单元格格式异常等）
+        只回滚该行并记录为行错误；数据库锁冲突直接抛出，由 retry_on_locked 回滚整个事务后重试。
+        """
+        self.errors = []
+        self.warnings = []
+        self.success_count = 0
+        self.skip_count = 0
+        
+        # 处理每一行数据（统计计数器增量在导入结束时统一写入）
+        with transaction.atomic(), batched_counter_updates():
+            for index, row in df.iterrows():
+                try:
+                    with transaction.atomic():
+                        self._process_student_row(row, index + 2, batch_name)  # +2因为Excel从第2行开始
+                except Exception as e:
+                    if is_locked_error(e):
+                        raise
+                    self.errors.append(f"第{index + 2}行: {str(e)}")
+                    continue
+    
     def _process_student_row(self, row, row_number, batch_name):
         """处理单行学生数据"""
         name = str(row['姓名']).strip()
@@ -137,6 +163,134 @@ class StudentImportService:
         self.success_count += 1
 
 
+class StudentProfileBulkUpdateService:
+    """学生资料批量更新服务
+    
+    update_each 为每个学生指定各自的字段取值：每块一次读取，用 Student._calculate_info_status 计算信息完整度，
+    再一次 bulk_update 写入。
+    update_matching 为符合条件的学生统一设置字段：整批一条 UPDATE，信息完整度及资料完成时间由
+    StudentQuerySet.profile_status 的 SQL 表达式计算；计数器增量在 UPDATE 之前按原取值和新取值各分组聚合一次，
+    与 UPDATE 使用同一组表达式，不在 Python 中逐行计算。两种规则的一致性由测试覆盖。
+    整批在一个事务内完成，统计计数器、完成时间序列、数据版本号和门户缓存都只更新一次。
+    性别由身份证号计算，身份证号不在可批量更新的字段中，因此无需重新计算。
+    """
+    
+    chunk_size = 500
+    
+    # 决定信息完整度的字段
+    status_fields = ['residence_status', 'height', 'weight', 'uniform_purchase']
+    
+    def __init__(self):
+        self.updated_count = 0
+        self.completed_count = 0
+    
+    @retry_on_locked
+    def update_each(self, updates):
+        """updates 为 [{'id': 学生ID, 'fields': {字段: 值}}]，返回更新结果"""
+        self._start()
+        with transaction.atomic(), batched_counter_updates():
+            for start in range(0, len(updates), self.chunk_size):
+                chunk = {update['id']: update['fields'] for update in updates[start:start + self.chunk_size]}
+                self._update_chunk(chunk)
+            self._finish()
+        return self._result()
+    
+    @retry_on_locked
+    def update_matching(self, queryset, values):
+        """为 queryset 中的学生统一设置 values，返回更新结果"""
+        self._start()
+        with transaction.atomic(), batched_counter_updates():
+            info_status, complete = Student.objects.profile_status(values)
+            new_values = {
+                field: models.Value(value, output_field=Student._meta.get_field(field))
+                for field, value in values.items()
+            }
+            new_values['info_status'] = info_status
+            
+            self.student_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+            merge_deltas(self.deltas, queryset_deltas(queryset, sign=-1))
+            merge_deltas(self.deltas, queryset_deltas(queryset, values=new_values))
+            completed = []
+            if complete is not None:
+                completed = list(
+                    queryset.filter(complete).exclude(info_status='COMPLETE').values_list('pk', 'import_batch')
+                )
+            
+            self.updated_count = queryset.update_profiles(values, self.now)
+            self._record_completions(completed)
+            self._finish()
+        return self._result()
+    
+    def _start(self):
+        self.now = timezone.now()
+        self.updated_count = 0
+        self.completed_count = 0
+        self.student_ids = []
+        self.deltas = defaultdict(Counter)
+    
+    def _update_chunk(self, values_by_id):
+        """读取一块学生的当前取值，计算新的完整度及计数器增量，再一次 bulk_update 写入"""
+        fields = sorted({field for values in values_by_id.values() for field in values})
+        rows = Student.objects.filter(pk__in=list(values_by_id)).order_by().values(
+            'pk', 'profile_completed_at', *{*TRACKED_FIELDS, *fields}
+        )
+        
+        students = []
+        completed = []
+        for row in rows:
+            new_row = {**row, **values_by_id[row['pk']]}
+            new_row['info_status'] = Student(
+                **{field: new_row[field] for field in self.status_fields}
+            )._calculate_info_status()
+            if row['info_status'] != 'COMPLETE' and new_row['info_status'] == 'COMPLETE':
+                new_row['profile_completed_at'] = self.now
+                completed.append((row['pk'], row['import_batch']))
+            
+            merge_deltas(self.deltas, row_deltas(row, sign=-1))
+            merge_deltas(self.deltas, row_deltas(new_row))
+            students.append(new_row)
+        
+        Student.objects.bulk_update(
+            [
+                Student(id=row['pk'], updated_at=self.now, **{
+                    field: row[field] for field in [*fields, 'info_status', 'profile_completed_at']
+                })
+                for row in students
+            ],
+            [*fields, 'info_status', 'profile_completed_at', 'updated_at']
+        )
+        self._record_completions(completed)
+        
+        self.student_ids.extend(row['pk'] for row in students)
+        self.updated_count += len(students)
+    
+    def _record_completions(self, completed):
+        """为变为完整的学生 [(学生ID, 导入批次)] 累加完成时间序列（分组维度按学生当前的有效分组）"""
+        if not completed:
+            return
+        group_ids = defaultdict(list)
+        for student_id, group_id in StudentGroupAssignment.objects.filter(
+            student_id__in=[student_id for student_id, import_batch in completed], is_active=True
+        ).values_list('student_id', 'group_info_id'):
+            group_ids[student_id].append(group_id)
+        record_completions([
+            (self.now, import_batch, group_ids[student_id]) for student_id, import_batch in completed
+        ])
+        self.completed_count += len(completed)
+    
+    def _finish(self):
+        apply_deltas(self.deltas)
+        if self.student_ids:
+            bump_model_versions(Student)
+            invalidate_portal_entries(self.student_ids)
+    
+    def _result(self):
+        return {
+            'updated_count': self.updated_count,
+            'completed_count': self.completed_count,
+        }
+
+
 class GroupImportService:
     """分组信息导入服务"""
     
@@ -211,12 +365,21 @@ class GroupImportService:
             self.skip_count += 1
             return
         
+        # 处理容量（可选列，为空表示不限）
+        capacity = None
+        if '容量' in row and pd.notna(row['容量']):
+            try:
+                capacity = int(row['容量'])
+            except (TypeError, ValueError):
+                raise ValueError("容量必须为整数")
+        
         # 创建分组记录
         group = GroupInfo(
             group_name=group_name,
             group_teacher=group_teacher,
             teacher_phone=teacher_phone,
-            report_location=report_location
+            report_location=report_location,
+            capacity=capacity
         )
         
         group.full_clean()
@@ -621,6 +784,95 @@ class StudentGroupAssignmentImportService:
         
         return record
 
+class StudentExportService:
+    """学生信息NDJSON流式导出服务（供下游系统整体同步）"""
+
+    EXPORT_FIELDS = [
+        'id', 'name', 'id_card_number', 'notification_number', 'gender',
+        'residence_status', 'height', 'weight', 'uniform_purchase',
+        'interests_talents', 'phone_number', 'email', 'info_status',
+        'import_batch', 'import_row_number',
+        'created_at', 'updated_at', 'profile_completed_at'
+    ]
+
+    def __init__(self, queryset, include_group=False, chunk_size=1000):
+        self.queryset = queryset
+        self.include_group = include_group
+        self.chunk_size = chunk_size
+        # 导出开始时间：客户端导出完成后以 ?updated_since=<该时间> 及删除记录接口补齐导出期间的变更
+        self.started_at = timezone.now()
+
+    def iter_rows(self):
+        """按主键分段读取学生数据，内存占用与总数据量无关
+
+        开始导出时记录当前最大主键作为插入截止点，按主键顺序以 id > last_id 翻页：
+        导出期间新插入的学生不会混入，同一学生不会重复输出。
+        各分段是独立的查询，不是一致性快照：导出期间被修改的学生按读取到该分段时的取值输出，
+        尚未读到就被删除的学生不会输出。需要一致结果的下游应在导出完成后，
+        用 started_at 作为 updated_since 同步学生变更及删除记录。
+        """
+        from django.db.models import Max
+
+        insert_cutoff = self.queryset.aggregate(max_id=Max('id'))['max_id']
+        if insert_cutoff is None:
+            return
+
+        queryset = self.queryset.filter(id__lte=insert_cutoff).order_by('id')
+        fields = list(self.EXPORT_FIELDS)
+
+        groups = {}
+        if self.include_group:
+            queryset, groups = self._annotate_active_group(queryset)
+            fields.append('active_group_id')
+
+        last_id = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id).values(*fields)[:self.chunk_size])
+            if not chunk:
+                break
+
+            for row in chunk:
+                if self.include_group:
+                    row['group'] = groups.get(row.pop('active_group_id'))
+                yield row
+
+            last_id = chunk[-1]['id']
+
+    def iter_ndjson(self):
+        """逐块生成NDJSON字节串，每块对应一次分段查询"""
+        import json
+        from django.core.serializers.json import DjangoJSONEncoder
+
+        buffer = []
+        for row in self.iter_rows():
+            buffer.append(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+            if len(buffer) >= self.chunk_size:
+                yield ('\n'.join(buffer) + '\n').encode('utf-8')
+                buffer = []
+
+        if buffer:
+            yield ('\n'.join(buffer) + '\n').encode('utf-8')
+
+    def _annotate_active_group(self, queryset):
+        """为每个学生标注当前有效分组，分组详情一次性加载到内存"""
+        from django.db.models import OuterRef, Subquery
+        from groups.models import StudentGroupAssignment
+
+        active_group = StudentGroupAssignment.objects.filter(
+            student=OuterRef('pk'),
+            is_active=True
+        ).order_by('-assigned_at').values('group_info_id')[:1]
+
+        groups = {
+            group['id']: group
+            for group in GroupInfo.objects.values(
+                'id', 'group_name', 'group_teacher', 'teacher_phone', 'report_location'
+            )
+        }
+
+        return queryset.annotate(active_group_id=Subquery(active_group)), groups
+
+
 class ExcelTemplateGenerator:
     """Excel模板生成器"""
     
@@ -662,6 +914,7 @@ class ExcelTemplateGenerator:
             '分组教师': ['陈老师', '刘老师', '张老师'],
             '教师联系方式': ['13800138001', '13800138002', '13800138003'],
             '报到地点': ['教学楼A201', '教学楼B301', '教学楼C401'],
+            '容量': [45, 45, ''],
         }
         
         df = pd.DataFrame(data)
@@ -671,13 +924,14 @@ class ExcelTemplateGenerator:
             
             # 添加说明工作表
             instructions = pd.DataFrame({
-                '字段名': ['分组名称', '分组教师', '教师联系方式', '报到地点'],
-                '是否必填': ['是', '是', '是', '是'],
+                '字段名': ['分组名称', '分组教师', '教师联系方式', '报到地点', '容量'],
+                '是否必填': ['是', '是', '是', '是', '否'],
                 '说明': [
                     '分组名称，必须唯一',
                     '负责教师姓名',
                     '教师手机号码（11位）',
-                    '学生报到地点'
+                    '学生报到地点',
+                    '分组最多容纳的学生数，自动分组时使用，为空表示不限'
                 ]
             })
             instructions.to_excel(writer, index=False, sheet_name='导入说明')
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .cache import bump_model_versions
+from .models import Student
+from .portal import invalidate_group_portal_entries, invalidate_portal_entries
+
+
+# 删除操作统一经过 Tombstone.record 递增版本号，这里只处理保存；
+# 不注册 post_delete，以免 Django 放弃批量删除的快速路径
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender='groups.GroupInfo')
+@receiver(post_save, sender='groups.StudentGroupAssignment')
+def bump_data_version_on_save(sender, **kwargs):
+    """数据保存后递增对应的数据版本号"""
+    bump_model_versions(sender)
+
+
+@receiver(post_save, sender=Student)
+def invalidate_student_portal_entry(sender, instance, **kwargs):
+    """学生保存后删除其门户缓存及姓名+身份证后6位的查找缓存"""
+    invalidate_portal_entries([instance.pk], [(instance.name, instance.id_card_number)])
+
+
+@receiver(post_save, sender='groups.StudentGroupAssignment')
+def invalidate_assignment_portal_entry(sender, instance, **kwargs):
+    """分组分配保存后删除对应学生的门户缓存"""
+    invalidate_portal_entries([instance.student_id])
+
+
+@receiver(post_save, sender='groups.GroupInfo')
+def invalidate_group_portal_entry(sender, instance, created, **kwargs):
+    """分组信息修改后删除该分组下学生的门户缓存"""
+    if not created:
+        invalidate_group_portal_entries([instance.pk])
@@ -0,0 +1,605 @@
+import math
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum
+from .models import CompletionRollup, Student, StudentStatisticCounter
+
+
+# 计数器维度（按字段取值分组统计人数及身高体重之和）
+COUNTER_DIMENSIONS = ['gender', 'residence_status', 'uniform_purchase', 'info_status', 'import_batch']
+
+# 身高、体重按取值记录人数，用于计算最小值、最大值及分布
+HISTOGRAM_DIMENSIONS = ['height', 'weight']
+
+# 分布统计的联合计数维度：按（性别, 住校情况, 身高, 体重）及（性别, 住校情况, 出生日期）组合记录人数，
+# 无过滤条件时分布统计只读取这些计数行（行数与取值组合数有关，与学生人数无关）
+BODY_DIMENSION = 'body'
+BIRTH_DIMENSION = 'birth'
+DISTRIBUTION_DIMENSIONS = [BODY_DIMENSION, BIRTH_DIMENSION]
+
+# 计算计数器增量需要读取的字段（出生日期取自身份证号）
+TRACKED_FIELDS = COUNTER_DIMENSIONS + HISTOGRAM_DIMENSIONS + ['id_card_number']
+
+SUM_FIELDS = [
+    'height_count', 'height_sum', 'height_square_sum',
+    'weight_count', 'weight_sum', 'weight_square_sum',
+]
+
+_pending = threading.local()
+
+
+def _counter_key(dimension, value):
+    """将字段取值转换为计数器键"""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _birth_date(id_card_number):
+    """身份证第7-14位的出生日期（YYYYMMDD），无法识别时为空字符串"""
+    birth = (id_card_number or '')[6:14]
+    return birth if len(birth) == 8 and birth.isdigit() else ''
+
+
+def _joint_key(*values):
+    """联合计数维度的计数器键：各字段取值以 | 连接，空值为空字符串"""
+    return '|'.join('' if value is None else str(value) for value in values)
+
+
+def row_deltas(row, sign=1):
+    """计算单个学生（字段取值字典）对计数器的增量"""
+    values = Counter({'count': sign})
+    for field in HISTOGRAM_DIMENSIONS:
+        if row[field] is not None:
+            values[f'{field}_count'] += sign
+            values[f'{field}_sum'] += sign * row[field]
+            values[f'{field}_square_sum'] += sign * row[field] * row[field]
+
+    deltas = defaultdict(Counter)
+    deltas[('total', '')].update(values)
+    for dimension in COUNTER_DIMENSIONS:
+        deltas[(dimension, _counter_key(dimension, row[dimension]))].update(values)
+    for dimension in HISTOGRAM_DIMENSIONS:
+        if row[dimension] is not None:
+            deltas[(dimension, _counter_key(dimension, row[dimension]))]['count'] += sign
+
+    gender, residence_status = row['gender'], row['residence_status']
+    body_key = _joint_key(gender, residence_status, row['height'], row['weight'])
+    deltas[(BODY_DIMENSION, body_key)]['count'] += sign
+    deltas[(BIRTH_DIMENSION, _joint_key(gender, residence_status, _birth_date(row['id_card_number'])))]['count'] += sign
+    return deltas
+
+
+def merge_deltas(target, deltas):
+    """合并增量"""
+    for key, values in deltas.items():
+        target[key].update(values)
+    return target
+
+
+def queryset_deltas(queryset, sign=1, values=None):
+    """按维度分组聚合，计算一批学生对计数器的增量（每个维度一次查询）
+
+    values 为 {字段: SQL 表达式} 时按这些字段的新取值计算，用于在 UPDATE 之前得到更新后的增量。
+    """
+    values = values or {}
+
+    def field(name):
+        return values.get(name, F(name))
+
+    sums = {
+        'count': Count('id'),
+        'height_count': Count(field('height')),
+        'height_sum': Sum(field('height')),
+        'height_square_sum': Sum(field('height') * field('height')),
+        'weight_count': Count(field('weight')),
+        'weight_sum': Sum(field('weight')),
+        'weight_square_sum': Sum(field('weight') * field('weight')),
+    }
+    queryset = queryset.order_by()
+    deltas = defaultdict(Counter)
+
+    def add(key, row):
+        deltas[key].update({name: sign * (row[name] or 0) for name in sums})
+
+    total = queryset.aggregate(**sums)
+    if not total['count']:
+        return deltas
+    add(('total', ''), total)
+
+    for dimension in COUNTER_DIMENSIONS:
+        for row in queryset.values(value=field(dimension)).annotate(**sums):
+            add((dimension, _counter_key(dimension, row['value'])), row)
+
+    for dimension in HISTOGRAM_DIMENSIONS:
+        rows = queryset.values(value=field(dimension)).exclude(value__isnull=True).annotate(count=Count('id'))
+        for row in rows:
+            deltas[(dimension, _counter_key(dimension, row['value']))]['count'] += sign * row['count']
+
+    body_rows, birth_rows = _distribution_groups(queryset, field)
+    for *values, count in body_rows:
+        deltas[(BODY_DIMENSION, _joint_key(*values))]['count'] += sign * count
+    for *values, count in birth_rows:
+        deltas[(BIRTH_DIMENSION, _joint_key(*values))]['count'] += sign * count
+
+    return deltas
+
+
+def _distribution_groups(queryset, field=F):
+    """按分布统计的联合维度分组计数
+
+    返回 [(性别, 住校情况, 身高, 体重, 人数)] 及 [(性别, 住校情况, 出生日期, 人数)]，
+    身份证号无法识别出生日期的学生合并为出生日期为空字符串的一组。
+    """
+    from django.db.models.functions import Substr
+
+    queryset = queryset.order_by()
+    body_rows = list(
+        queryset.values_list(field('gender'), field('residence_status'), field('height'), field('weight'))
+        .annotate(count=Count('id'))
+    )
+
+    birth_rows = Counter()
+    rows = queryset.values_list(
+        field('gender'), field('residence_status'), Substr(field('id_card_number'), 1, 14)
+    ).annotate(count=Count('id'))
+    for gender, residence_status, prefix, count in rows:
+        birth_rows[(gender, residence_status, _birth_date(prefix))] += count
+
+    return body_rows, [(*key, count) for key, count in birth_rows.items()]
+
+
+def apply_deltas(deltas):
+    """将增量写入计数器表；处于批量模式时先暂存，批量结束后一次写入"""
+    pending = getattr(_pending, 'deltas', None)
+    if pending is not None:
+        merge_deltas(pending, deltas)
+        return
+
+    with transaction.atomic():
+        for (dimension, key), values in deltas.items():
+            _increment(StudentStatisticCounter, {'dimension': dimension, 'key': key}, values)
+
+
+def _increment(model, lookup, values):
+    """对唯一键对应的计数行做原子增量更新，行不存在时先创建"""
+    values = {field: value for field, value in values.items() if value}
+    if not values:
+        return
+
+    updates = {field: F(field) + value for field, value in values.items()}
+    rows = model.objects.filter(**lookup)
+    if not rows.update(**updates):
+        model.objects.bulk_create([model(**lookup)], ignore_conflicts=True)
+        rows.update(**updates)
+
+
+@contextmanager
+def batched_counter_updates():
+    """批量模式：合并期间产生的所有增量，结束时统一写入（应在同一事务内使用）"""
+    if getattr(_pending, 'deltas', None) is not None:
+        yield
+        return
+
+    _pending.deltas = defaultdict(Counter)
+    try:
+        yield
+        deltas = _pending.deltas
+    finally:
+        _pending.deltas = None
+    apply_deltas(deltas)
+
+
+def rebuild_counters():
+    """根据学生表重新计算全部计数器，返回与原计数器的差异"""
+    with transaction.atomic():
+        expected = queryset_deltas(Student.objects.all())
+        current = {
+            (row['dimension'], row['key']): row
+            for row in StudentStatisticCounter.objects.values('dimension', 'key', 'count', *SUM_FIELDS)
+        }
+
+        drift = []
+        for key in set(expected) | set(current):
+            expected_values = expected.get(key, Counter())
+            current_values = current.get(key, {})
+            for field in ['count'] + SUM_FIELDS:
+                if expected_values.get(field, 0) != current_values.get(field, 0):
+                    drift.append({
+                        'dimension': key[0],
+                        'key': key[1],
+                        'field': field,
+                        'expected': expected_values.get(field, 0),
+                        'actual': current_values.get(field, 0),
+                    })
+
+        StudentStatisticCounter.objects.all().delete()
+        StudentStatisticCounter.objects.bulk_create(
+            [
+                StudentStatisticCounter(dimension=dimension, key=key, **{
+                    field: value for field, value in values.items()
+                })
+                for (dimension, key), values in expected.items()
+            ],
+            batch_size=500
+        )
+
+    return sorted(drift, key=lambda item: (item['dimension'], item['key'], item['field']))
+
+
+def aggregate_statistics(queryset):
+    """对任意过滤后的学生集合进行一次聚合查询"""
+    aggregates = {
+        'total_students': Count('id'),
+        'male': Count('id', filter=Q(gender='M')),
+        'female': Count('id', filter=Q(gender='F')),
+        'resident': Count('id', filter=Q(residence_status='RESIDENT')),
+        'non_resident': Count('id', filter=Q(residence_status='NON_RESIDENT')),
+        'residence_unknown': Count('id', filter=Q(residence_status='UNKNOWN')),
+        'purchased': Count('id', filter=Q(uniform_purchase=True)),
+        'not_purchased': Count('id', filter=Q(uniform_purchase=False)),
+        'purchase_unknown': Count('id', filter=Q(uniform_purchase__isnull=True)),
+        'height_count': Count('height'),
+        'average_height': Avg('height'),
+        'min_height': Min('height'),
+        'max_height': Max('height'),
+        'height_square_avg': Avg(F('height') * F('height')),
+        'weight_count': Count('weight'),
+        'average_weight': Avg('weight'),
+        'min_weight': Min('weight'),
+        'max_weight': Max('weight'),
+        'weight_square_avg': Avg(F('weight') * F('weight')),
+        'import_batches': Count('import_batch', filter=~Q(import_batch=''), distinct=True),
+    }
+    for status_key, _ in Student.INFO_STATUS_CHOICES:
+        aggregates[f'status_{status_key}'] = Count('id', filter=Q(info_status=status_key))
+
+    stats = queryset.order_by().aggregate(**aggregates)
+
+    # 标准差由 E[x²] - E[x]² 计算，避免依赖数据库的 STDDEV 支持（SQLite 无原生实现）
+    for field in HISTOGRAM_DIMENSIONS:
+        mean, square_mean = stats[f'average_{field}'], stats[f'{field}_square_avg']
+        stats[f'{field}_stddev'] = math.sqrt(max(square_mean - mean * mean, 0)) if mean is not None else 0
+
+    return stats
+
+
+def _counter_rows():
+    return StudentStatisticCounter.objects.filter(count__gt=0).values('dimension', 'key', 'count', *SUM_FIELDS)
+
+
+def counter_statistics():
+    """从计数器表读取全量统计，耗时与学生人数无关"""
+    return _summarize_counters(_counter_rows())
+
+
+async def acounter_statistics():
+    """counter_statistics 的异步版本"""
+    return _summarize_counters([row async for row in _counter_rows()])
+
+
+def _summarize_counters(rows):
+    counters = defaultdict(dict)
+    for row in rows:
+        counters[row['dimension']][row['key']] = row
+
+    total = counters['total'].get('', {'count': 0, **{field: 0 for field in SUM_FIELDS}})
+
+    def count(dimension, key):
+        return counters[dimension].get(key, {}).get('count', 0)
+
+    stats = {
+        'total_students': total['count'],
+        'male': count('gender', 'M'),
+        'female': count('gender', 'F'),
+        'resident': count('residence_status', 'RESIDENT'),
+        'non_resident': count('residence_status', 'NON_RESIDENT'),
+        'residence_unknown': count('residence_status', 'UNKNOWN'),
+        'purchased': count('uniform_purchase', 'true'),
+        'not_purchased': count('uniform_purchase', 'false'),
+        'purchase_unknown': count('uniform_purchase', 'null'),
+        'import_batches': len([key for key in counters['import_batch'] if key]),
+    }
+    for status_key, _ in Student.INFO_STATUS_CHOICES:
+        stats[f'status_{status_key}'] = count('info_status', status_key)
+
+    for field in HISTOGRAM_DIMENSIONS:
+        n = total[f'{field}_count']
+        values = [int(key) for key in counters[field]]
+        mean = total[f'{field}_sum'] / n if n else None
+        stats[f'{field}_count'] = n
+        stats[f'average_{field}'] = mean
+        stats[f'min_{field}'] = min(values) if values else None
+        stats[f'max_{field}'] = max(values) if values else None
+        stats[f'{field}_stddev'] = (
+            math.sqrt(max(total[f'{field}_square_sum'] / n - mean * mean, 0)) if n else 0
+        )
+
+    return stats
+
+
+def format_statistics(stats):
+    """将扁平的统计结果整理为接口响应格式"""
+    return {
+        'total_students': stats['total_students'],
+        'gender_distribution': {
+            'male': stats['male'],
+            'female': stats['female']
+        },
+        'residence_distribution': {
+            'resident': stats['resident'],
+            'non_resident': stats['non_resident'],
+            'unknown': stats['residence_unknown']
+        },
+        'uniform_purchase': {
+            'purchased': stats['purchased'],
+            'not_purchased': stats['not_purchased'],
+            'unknown': stats['purchase_unknown']
+        },
+        'info_completion': {
+            status_key: stats[f'status_{status_key}']
+            for status_key, _ in Student.INFO_STATUS_CHOICES
+        },
+        'physical_stats': {
+            'average_height': round(stats['average_height'] or 0, 2),
+            'average_weight': round(stats['average_weight'] or 0, 2),
+            'height_count': stats['height_count'],
+            'weight_count': stats['weight_count'],
+            'min_height': stats['min_height'],
+            'max_height': stats['max_height'],
+            'height_stddev': round(stats['height_stddev'], 2),
+            'min_weight': stats['min_weight'],
+            'max_weight': stats['max_weight'],
+            'weight_stddev': round(stats['weight_stddev'], 2)
+        },
+        'import_batches': stats['import_batches']
+    }
+
+
+# 分布统计的直方图组距及百分位点
+DISTRIBUTION_BIN_WIDTHS = {'height': 5, 'weight': 5, 'bmi': 2, 'age': 1}
+DISTRIBUTION_PERCENTILES = [5, 10, 25, 50, 75, 90, 95]
+
+
+def _distribution_counts(queryset=None):
+    """读取分布统计的联合计数：{维度: [(计数器键, 人数)]}
+
+    queryset 为 None 时读取计数器表，否则对过滤后的学生分组计数后转换为相同的形式。
+    """
+    if queryset is None:
+        return {
+            dimension: list(
+                StudentStatisticCounter.objects.filter(dimension=dimension, count__gt=0).values_list('key', 'count')
+            )
+            for dimension in DISTRIBUTION_DIMENSIONS
+        }
+
+    body_rows, birth_rows = _distribution_groups(queryset)
+    return {
+        BODY_DIMENSION: [(_joint_key(*values), count) for *values, count in body_rows],
+        BIRTH_DIMENSION: [(_joint_key(*values), count) for *values, count in birth_rows],
+    }
+
+
+def _split_keys(rows, fields):
+    """将 [(计数器键, 人数)] 拆分为各字段的取值列表及人数数组（一次拼接再切分，避免逐行拆分）"""
+    keys, counts = zip(*rows) if rows else ((), ())
+    parts = '|'.join(keys).split('|') if keys else []
+    return [parts[index::fields] for index in range(fields)], np.array(counts, dtype=np.int64)
+
+
+def _numbers(values):
+    """取值列表转换为浮点数组，空值为 NaN"""
+    return np.array([float(value) if value else np.nan for value in values], dtype=float)
+
+
+def _distribution_arrays(queryset=None):
+    """将联合计数转换为 (取值数组, 人数数组) 形式的NumPy数组，每个取值组合一个元素"""
+    counts = _distribution_counts(queryset)
+
+    (genders, residences, heights, weights), body_counts = _split_keys(counts[BODY_DIMENSION], 4)
+    height = _numbers(heights)
+    weight = _numbers(weights)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bmi = weight / (height / 100) ** 2
+    body = {
+        'gender': np.array(genders, dtype='U1'),
+        'residence_status': np.array(residences, dtype='U12'),
+        'count': body_counts,
+        'metrics': {'height': height, 'weight': weight, 'bmi': bmi},
+    }
+
+    # 出生日期（YYYYMMDD）按当前日期计算周岁
+    (genders, residences, births), birth_counts = _split_keys(counts[BIRTH_DIMENSION], 3)
+    births = _numbers(births)
+    valid_birth = ~np.isnan(births)
+    birth_int = np.where(valid_birth, births, 0).astype(np.int64)
+    today = datetime.now()
+    age = today.year - birth_int // 10000 - ((today.month * 100 + today.day) < birth_int % 10000)
+    birth = {
+        'gender': np.array(genders, dtype='U1'),
+        'residence_status': np.array(residences, dtype='U12'),
+        'count': birth_counts,
+        'metrics': {'age': np.where(valid_birth, age, np.nan).astype(float)},
+    }
+    return body, birth
+
+
+def _sorted_metrics(arrays):
+    """去掉空值后按各指标取值排序；分组统计按掩码取子集时仍保持有序，每个指标只需排序一次"""
+    result = {}
+    for name, values in arrays['metrics'].items():
+        valid = np.flatnonzero(~np.isnan(values) & (arrays['count'] > 0))
+        order = valid[np.argsort(values[valid], kind='stable')]
+        result[name] = {
+            'values': values[order],
+            'count': arrays['count'][order],
+            'gender': arrays['gender'][order],
+            'residence_status': arrays['residence_status'][order],
+        }
+    return result
+
+
+def _summarize(values, weights, bin_width):
+    """计算一组按人数加权的数值的描述统计、百分位数及等宽直方图
+
+    values 须已按升序排列且不含空值；百分位数与对展开后的数组调用 np.percentile（线性插值）的结果相同。
+    """
+    n = int(weights.sum())
+    if n == 0:
+        return {'count': 0}
+
+    low = math.floor(values[0] / bin_width) * bin_width
+    high = max(math.ceil(values[-1] / bin_width) * bin_width, low + bin_width)
+    bins = round((high - low) / bin_width)
+    counts, edges = np.histogram(values, bins=bins, range=(low, high), weights=weights)
+    mean = float(values @ weights / n)
+    stddev = math.sqrt(float(((values - mean) ** 2) @ weights / n))
+
+    cumulative = np.cumsum(weights)
+    ranks = np.asarray(DISTRIBUTION_PERCENTILES, dtype=float) / 100 * (n - 1)
+    lower = values[np.searchsorted(cumulative, np.floor(ranks), side='right')]
+    upper = values[np.searchsorted(cumulative, np.ceil(ranks), side='right')]
+    percentiles = lower + (ranks - np.floor(ranks)) * (upper - lower)
+
+    return {
+        'count': n,
+        'mean': round(mean, 2),
+        'stddev': round(stddev, 2),
+        'min': round(float(values[0]), 2),
+        'max': round(float(values[-1]), 2),
+        'percentiles': {
+            f'p{point}': round(float(value), 2)
+            for point, value in zip(DISTRIBUTION_PERCENTILES, percentiles)
+        },
+        'histogram': {
+            'bin_edges': [round(float(edge), 2) for edge in edges],
+            'counts': [int(count) for count in counts],
+        },
+    }
+
+
+def distribution_statistics(queryset=None):
+    """身高、体重、BMI、年龄的分布统计（整体及按性别、住校情况分组）
+
+    queryset 为 None 时读取增量维护的联合计数行，耗时与取值组合数有关而与学生人数无关；
+    否则对过滤后的学生做两次分组计数查询。两种方式都只在（取值, 人数）上做加权计算。
+    """
+    body, birth = _distribution_arrays(queryset)
+    metrics = {**_sorted_metrics(body), **_sorted_metrics(birth)}
+
+    def summarize(dimension=None, key=None):
+        summaries = {}
+        for name, arrays in metrics.items():
+            values, weights = arrays['values'], arrays['count']
+            if dimension is not None:
+                mask = arrays[dimension] == key
+                values, weights = values[mask], weights[mask]
+            summaries[name] = _summarize(values, weights, DISTRIBUTION_BIN_WIDTHS[name])
+        return summaries
+
+    result = {
+        'total_students': int(body['count'].sum()),
+        'metrics': summarize(),
+        'breakdowns': {},
+    }
+
+    choices = {
+        'gender': [key for key, _ in Student.GENDER_CHOICES],
+        'residence_status': [key for key, _ in Student.RESIDENCE_CHOICES],
+    }
+    for dimension, keys in choices.items():
+        result['breakdowns'][dimension] = {}
+        for key in keys:
+            result['breakdowns'][dimension][key] = {
+                'total_students': int(body['count'][body[dimension] == key].sum()),
+                **summarize(dimension, key),
+            }
+
+    return result
+
+
+# 资料完成时间序列的时间粒度
+COMPLETION_GRANULARITIES = ['hour', 'day']
+
+
+def _completion_buckets(completed_at):
+    """计算完成时间所在的小时、天时间段起点（按本地时区）"""
+    from django.utils import timezone
+
+    local = timezone.localtime(completed_at)
+    hour = local.replace(minute=0, second=0, microsecond=0)
+    return {'hour': hour, 'day': hour.replace(hour=0)}
+
+
+def record_completions(completions):
+    """累加资料完成事件，completions 为 (完成时间, 导入批次, 分组ID列表) 的序列"""
+    counts = Counter()
+    for completed_at, import_batch, group_ids in completions:
+        keys = [('all', '')]
+        if import_batch:
+            keys.append(('batch', import_batch))
+        keys.extend(('group', str(group_id)) for group_id in group_ids)
+
+        for granularity, bucket in _completion_buckets(completed_at).items():
+            for dimension, key in keys:
+                counts[(granularity, bucket, dimension, key)] += 1
+
+    with transaction.atomic():
+        for (granularity, bucket, dimension, key), count in counts.items():
+            _increment(CompletionRollup, {
+                'granularity': granularity, 'bucket': bucket, 'dimension': dimension, 'key': key
+            }, {'count': count})
+
+
+def rebuild_completion_rollups():
+    """根据学生的资料完成时间重建时间序列汇总表，返回写入的行数
+
+    分组维度按学生当前的有效分组统计。
+    """
+    from django.db.models.functions import TruncDay, TruncHour
+    from groups.models import StudentGroupAssignment
+
+    truncs = {'hour': TruncHour, 'day': TruncDay}
+    completed = Student.objects.filter(profile_completed_at__isnull=False).order_by()
+    assignments = StudentGroupAssignment.objects.filter(
+        is_active=True, student__profile_completed_at__isnull=False
+    ).order_by()
+
+    rollups = []
+    for granularity, trunc in truncs.items():
+        rows = completed.annotate(bucket=trunc('profile_completed_at')).values('bucket').annotate(count=Count('id'))
+        rollups.extend(
+            CompletionRollup(granularity=granularity, bucket=row['bucket'], dimension='all', key='', count=row['count'])
+            for row in rows
+        )
+
+        rows = completed.exclude(import_batch='').annotate(
+            bucket=trunc('profile_completed_at')
+        ).values('bucket', 'import_batch').annotate(count=Count('id'))
+        rollups.extend(
+            CompletionRollup(granularity=granularity, bucket=row['bucket'], dimension='batch',
+                             key=row['import_batch'], count=row['count'])
+            for row in rows
+        )
+
+        rows = assignments.annotate(
+            bucket=trunc('student__profile_completed_at')
+        ).values('bucket', 'group_info_id').annotate(count=Count('student_id', distinct=True))
+        rollups.extend(
+            CompletionRollup(granularity=granularity, bucket=row['bucket'], dimension='group',
+                             key=str(row['group_info_id']), count=row['count'])
+            for row in rows
+        )
+
+    with transaction.atomic():
+        CompletionRollup.objects.all().delete()
+        CompletionRollup.objects.bulk_create(rollups, batch_size=500)
+
+    return len(rollups)
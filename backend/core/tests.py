@@ -1,3 +1,1152 @@
-from django.test import TestCase
+import decimal
+import json
+import threading
+import time
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+import pandas as pd
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.permissions import BasePermission
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework.throttling import SimpleRateThrottle
+from groups.models import GroupInfo, StudentGroupAssignment
+from siqcs_backend.db_router import (
+    REPLICA_DB_ALIAS, REPLICA_PIN_COOKIE, ReadReplicaRouter, ReplicaRoutingMiddleware, read_replica
+)
+from .cache import bump_versions, get_data_versions
+from .db import retry_on_locked
+from .filters import parse_timestamp
+from .portal import ACCESS_TOKEN_MAX_AGE, invalidate_portal_entries, make_access_token, read_access_token
+from .renderers import FastJSONRenderer, msgpack, orjson
+from .models import CompletionRollup, Student, ThrottleBucket, Tombstone
+from .serializers import StudentBulkListSerializer
+from .services import StudentExportService, StudentImportService, StudentProfileBulkUpdateService
+from .statistics import (
+    aggregate_statistics, counter_statistics, distribution_statistics, rebuild_completion_rollups, rebuild_counters
+)
+from .throttling import PortalIPThrottle
+from .views import StudentViewSet
 
-# Create your tests here.
+
+# 测试使用进程内缓存，避免与开发环境的文件缓存互相影响
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'siqcs-test-{alias}'}
+    for alias in ('default', 'portal')
+}
+
+
+def id_card(index, gender='M'):
+    """生成第 index 个测试学生的身份证号（出生日期有效，第17位决定性别）"""
+    gender_digit = 1 if gender == 'M' else 2
+    return f'{320101 + index // 1000:06d}2006{index % 12 + 1:02d}{index % 28 + 1:02d}{index % 100:02d}{gender_digit}X'
+
+
+def make_group(index, **fields):
+    return GroupInfo.objects.create(
+        group_name=f'第{index}组', group_teacher=f'教师{index}', teacher_phone='13800000000',
+        report_location=f'教学楼{index}', **fields
+    )
+
+
+def make_student(index, gender='M', **fields):
+    return Student.objects.create(
+        name=f'学生{index}', id_card_number=id_card(index, gender),
+        notification_number=f'N{index:06d}', **fields
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SIQCSTestCase(APITestCase):
+    """清空各缓存的测试基类（数据库回滚后数据版本号会重复，缓存必须一并清空）"""
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+
+class StudentExportTests(SIQCSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = [make_student(index) for index in range(25)]
+
+    def test_iter_rows_pages_by_primary_key(self):
+        rows = list(StudentExportService(Student.objects.all(), chunk_size=10).iter_rows())
+        self.assertEqual([row['id'] for row in rows], sorted(student.pk for student in self.students))
+
+    def test_rows_created_during_export_are_excluded(self):
+        rows = StudentExportService(Student.objects.all(), chunk_size=10).iter_rows()
+        first = next(rows)
+        late = make_student(999)
+        exported = [first['id']] + [row['id'] for row in rows]
+        self.assertEqual(len(exported), 25)
+        self.assertNotIn(late.pk, exported)
+
+    def test_changes_during_export_are_caught_up_with_updated_since(self):
+        service = StudentExportService(Student.objects.all(), chunk_size=10)
+        rows = service.iter_rows()
+        first = next(rows)
+        changed, deleted_id = self.students[-1], self.students[-2].pk
+        changed.height = 180
+        changed.save()
+        self.students[-2].delete()
+        exported = [first] + list(rows)
+        self.assertEqual(len(exported), 24)
+
+        since = service.started_at.isoformat()
+        response = self.client.get('/api/students/', {'updated_since': since})
+        self.assertEqual([row['id'] for row in response.json()['results']], [changed.pk])
+        response = self.client.get('/api/tombstones/', {'updated_since': since})
+        self.assertIn(deleted_id, [row['object_id'] for row in response.json()['results']])
+
+    def test_endpoint_streams_ndjson_with_filters(self):
+        make_student(100, import_batch='其他批次')
+        response = self.client.get('/api/students/export/', {'search': '其他批次'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        self.assertIsNotNone(parse_timestamp(response['X-Export-Started-At']))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['学生100'])
+
+
+class ParseTimestampTests(SIQCSTestCase):
+    def test_iso_datetime_and_date(self):
+        self.assertEqual(
+            parse_timestamp('2025-08-01T08:00:00+08:00'), datetime(2025, 8, 1, tzinfo=dt_timezone.utc)
+        )
+        parsed = parse_timestamp('2025-08-01')
+        self.assertEqual(timezone.localtime(parsed).replace(tzinfo=None), datetime(2025, 8, 1))
+
+    def test_unix_timestamp(self):
+        self.assertEqual(parse_timestamp('1754006400'), datetime(2025, 8, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(parse_timestamp('1754006400.5').microsecond, 500000)
+
+    def test_short_numbers_are_not_read_as_unix_seconds(self):
+        self.assertEqual(timezone.localtime(parse_timestamp('20240101')).date().isoformat(), '2024-01-01')
+        for value in ['2024', '0', '86400', 'yesterday', '2025-13-01']:
+            with self.subTest(value=value), self.assertRaises(serializers.ValidationError):
+                parse_timestamp(value)
+
+
+class ChangeFeedTests(SIQCSTestCase):
+    def test_updated_since_returns_changed_students(self):
+        old = make_student(1)
+        Student.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        new = make_student(2)
+        since = (timezone.now() - timedelta(hours=1)).isoformat()
+
+        response = self.client.get('/api/students/', {'updated_since': since})
+        self.assertEqual([row['id'] for row in response.json()['results']], [new.pk])
+        self.assertEqual(self.client.get('/api/students/', {'updated_since': '2024'}).status_code, 400)
+
+    def test_deletes_record_tombstones(self):
+        students = [make_student(index) for index in range(3)]
+        group = make_group(1)
+        assignment = StudentGroupAssignment.objects.create(student=students[0], group_info=group)
+        student_ids = [student.pk for student in students]
+        since = timezone.now().isoformat()
+
+        students[0].delete()
+        Student.objects.filter(pk=students[1].pk).delete()
+
+        response = self.client.get('/api/tombstones/', {'updated_since': since})
+        recorded = {(row['kind'], row['object_id']) for row in response.json()['results']}
+        self.assertEqual(recorded, {
+            ('student', student_ids[0]), ('student', student_ids[1]), ('assignment', assignment.pk),
+        })
+
+        response = self.client.get('/api/tombstones/', {'updated_since': timezone.now().isoformat()})
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(Tombstone.objects.filter(kind='student').count(), 2)
+
+
+
+class DataVersionTests(SIQCSTestCase):
+    def versions(self):
+        return {name: version for name, (version, _) in get_data_versions(['student', 'group']).items()}
+
+    def test_bumps_in_one_transaction_are_coalesced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for index in range(5):
+                    bump_versions('student')
+                bump_versions('group', 'student')
+        self.assertEqual(self.versions(), {'student': 1, 'group': 1})
+
+    def test_bump_waits_for_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            bump_versions('student')
+        self.assertEqual(self.versions()['student'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.versions()['student'], 1)
+
+    def test_rolled_back_savepoint_does_not_lose_outer_bump(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        bump_versions('group')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                bump_versions('student')
+        self.assertEqual(self.versions(), {'student': 1, 'group': 0})
+
+        # 之后的事务再次登记同一名称时正常递增
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                bump_versions('group')
+        self.assertEqual(self.versions(), {'student': 1, 'group': 1})
+
+    def test_rolled_back_transaction_does_not_bump(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    bump_versions('student')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.versions()['student'], 0)
+
+    def test_cached_group_list_is_invalidated_by_writes(self):
+        make_group(1)
+        self.assertEqual(self.client.get('/api/groups/').json()['count'], 1)
+        GroupInfo.objects.filter(pk__gt=0).update(group_name='绕过版本号的修改')
+        # 命中缓存，仍为旧数据
+        self.assertEqual(self.client.get('/api/groups/').json()['results'][0]['group_name'], '第1组')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_group(2)
+        self.assertEqual(self.client.get('/api/groups/').json()['count'], 2)
+
+
+class ConditionalGetTests(SIQCSTestCase):
+    def test_unchanged_list_returns_304_until_a_write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            student = make_student(1)
+        response = self.client.get('/api/students/')
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/students/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        student.height = 170
+        with self.captureOnCommitCallbacks(execute=True):
+            student.save()
+        response = self.client.get('/api/students/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_and_statistics_support_if_none_match(self):
+        student = make_student(1)
+        for url in [f'/api/students/{student.pk}/', '/api/students/statistics/', '/api/groups/']:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_etag_varies_with_path_query_and_media_type(self):
+        make_student(1)
+        etag = self.client.get('/api/students/?ordering=name&gender=M')['ETag']
+        self.assertEqual(self.client.get('/api/students/?gender=M&ordering=name')['ETag'], etag)
+
+        variants = [
+            '/api/students/?ordering=name',
+            '/api/students/?ordering=-name&gender=M',
+            '/api/students/statistics/?ordering=name&gender=M',
+        ]
+        for url in variants:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+        accepts = ['application/json', 'application/json; indent=2']
+        if msgpack is not None:
+            accepts.append('application/msgpack')
+        etags = {self.client.get('/api/students/', HTTP_ACCEPT=accept)['ETag'] for accept in accepts}
+        self.assertEqual(len(etags), len(accepts))
+        response = self.client.get('/api/assignments/?format=compact')
+        self.assertNotEqual(self.client.get('/api/assignments/')['ETag'], response['ETag'])
+
+    def test_assignment_changes_invalidate_group_list(self):
+        group = make_group(1)
+        etag = self.client.get('/api/groups/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentGroupAssignment.objects.create(student=make_student(1), group_info=group)
+        self.assertEqual(self.client.get('/api/groups/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class StatisticCounterTests(SIQCSTestCase):
+    def assertCountersMatch(self):
+        """计数器汇总的统计与直接聚合学生表的结果一致，且重建计数器时没有偏差"""
+        expected = aggregate_statistics(Student.objects.all())
+        actual = counter_statistics()
+        for key, value in actual.items():
+            with self.subTest(key=key):
+                if isinstance(value, float):
+                    self.assertAlmostEqual(value, expected[key], places=6)
+                else:
+                    self.assertEqual(value, expected[key])
+        self.assertEqual(distribution_statistics(), distribution_statistics(Student.objects.all()))
+        self.assertEqual(rebuild_counters(), [])
+
+    def test_counters_follow_save_bulk_operations_and_delete(self):
+        students = [make_student(index, gender='MF'[index % 2], import_batch='甲') for index in range(6)]
+        students[0].height, students[0].weight, students[0].residence_status = 170, 60, 'RESIDENT'
+        students[0].save()
+        self.assertCountersMatch()
+
+        response = self.client.post('/api/students/bulk_create/', [
+            {'name': f'批量{index}', 'id_card_number': id_card(100 + index), 'notification_number': f'B{index}',
+             'height': 160 + index}
+            for index in range(5)
+        ], format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        created_ids = [row['id'] for row in response.json()]
+        self.assertCountersMatch()
+
+        response = self.client.post('/api/students/bulk_update_profiles/', [
+            {'id': students[1].pk, 'fields': {'height': 180, 'weight': 70, 'residence_status': 'RESIDENT',
+                                              'uniform_purchase': True}},
+            {'id': students[2].pk, 'fields': {'weight': 45}},
+        ], format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCountersMatch()
+
+        response = self.client.post('/api/students/bulk_update_profiles/', {
+            'filter': {'ids': created_ids}, 'fields': {'uniform_purchase': False},
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCountersMatch()
+
+        students[3].delete()
+        Student.objects.filter(pk=students[4].pk).delete()
+        response = self.client.delete('/api/students/bulk_delete/', {'student_ids': created_ids}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCountersMatch()
+        self.assertEqual(counter_statistics()['total_students'], 4)
+
+    def test_save_with_update_fields_only_counts_written_fields(self):
+        student = make_student(1, height=170, weight=60)
+        stale = Student.objects.get(pk=student.pk)
+        student.weight = 65
+        student.save()
+
+        # stale 中的体重仍是旧值，但只写入身高
+        stale.height = 175
+        stale.save(update_fields=['height'])
+        self.assertEqual(Student.objects.values_list('height', 'weight').get(pk=student.pk), (175, 65))
+        self.assertCountersMatch()
+
+        stale = Student.objects.get(pk=student.pk)
+        stale.residence_status, stale.uniform_purchase = 'RESIDENT', True
+        stale.weight = 80
+        stale.save(update_fields=['residence_status', 'uniform_purchase', 'info_status'])
+        student.refresh_from_db()
+        self.assertEqual((student.info_status, student.weight), ('COMPLETE', 65))
+        self.assertIsNotNone(student.profile_completed_at)
+        self.assertCountersMatch()
+        self.assertEqual(sum(CompletionRollup.objects.filter(
+            granularity='day', dimension='all'
+        ).values_list('count', flat=True)), 1)
+
+
+class DistributionStatisticsTests(SIQCSTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(40):
+            filled = index % 5 != 0
+            make_student(
+                index, gender='MF'[index % 2], residence_status=['RESIDENT', 'NON_RESIDENT', 'UNKNOWN'][index % 3],
+                height=150 + index % 7 * 6 if filled else None, weight=45 + index % 4 * 9 if filled else None,
+            )
+
+    def test_counters_match_numpy_on_expanded_values(self):
+        stats = distribution_statistics()
+        self.assertEqual(stats['total_students'], 40)
+
+        students = Student.objects.exclude(height__isnull=True)
+        for name in ['height', 'weight']:
+            values = np.array(students.values_list(name, flat=True), dtype=float)
+            summary = stats['metrics'][name]
+            with self.subTest(metric=name):
+                self.assertEqual(summary['count'], values.size)
+                self.assertEqual(summary['mean'], round(float(values.mean()), 2))
+                self.assertEqual(summary['stddev'], round(float(values.std()), 2))
+                points = [5, 10, 25, 50, 75, 90, 95]
+                self.assertEqual(summary['percentiles'], {
+                    f'p{point}': round(float(value), 2) for point, value in zip(points, np.percentile(values, points))
+                })
+                counts, _ = np.histogram(values, bins=summary['histogram']['bin_edges'])
+                self.assertEqual(summary['histogram']['counts'], counts.tolist())
+
+        self.assertEqual(stats['metrics']['age']['count'], 40)
+        self.assertEqual(stats['breakdowns']['gender']['F']['total_students'], 20)
+        self.assertEqual(
+            stats['breakdowns']['residence_status']['RESIDENT']['height']['count'],
+            Student.objects.filter(residence_status='RESIDENT', height__isnull=False).count()
+        )
+
+    def test_endpoint_reads_counters_without_filters(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/students/distributions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'FROM "core_student"' in query['sql']])
+        self.assertEqual(response.json(), json.loads(JSONRenderer().render(distribution_statistics())))
+
+        response = self.client.get('/api/students/distributions/', {'gender': 'F'})
+        self.assertEqual(response.json()['total_students'], 20)
+        self.assertEqual(response.json()['breakdowns']['gender']['M']['total_students'], 0)
+
+
+class CompletionRollupTests(SIQCSTestCase):
+    COMPLETE = {'residence_status': 'RESIDENT', 'height': 170, 'weight': 60, 'uniform_purchase': True}
+
+    def rollups(self):
+        return sorted(CompletionRollup.objects.values_list('granularity', 'bucket', 'dimension', 'key', 'count'))
+
+    def test_completions_are_counted_once_per_dimension(self):
+        group = make_group(1)
+        students = [make_student(index, import_batch='甲') for index in range(3)]
+        StudentGroupAssignment.objects.create(student=students[0], group_info=group)
+
+        for student in students[:2]:
+            for field, value in self.COMPLETE.items():
+                setattr(student, field, value)
+            student.save()
+        # 已完整的学生再次保存不重复计数
+        students[0].save()
+        make_student(10, **self.COMPLETE)
+
+        response = self.client.get('/api/students/completion_timeseries/', {'granularity': 'day'})
+        self.assertEqual([series['total'] for series in response.json()['series']], [3])
+        response = self.client.get('/api/students/completion_timeseries/', {'by': 'batch'})
+        self.assertEqual(
+            [(series['key'], series['total']) for series in response.json()['series']], [('甲', 2)]
+        )
+        response = self.client.get('/api/students/completion_timeseries/', {'group': group.pk})
+        self.assertEqual([series['total'] for series in response.json()['series']], [1])
+
+        incremental = self.rollups()
+        rebuild_completion_rollups()
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_invalid_parameters_return_400(self):
+        for params in [{'granularity': 'week'}, {'by': 'gender'}, {'start': '2024'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/students/completion_timeseries/', params).status_code, 400)
+
+
+class ProfileStatusTests(SIQCSTestCase):
+    """统一设置资料时 SQL 计算的信息完整度与 Student._calculate_info_status 一致"""
+
+    # 各字段的 (有值, 无值)
+    FIELD_VALUES = {
+        'residence_status': ('RESIDENT', 'UNKNOWN'),
+        'height': (170, None),
+        'weight': (60, None),
+        'uniform_purchase': (False, None),
+    }
+    ABSENT = object()
+
+    def setUp(self):
+        super().setUp()
+        self.completed_at = timezone.now() - timedelta(days=1)
+        # 每个字段有值或无值的全部 16 种组合
+        for index, filled in enumerate(product([True, False], repeat=len(self.FIELD_VALUES))):
+            student = make_student(index, import_batch='甲', **{
+                field: choices[0 if is_filled else 1]
+                for (field, choices), is_filled in zip(self.FIELD_VALUES.items(), filled)
+            })
+            if student.info_status == 'COMPLETE':
+                Student.objects.filter(pk=student.pk).update(profile_completed_at=self.completed_at)
+        self.before = {row['pk']: row for row in Student.objects.values('pk', 'info_status', *self.FIELD_VALUES)}
+
+    def value_choices(self):
+        """每个字段不设置、设为有值或设为无值的全部 81 种 values"""
+        for choices in product(*[(self.ABSENT, *values) for values in self.FIELD_VALUES.values()]):
+            yield {field: value for field, value in zip(self.FIELD_VALUES, choices) if value is not self.ABSENT}
+
+    def expected(self, row, values):
+        merged = {field: row[field] for field in self.FIELD_VALUES}
+        merged.update(values)
+        return Student(**merged)._calculate_info_status()
+
+    def test_sql_rules_match_python_rules(self):
+        now = timezone.now()
+        for values in self.value_choices():
+            with self.subTest(values=values), transaction.atomic():
+                self.assertEqual(Student.objects.update_profiles(values, now), 16)
+                for row in Student.objects.values('pk', 'info_status', 'profile_completed_at', 'updated_at'):
+                    before = self.before[row['pk']]
+                    status = self.expected(before, values)
+                    self.assertEqual(row['info_status'], status)
+                    self.assertEqual(row['updated_at'], now)
+                    # 资料完成时间只在变为完整时设置，之后不再清除（与 Student.save 相同）
+                    if before['info_status'] == 'COMPLETE':
+                        self.assertEqual(row['profile_completed_at'], self.completed_at)
+                    elif status == 'COMPLETE':
+                        self.assertEqual(row['profile_completed_at'], now)
+                    else:
+                        self.assertIsNone(row['profile_completed_at'])
+                transaction.set_rollback(True)
+
+    def test_bulk_update_keeps_counters_and_completions_consistent(self):
+        for values in self.value_choices():
+            with self.subTest(values=values), transaction.atomic():
+                expected_completed = sum(
+                    row['info_status'] != 'COMPLETE' and self.expected(row, values) == 'COMPLETE'
+                    for row in self.before.values()
+                )
+                completions = CompletionRollup.objects.filter(granularity='day', dimension='batch', key='甲')
+                recorded = sum(completions.values_list('count', flat=True))
+                result = StudentProfileBulkUpdateService().update_matching(Student.objects.all(), values)
+                self.assertEqual(result, {'updated_count': 16, 'completed_count': expected_completed})
+                self.assertEqual(rebuild_counters(), [])
+                self.assertEqual(sum(completions.values_list('count', flat=True)) - recorded, expected_completed)
+                transaction.set_rollback(True)
+
+    def test_update_each_matches_update_matching(self):
+        values = {'height': 175, 'uniform_purchase': None}
+        StudentProfileBulkUpdateService().update_each([{'id': pk, 'fields': values} for pk in self.before])
+        each = dict(Student.objects.values_list('pk', 'info_status'))
+        self.assertEqual(rebuild_counters(), [])
+        self.assertEqual(each, {pk: self.expected(row, values) for pk, row in self.before.items()})
+
+
+class PortalAccessTests(SIQCSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = make_student(7)
+        self.group = make_group(1)
+        StudentGroupAssignment.objects.create(student=self.student, group_info=self.group)
+
+    def lookup(self, **data):
+        data = {'name': self.student.name, 'id_suffix': self.student.id_suffix, **data}
+        return self.client.post('/api/students/lookup_by_name_and_id_suffix/', data, format='json')
+
+    def test_lookup_issues_token_that_verifies(self):
+        response = self.lookup()
+        self.assertEqual(response.status_code, 200)
+        token = response.json()['access_token']
+        self.assertEqual(read_access_token(token), {'s': self.student.pk})
+
+        response = self.client.get('/api/students/verify_access/', {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['student']['id'], self.student.pk)
+
+    def test_lookup_distinguishes_not_found_and_ambiguous(self):
+        self.assertEqual(self.lookup(name='不存在').status_code, 404)
+        Student.objects.create(
+            name=self.student.name, id_card_number='1101012006' + self.student.id_card_number[10:],
+            notification_number='N-duplicate'
+        )
+        self.assertEqual(self.lookup().status_code, 400)
+
+    def test_forged_and_expired_tokens_are_rejected_without_queries(self):
+        token = make_access_token({'student': {'id': self.student.pk}, 'groups': []})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/students/verify_access/', {'token': token + 'x'}).status_code, 403)
+        # 只有限流令牌桶的读写，不查询学生数据
+        self.assertEqual([query['sql'] for query in queries if 'core_throttlebucket' not in query['sql']
+                          and 'SAVEPOINT' not in query['sql']], [])
+        forged = signing.dumps({'s': self.student.pk}, salt='other-salt')
+        with self.assertRaises(signing.BadSignature):
+            read_access_token(forged)
+
+        issued = time.time() - ACCESS_TOKEN_MAX_AGE - 1
+        with mock.patch('django.core.signing.time.time', return_value=issued):
+            expired = make_access_token({'student': {'id': self.student.pk}, 'groups': []})
+        with self.assertRaises(signing.SignatureExpired):
+            read_access_token(expired)
+        self.assertEqual(self.client.get('/api/students/verify_access/', {'token': expired}).status_code, 403)
+
+    def test_portal_entry_is_invalidated_on_commit(self):
+        response = self.client.get(f'/api/students/{self.student.pk}/groups/')
+        self.assertEqual(len(response.json()['groups']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentGroupAssignment.objects.filter(student=self.student).update(is_active=False)
+            invalidate_portal_entries([self.student.pk])
+        self.assertEqual(self.client.get(f'/api/students/{self.student.pk}/groups/').json()['groups'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.name = '改名'
+            self.student.save()
+        self.assertEqual(self.lookup(name='改名').json()['student']['name'], '改名')
+
+    def test_groups_action_uses_view_queryset_and_permissions(self):
+        class DenyObject(BasePermission):
+            def has_object_permission(self, request, view, obj):
+                return False
+
+        url = f'/api/students/{self.student.pk}/groups/'
+        with mock.patch.object(StudentViewSet, 'get_queryset', return_value=Student.objects.none()):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        with mock.patch.object(StudentViewSet, 'permission_classes', [DenyObject]):
+            self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get('/api/students/abc/groups/').status_code, 404)
+
+
+class PortalThrottleTests(SIQCSTestCase):
+    rates = {'portal_ip': '2/min', 'portal_global': '1000/s'}
+
+    def verify(self):
+        return self.client.get('/api/students/verify_access/', {'token': 'invalid'})
+
+    def test_ip_bucket_returns_429_with_retry_after(self):
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', self.rates):
+            self.assertEqual([self.verify().status_code for _ in range(2)], [403, 403])
+            response = self.verify()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_locked_database_lets_the_request_through(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.2')
+        throttle = PortalIPThrottle()
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'portal_ip': '1/min'}), \
+                mock.patch.object(ThrottleBucket.objects, 'using', side_effect=OperationalError('database is locked')):
+            self.assertTrue(throttle.allow_request(request, None))
+            self.assertTrue(throttle.allow_request(request, None))
+        self.assertEqual(throttle.wait(), 0)
+
+        with mock.patch.object(ThrottleBucket.objects, 'using', side_effect=OperationalError('no such table')):
+            with self.assertRaises(OperationalError):
+                throttle.allow_request(request, None)
+
+    def test_bucket_refills_over_time(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.3')
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'portal_ip': '2/min'}), \
+                mock.patch.object(PortalIPThrottle, 'timer', side_effect=[0, 0, 1, 31]):
+            self.assertEqual([PortalIPThrottle().allow_request(request, None) for _ in range(4)], [True, True, False, True])
+        self.assertEqual(ThrottleBucket.objects.count(), 1)
+
+    def test_concurrency_limit_returns_503(self):
+        semaphore = threading.BoundedSemaphore(1)
+        semaphore.acquire()
+        with mock.patch('core.throttling.get_concurrency_semaphore', return_value=semaphore):
+            response = self.verify()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+        semaphore.release()
+        with mock.patch('core.throttling.get_concurrency_semaphore', return_value=semaphore):
+            self.assertEqual(self.verify().status_code, 403)
+
+
+class PortalThrottleConcurrencyTests(TransactionTestCase):
+    """多个连接同时扣减同一个令牌桶需要真实提交的事务"""
+
+    def test_concurrent_requests_never_exceed_capacity(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+        barrier = threading.Barrier(20)
+
+        def attempt():
+            barrier.wait()
+            try:
+                return PortalIPThrottle().allow_request(request, None)
+            finally:
+                connections.close_all()
+
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'portal_ip': '5/min'}):
+            with ThreadPoolExecutor(20) as executor:
+                results = list(executor.map(lambda _: attempt(), range(20)))
+        self.assertEqual(results.count(True), 5)
+        self.assertLess(ThrottleBucket.objects.get().tokens, 1)
+
+
+class AsyncPortalTests(SIQCSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = make_student(11, height=170, weight=60)
+        self.group = make_group(1)
+        StudentGroupAssignment.objects.create(student=self.student, group_info=self.group)
+
+    def post_lookup(self, body):
+        return self.client.generic('POST', '/api/async/students/lookup_by_name_and_id_suffix/', body,
+                                   content_type='application/json')
+
+    def test_malformed_bodies_return_400(self):
+        for body in [b'[1, 2]', b'"text"', b'null', b'{"name": ', '{"name": "学生"}'.encode('gbk')]:
+            with self.subTest(body=body):
+                self.assertEqual(self.post_lookup(body).status_code, 400)
+
+    def test_responses_match_sync_endpoints(self):
+        data = {'name': self.student.name, 'id_suffix': self.student.id_suffix}
+        response = self.post_lookup(json.dumps(data))
+        self.assertEqual(response.status_code, 200)
+        sync = self.client.post('/api/students/lookup_by_name_and_id_suffix/', data, format='json').json()
+        self.assertEqual(response.json()['student'], sync['student'])
+        token = response.json()['access_token']
+        self.assertEqual(read_access_token(token), {'s': self.student.pk})
+
+        pairs = [
+            (f'/api/async/students/verify_access/?token={token}', f'/api/students/verify_access/?token={token}'),
+            (f'/api/async/students/{self.student.pk}/groups/', f'/api/students/{self.student.pk}/groups/'),
+            ('/api/async/students/statistics/', '/api/students/statistics/'),
+        ]
+        for async_url, sync_url in pairs:
+            with self.subTest(url=async_url):
+                self.assertEqual(self.client.get(async_url).json(), self.client.get(sync_url).json())
+
+    def test_throttled_request_returns_429(self):
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'portal_ip': '1/min', 'portal_global': '1000/s'}):
+            self.assertEqual(self.client.get('/api/async/students/verify_access/').status_code, 400)
+            response = self.client.get('/api/async/students/verify_access/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+
+class RetryOnLockedTests(SIQCSTestCase):
+    def test_retries_locked_errors_with_backoff(self):
+        calls = mock.Mock(side_effect=[OperationalError('database is locked')] * 2 + ['done'])
+        with mock.patch('core.db.time.sleep') as sleep, mock.patch.object(
+            transaction.get_connection(), 'in_atomic_block', False
+        ):
+            self.assertEqual(retry_on_locked(calls)(), 'done')
+        self.assertEqual(calls.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_other_errors_and_nested_calls_are_not_retried(self):
+        calls = mock.Mock(side_effect=OperationalError('no such table'))
+        with mock.patch('core.db.time.sleep'), mock.patch.object(
+            transaction.get_connection(), 'in_atomic_block', False
+        ):
+            with self.assertRaises(OperationalError):
+                retry_on_locked(calls)()
+        self.assertEqual(calls.call_count, 1)
+
+        # 已处于事务中时锁冲突使外层事务失效，只能由外层重试
+        calls = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            retry_on_locked(calls)()
+        self.assertEqual(calls.call_count, 1)
+
+    def test_gives_up_after_the_configured_attempts(self):
+        calls = mock.Mock(side_effect=OperationalError('database table is locked'))
+        with mock.patch('core.db.time.sleep'), mock.patch.object(
+            transaction.get_connection(), 'in_atomic_block', False
+        ):
+            with self.assertRaises(OperationalError):
+                retry_on_locked(attempts=3)(calls)()
+        self.assertEqual(calls.call_count, 3)
+
+
+class StudentImportTests(SIQCSTestCase):
+    def rows(self, *indexes):
+        return pd.DataFrame([
+            {'姓名': f'学生{index}', '身份证号': id_card(index), '通知书编号': f'N{index:06d}'} for index in indexes
+        ])
+
+    def test_invalid_and_duplicate_rows_are_reported(self):
+        make_student(1)
+        df = pd.concat([self.rows(1, 2), pd.DataFrame([{'姓名': '无效', '身份证号': '123', '通知书编号': None}])])
+        service = StudentImportService()
+        service._import_rows(df.reset_index(drop=True), '2025级')
+
+        self.assertEqual((service.success_count, service.skip_count), (1, 1))
+        self.assertEqual(service.errors, ['第4行: 身份证号格式不正确'])
+        self.assertTrue(Student.objects.filter(id_card_number=id_card(2), import_batch='2025级').exists())
+        self.assertEqual(rebuild_counters(), [])
+
+    def test_integrity_error_rolls_back_only_that_row(self):
+        service = StudentImportService()
+        process_row = service._process_student_row
+
+        def conflicting_row(row, row_number, batch_name):
+            if row_number == 3:
+                # 模拟并发导入：检查通过后另一个请求已写入相同身份证号
+                Student.objects.bulk_create([Student(name='并发', id_card_number=row['身份证号'], notification_number='X')])
+                Student.objects.bulk_create([Student(name='并发', id_card_number=row['身份证号'], notification_number='Y')])
+            return process_row(row, row_number, batch_name)
+
+        with mock.patch.object(service, '_process_student_row', side_effect=conflicting_row):
+            service._import_rows(self.rows(1, 2, 3), '2025级')
+
+        self.assertEqual(service.success_count, 2)
+        self.assertEqual(len(service.errors), 1)
+        self.assertTrue(service.errors[0].startswith('第3行'))
+        self.assertEqual(
+            set(Student.objects.values_list('id_card_number', flat=True)), {id_card(1), id_card(3)}
+        )
+        self.assertEqual(rebuild_counters(), [])
+
+
+    def test_unexpected_row_errors_are_reported_per_row(self):
+        service = StudentImportService()
+        process_row = service._process_student_row
+
+        def malformed_row(row, row_number, batch_name):
+            if row_number == 3:
+                raise KeyError('身份证号')
+            return process_row(row, row_number, batch_name)
+
+        with mock.patch.object(service, '_process_student_row', side_effect=malformed_row):
+            service._import_rows(self.rows(1, 2, 3), '2025级')
+
+        self.assertEqual(service.success_count, 2)
+        self.assertEqual(service.errors, ["第3行: '身份证号'"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StudentImportRetryTests(TransactionTestCase):
+    """锁冲突重试需要真实提交的事务，不能在 TestCase 的外层事务中测试"""
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+    rows = StudentImportTests.rows
+
+    def test_locked_database_retries_the_whole_import(self):
+        service = StudentImportService()
+        process_row = service._process_student_row
+        failures = [OperationalError('database is locked')]
+
+        def locked_once(row, row_number, batch_name):
+            if row_number == 3 and failures:
+                raise failures.pop()
+            return process_row(row, row_number, batch_name)
+
+        with mock.patch.object(service, '_process_student_row', side_effect=locked_once), \
+                mock.patch('core.db.time.sleep'):
+            service._import_rows(self.rows(1, 2, 3), '2025级')
+
+        self.assertEqual((service.success_count, service.errors), (3, []))
+        self.assertEqual(Student.objects.count(), 3)
+
+    def test_import_and_concurrent_writers_all_succeed(self):
+        students = [make_student(100 + index) for index in range(10)]
+        barrier = threading.Barrier(len(students) + 1)
+
+        def run_import():
+            barrier.wait()
+            try:
+                service = StudentImportService()
+                service._import_rows(self.rows(*range(30)), '并发导入')
+                return service.success_count, service.errors
+            finally:
+                connections.close_all()
+
+        def complete_profile(index, student_id):
+            barrier.wait()
+            try:
+                student = Student.objects.get(pk=student_id)
+                student.height, student.weight = 160 + index, 50 + index
+                student.residence_status, student.uniform_purchase = 'RESIDENT', True
+                student.save()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(len(students) + 1) as executor:
+            imported = executor.submit(run_import)
+            writers = [executor.submit(complete_profile, index, student.pk) for index, student in enumerate(students)]
+            for writer in writers:
+                writer.result()
+            self.assertEqual(imported.result(), (30, []))
+
+        self.assertEqual(Student.objects.filter(info_status='COMPLETE').count(), len(students))
+        self.assertEqual(Student.objects.filter(import_batch='并发导入').count(), 30)
+        self.assertEqual(rebuild_counters(), [])
+
+
+@mock.patch('siqcs_backend.db_router.replica_configured', return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    router = ReadReplicaRouter()
+
+    def route(self, request, view=None):
+        """在路由中间件中执行 view，返回 (view 的返回值, 响应)"""
+        result = {}
+
+        def get_response(request):
+            result['value'] = view() if view else self.router.db_for_read(Student)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return result['value'], response
+
+    def test_safe_requests_read_from_replica(self, _):
+        for method in ['get', 'head', 'options']:
+            with self.subTest(method=method):
+                self.assertEqual(self.route(getattr(RequestFactory(), method)('/'))[0], REPLICA_DB_ALIAS)
+        self.assertEqual(self.route(RequestFactory().post('/'))[0], DEFAULT_DB_ALIAS)
+
+    def test_primary_only_apps_and_reads_outside_requests_use_primary(self, _):
+        self.assertEqual(self.route(RequestFactory().get('/'), lambda: self.router.db_for_read(User))[0],
+                         DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(Student), DEFAULT_DB_ALIAS)
+
+    def test_read_replica_marks_post_views(self, _):
+        view = read_replica(lambda: self.router.db_for_read(Student))
+        self.assertEqual(self.route(RequestFactory().post('/'), view)[0], REPLICA_DB_ALIAS)
+
+        async def async_view():
+            return self.router.db_for_read(Student)
+        self.assertEqual(self.route(RequestFactory().post('/'), lambda: async_to_sync(read_replica(async_view))())[0],
+                         REPLICA_DB_ALIAS)
+
+    @override_settings(REPLICA_LAG_TOLERANCE=5)
+    def test_write_pins_rest_of_request_and_sets_cookie(self, _):
+        def view():
+            before = self.router.db_for_read(Student)
+            self.router.db_for_write(Student)
+            return before, self.router.db_for_read(Student), read_replica(lambda: self.router.db_for_read(Student))()
+
+        reads, response = self.route(RequestFactory().get('/'), view)
+        self.assertEqual(reads, (REPLICA_DB_ALIAS, DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS))
+        self.assertEqual(response.cookies[REPLICA_PIN_COOKIE]['max-age'], 5)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[REPLICA_PIN_COOKIE] = '1'
+        db, response = self.route(request)
+        self.assertEqual(db, DEFAULT_DB_ALIAS)
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    @override_settings(REPLICA_LAG_TOLERANCE=0)
+    def test_zero_tolerance_pins_only_the_current_request(self, _):
+        def view():
+            self.router.db_for_write(Student)
+            return self.router.db_for_read(Student)
+
+        db, response = self.route(RequestFactory().get('/'), view)
+        self.assertEqual(db, DEFAULT_DB_ALIAS)
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_reads_inside_primary_transaction_use_primary(self, _):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(self.route(RequestFactory().get('/'))[0], DEFAULT_DB_ALIAS)
+
+    def test_unconfigured_replica_and_migrations(self, replica_configured):
+        replica_configured.return_value = False
+        self.assertEqual(self.route(RequestFactory().get('/'))[0], DEFAULT_DB_ALIAS)
+        self.assertFalse(self.router.allow_migrate(REPLICA_DB_ALIAS, 'core'))
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'core'))
+
+    def test_async_middleware_keeps_state_per_request(self, _):
+        async def get_response(request):
+            return HttpResponse(await sync_to_async(self.router.db_for_read)(Student))
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(response.content.decode(), REPLICA_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(Student), DEFAULT_DB_ALIAS)
+
+
+class StudentBulkCreateTests(SIQCSTestCase):
+    url = '/api/students/bulk_create/'
+
+    def item(self, index, **fields):
+        return {'name': f'学生{index}', 'id_card_number': id_card(index), 'notification_number': f'N{index:06d}', **fields}
+
+    def test_errors_are_reported_by_position(self):
+        make_student(1)
+        items = [
+            self.item(1),
+            self.item(2),
+            self.item(3, notification_number='N000002'),
+            self.item(4, id_card_number='123'),
+            self.item(5),
+        ]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()], [0, 2, 3])
+        self.assertIn('id_card_number', response.json()[0]['errors'])
+        self.assertIn('索引 1', response.json()[1]['errors']['notification_number'][0])
+        self.assertEqual(Student.objects.count(), 1)
+
+        self.assertEqual(self.client.post(self.url, {'name': '学生'}, format='json').status_code, 400)
+
+    def test_partial_success_skips_invalid_items(self):
+        make_student(1)
+        response = self.client.post(f'{self.url}?partial_success=1', [self.item(1), self.item(2)], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['created_count'], response.json()['error_count']), (1, 1))
+        self.assertEqual(response.json()['errors'][0]['index'], 0)
+        self.assertEqual(rebuild_counters(), [])
+
+    def insert_after_validation(self, index):
+        """模拟校验通过之后、写入之前其他请求插入了相同身份证号的学生"""
+        validate = StudentBulkListSerializer.to_internal_value
+
+        def to_internal_value(serializer, data):
+            value = validate(serializer, data)
+            make_student(index)
+            return value
+        return mock.patch.object(StudentBulkListSerializer, 'to_internal_value', to_internal_value)
+
+    def test_concurrent_insert_is_reported_not_raised(self):
+        with self.insert_after_validation(2):
+            response = self.client.post(self.url, [self.item(1), self.item(2)], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [{'index': 1, 'errors': {'id_card_number': ['身份证号已存在']}}])
+        self.assertFalse(Student.objects.filter(id_card_number=id_card(1)).exists())
+
+        with self.insert_after_validation(4):
+            response = self.client.post(f'{self.url}?partial_success=1', [self.item(3), self.item(4)], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['errors'], [{'index': 1, 'errors': {'id_card_number': ['身份证号已存在']}}])
+        self.assertTrue(Student.objects.filter(id_card_number=id_card(3)).exists())
+
+    def test_integrity_error_after_recheck_is_mapped_to_items(self):
+        check_unique = StudentBulkListSerializer._check_unique
+        calls = []
+
+        def skip_first_recheck(serializer, field, valid, errors):
+            # 第 3、4 次调用是写事务内的第一次复查，跳过以模拟其他数据库在复查之后才发生的冲突
+            calls.append(field)
+            if len(calls) not in (3, 4):
+                check_unique(serializer, field, valid, errors)
+
+        with self.insert_after_validation(2), \
+                mock.patch.object(StudentBulkListSerializer, '_check_unique', skip_first_recheck):
+            response = self.client.post(f'{self.url}?partial_success=1', [self.item(1), self.item(2)], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created_count'], 1)
+        self.assertEqual(response.json()['errors'][0]['index'], 1)
+        self.assertEqual(len(calls), 6)
+        self.assertEqual(rebuild_counters(), [])
+
+
+@mock.patch('core.deletion.DELETE_CHUNK_SIZE', 2)
+class StudentBulkDeleteTests(SIQCSTestCase):
+    url = '/api/students/bulk_delete/'
+
+    def setUp(self):
+        super().setUp()
+        self.group = make_group(1)
+        self.students = [make_student(index, import_batch='2025级' if index < 5 else '2024级') for index in range(6)]
+        for student in self.students[:3]:
+            StudentGroupAssignment.objects.create(student=student, group_info=self.group)
+
+    def test_reports_counts_per_chunk(self):
+        student_ids = [student.pk for student in self.students[:5]]
+        response = self.client.delete(self.url, {'import_batch': '2025级'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['deleted_count'], response.json()['deleted_assignments']), (5, 3))
+        self.assertEqual(response.json()['chunks'], [
+            {'students': 2, 'assignments': 2}, {'students': 2, 'assignments': 1}, {'students': 1, 'assignments': 0},
+        ])
+        self.assertEqual(list(Student.objects.values_list('import_batch', flat=True)), ['2024级'])
+        self.assertFalse(StudentGroupAssignment.objects.exists())
+        self.assertEqual(
+            set(Tombstone.objects.filter(kind='student').values_list('object_id', flat=True)), set(student_ids)
+        )
+        self.assertEqual(Tombstone.objects.filter(kind='assignment').count(), 3)
+        self.assertEqual(rebuild_counters(), [])
+
+    def test_ids_and_delete_all(self):
+        response = self.client.delete(self.url, {'student_ids': [self.students[0].pk, 0]}, format='json')
+        self.assertEqual(response.json()['deleted_count'], 1)
+        response = self.client.delete(self.url, {'delete_all': True}, format='json')
+        self.assertEqual(response.json()['deleted_count'], 5)
+        self.assertFalse(Student.objects.exists())
+
+        self.assertEqual(self.client.delete(self.url, {'student_ids': 1}, format='json').status_code, 400)
+        self.assertEqual(self.client.delete(self.url, {}, format='json').status_code, 400)
+
+    def test_failure_reports_chunks_already_deleted(self):
+        record = Tombstone.record
+        calls = []
+
+        def fail_in_second_chunk(kind, object_ids):
+            calls.append(kind)
+            if len(calls) == 3:
+                raise DatabaseError('disk I/O error')
+            return record(kind, object_ids)
+
+        with mock.patch.object(Tombstone, 'record', side_effect=fail_in_second_chunk):
+            response = self.client.delete(self.url, {'delete_all': True}, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['deleted_count'], 2)
+        self.assertEqual(response.json()['chunks'], [{'students': 2, 'assignments': 2}])
+        self.assertEqual(Student.objects.count(), 4)
+        self.assertEqual(rebuild_counters(), [])
+
+
+class RendererTests(SIQCSTestCase):
+    """FastJSONRenderer 与 DRF 的 JSONRenderer 输出一致，MessagePack 与 JSON 数据结构相同"""
+
+    def setUp(self):
+        super().setUp()
+        group = make_group(1, capacity=10)
+        for index in range(5):
+            student = make_student(index, gender='MF'[index % 2], height=160 + index, weight=50 + index * 1.5)
+            StudentGroupAssignment.objects.create(student=student, group_info=group, remarks='备注\u2028换行')
+        make_student(9)
+        self.urls = [
+            '/api/students/', f'/api/students/{student.pk}/', '/api/students/statistics/',
+            '/api/assignments/', '/api/assignments/?format=compact', '/api/groups/',
+        ]
+
+    def test_json_output_is_identical_to_drf(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+        response = self.client.post('/api/groups/auto_assign/', {'seed': 1}, format='json')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_value_types_match_drf(self):
+        data = {
+            'time': timezone.now(), 'date': timezone.now().date(), 'decimal': decimal.Decimal('1.50'),
+            'float': 0.1 + 0.2, 'text': '中文\u2029', 'keys': {1: 'a', None: 'b'}, 'nested': [[1, None, True]],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    @mock.patch('core.renderers.orjson', None)
+    def test_stdlib_fallback_is_strict_about_non_finite_floats(self):
+        with self.assertRaises(ValueError):
+            FastJSONRenderer().render({'value': float('nan')})
+
+    def test_orjson_writes_non_finite_floats_as_null(self):
+        if orjson is None:
+            self.skipTest('未安装 orjson')
+        self.assertEqual(FastJSONRenderer().render({'value': float('inf')}), b'{"value":null}')
+        # 指数写法与标准库不同，解析后取值相同
+        rendered = FastJSONRenderer().render([1e16, 1e-7])
+        self.assertEqual(json.loads(rendered), json.loads(JSONRenderer().render([1e16, 1e-7])))
+
+    def test_indent_falls_back_to_stdlib(self):
+        response = self.client.get('/api/groups/', HTTP_ACCEPT='application/json; indent=2')
+        self.assertEqual(response.content, JSONRenderer().render(response.data, 'application/json; indent=2'))
+
+    def test_responses_vary_on_accept(self):
+        response = self.client.get('/api/students/')
+        self.assertIn('Accept', response['Vary'])
+        response = self.client.get('/api/students/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept', response['Vary'])
+
+    def test_msgpack_matches_json(self):
+        if msgpack is None:
+            self.skipTest('未安装 msgpack')
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], 'application/msgpack')
+                self.assertIn('Accept', response['Vary'])
+                self.assertEqual(
+                    msgpack.unpackb(response.content, strict_map_key=False), self.client.get(url).json()
+                )
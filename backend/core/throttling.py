@@ -0,0 +1,147 @@
+import math
+import random
+import threading
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import SimpleRateThrottle
+from .db import is_locked_error, retry_on_locked
+from .models import ThrottleBucket
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """令牌桶限流
+
+    速率沿用 DRF 的 'N/period' 写法：桶容量为 N，令牌按 N/period 的速度匀速补充，
+    既允许短时突发又限制平均速率。桶状态（剩余令牌, 更新时间）保存在数据库的 ThrottleBucket 表中，
+    读取、扣减和写回在同一个写事务内完成：SQLite 的 IMMEDIATE 事务（PostgreSQL 上为 select_for_update 行锁）
+    使同一个桶同时只有一个请求在修改，多进程并发时不会丢失扣减，也不依赖缓存后端的原子性。
+
+    数据库被锁定时按 retry_on_locked 重试，重试后仍然锁定则放行请求，
+    限流状态暂时不可用不应使桶内仍有令牌的正常用户收到429。
+    """
+
+    cache_format = 'siqcs:throttle:%(scope)s:%(ident)s'
+    # 每次请求顺带清理长时间未使用的令牌桶的概率，以及视为过期的秒数（不短于任何限流周期）
+    purge_probability = 0.001
+    purge_age = 24 * 3600
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        try:
+            return self._consume()
+        except OperationalError as e:
+            if not is_locked_error(e):
+                raise
+            self.wait_seconds = 0
+            return True
+
+    @retry_on_locked
+    def _consume(self):
+        # 限流状态不属于业务数据，显式使用主库，不经过路由（以免把门户请求固定到主库）
+        buckets = ThrottleBucket.objects.using(DEFAULT_DB_ALIAS)
+        capacity = self.num_requests
+        refill_rate = self.num_requests / self.duration
+        self.now = self.timer()
+
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            bucket, created = buckets.select_for_update().get_or_create(
+                key=self.key, defaults={'tokens': capacity, 'updated_at': self.now}
+            )
+            tokens = min(capacity, bucket.tokens + max(self.now - bucket.updated_at, 0) * refill_rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.wait_seconds = 0 if allowed else (1 - tokens) / refill_rate
+
+            buckets.filter(pk=bucket.pk).update(tokens=tokens, updated_at=self.now)
+            if random.random() < self.purge_probability:
+                buckets.filter(updated_at__lt=self.now - self.purge_age).delete()
+        return allowed
+
+    def wait(self):
+        return getattr(self, 'wait_seconds', None)
+
+
+class PortalIPThrottle(TokenBucketThrottle):
+    """学生门户按客户端IP限流"""
+
+    scope = 'portal_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class PortalGlobalThrottle(TokenBucketThrottle):
+    """学生门户全局限流（所有客户端共用一个令牌桶）"""
+
+    scope = 'portal_global'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': 'all'}
+
+
+def check_throttles(request, throttle_classes):
+    """在普通 Django 视图中执行 DRF 限流类，超限时返回建议等待的秒数，否则返回 None"""
+    waits = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            waits.append(throttle.wait() or 0)
+    return math.ceil(max(waits)) if waits else None
+
+
+class ServiceOverloaded(APIException):
+    """并发请求超过上限时快速失败（503），wait 属性会被转换为 Retry-After 响应头"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = '当前访问人数较多，请稍后重试'
+    default_code = 'service_overloaded'
+
+    def __init__(self, wait=1, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def get_concurrency_semaphore(name):
+    """返回当前进程内指定名称的并发信号量，未配置上限时返回 None"""
+    with _semaphores_lock:
+        if name not in _semaphores:
+            limit = settings.CONCURRENCY_LIMITS.get(name)
+            _semaphores[name] = threading.BoundedSemaphore(limit) if limit else None
+        return _semaphores[name]
+
+
+def concurrency_limit(name):
+    """限制视图集动作在当前进程内的并发执行数（上限见 settings.CONCURRENCY_LIMITS）
+
+    超过上限时不排队，直接返回 503 和 Retry-After，让出工作线程给管理端接口。
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            semaphore = get_concurrency_semaphore(name)
+            if semaphore is None:
+                return view_method(self, request, *args, **kwargs)
+
+            if not semaphore.acquire(blocking=False):
+                raise ServiceOverloaded(wait=settings.CONCURRENCY_RETRY_AFTER)
+            try:
+                return view_method(self, request, *args, **kwargs)
+            finally:
+                semaphore.release()
+        return wrapper
+    return decorator
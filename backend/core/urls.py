@@ -1,11 +1,19 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StudentViewSet
+from . import async_views
+from .views import StudentViewSet, TombstoneViewSet
 
 # 创建路由器
 router = DefaultRouter()
 router.register(r'students', StudentViewSet)
+router.register(r'tombstones', TombstoneViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    # 学生门户及统计接口的异步版本（ASGI 部署时使用），路径与同步接口一致，仅增加 async/ 前缀
+    path('async/students/lookup_by_name_and_id_suffix/', async_views.lookup_by_name_and_id_suffix,
+         name='async-student-lookup'),
+    path('async/students/verify_access/', async_views.verify_access, name='async-student-verify-access'),
+    path('async/students/<int:pk>/groups/', async_views.student_groups, name='async-student-groups'),
+    path('async/students/statistics/', async_views.student_statistics, name='async-student-statistics'),
 ]
@@ -1,28 +1,51 @@
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, filters, serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from django.http import HttpResponse
+from django.db import DatabaseError
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from django.conf import settings
+from django.core import signing
+from siqcs_backend.db_router import read_replica
 import os
 import tempfile
-from .models import Student
-from .serializers import StudentSerializer, StudentListSerializer
-from .services import StudentImportService, ExcelTemplateGenerator
+from .cache import cached_action
+from .conditional import ConditionalGetMixin, conditional_get
+from .db import RetryOnLockedMixin
+from .deletion import DeletionProgress
+from .filters import UpdatedSinceFilter, parse_bool_param, parse_timestamp
+from .models import CompletionRollup, Student, Tombstone
+from .portal import get_portal_entry, lookup_portal_entry, make_access_token, read_access_token
+from .renderers import FastJSONRenderer, NDJSONRenderer
+from .serializers import (
+    StudentBulkCreateSerializer, StudentProfileBulkFilterUpdateSerializer, StudentProfileBulkItemSerializer,
+    StudentSerializer, StudentListSerializer, TombstoneSerializer
+)
+from .services import (
+    StudentImportService, StudentExportService, StudentProfileBulkUpdateService, ExcelTemplateGenerator
+)
+from .statistics import (
+    aggregate_statistics, counter_statistics, distribution_statistics, format_statistics
+)
+from .throttling import PortalGlobalThrottle, PortalIPThrottle, concurrency_limit
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(RetryOnLockedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """学生信息API视图集"""
     
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, UpdatedSinceFilter, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['gender', 'residence_status', 'uniform_purchase', 'info_status']
     search_fields = ['name', 'id_card_number', 'interests_talents', 'import_batch']
-    ordering_fields = ['name', 'created_at', 'height', 'weight', 'profile_completed_at']
+    ordering_fields = ['name', 'created_at', 'updated_at', 'height', 'weight', 'profile_completed_at']
     ordering = ['-created_at']
+    conditional_models = [Student]
     
     def get_serializer_class(self):
         """根据动作选择序列化器"""
@@ -30,6 +53,11 @@ class StudentViewSet(viewsets.ModelViewSet):
             return StudentListSerializer
         return StudentSerializer
     
+    def has_filter_params(self):
+        """请求是否带有列表接口的过滤参数（统计接口无过滤参数时读取计数器表）"""
+        filter_params = [*self.filterset_fields, 'search', UpdatedSinceFilter.query_param]
+        return any(self.request.query_params.get(param) for param in filter_params)
+    
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def import_excel(self, request):
         """从Excel文件导入学生信息"""
@@ -73,6 +101,7 @@ class StudentViewSet(viewsets.ModelViewSet):
                 os.unlink(temp_file_path)
     
     @action(detail=False, methods=['get'])
+    @cached_action(models=[])
     def download_template(self, request):
         """下载学生信息导入模板"""
         # 创建临时文件
@@ -97,58 +126,121 @@ class StudentViewSet(viewsets.ModelViewSet):
             if os.path.exists(template_path):
                 os.unlink(template_path)
     
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, FastJSONRenderer])
+    def export(self, request):
+        """以NDJSON格式流式导出学生信息，供下游系统整体同步
+
+        支持与列表接口相同的过滤参数；include_group=true 时附带学生当前有效分组。
+        响应头 X-Export-Started-At 为导出开始时间，见 StudentExportService.iter_rows。
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        include_group = parse_bool_param(request, 'include_group')
+        
+        export_service = StudentExportService(queryset, include_group=include_group)
+        content = export_service.iter_ndjson()
+        
+        response = StreamingHttpResponse(content_type='application/x-ndjson; charset=utf-8')
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            content = compress_sequence(content)
+            response['Content-Encoding'] = 'gzip'
+        response.streaming_content = content
+        
+        # 禁止反向代理缓冲，让下游按自身速度拉取数据
+        response['X-Accel-Buffering'] = 'no'
+        response['Content-Disposition'] = 'attachment; filename="students.ndjson"'
+        # 导出不是一致性快照，客户端以此时间作为 updated_since 补齐导出期间的变更
+        response['X-Export-Started-At'] = export_service.started_at.isoformat()
+        return response
+    
     @action(detail=False, methods=['get'])
+    @conditional_get
     def statistics(self, request):
-        """获取学生统计信息"""
-        queryset = self.get_queryset()
+        """获取学生统计信息
+
+        无过滤参数时直接读取增量维护的计数器表；带过滤参数时对过滤后的集合做一次聚合查询。
+        """
+        if self.has_filter_params():
+            stats = aggregate_statistics(self.filter_queryset(self.get_queryset()))
+        else:
+            stats = counter_statistics()
         
-        # 基础统计
-        total_count = queryset.count()
-        male_count = queryset.filter(gender='M').count()
-        female_count = queryset.filter(gender='F').count()
-        resident_count = queryset.filter(residence_status='RESIDENT').count()
-        uniform_count = queryset.filter(uniform_purchase=True).count()
+        return Response(format_statistics(stats))
+    
+    @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_action
+    def distributions(self, request):
+        """获取身高、体重、BMI、年龄的分布统计（直方图、百分位数及分组对比）
+
+        无过滤参数时读取增量维护的联合计数行；带过滤参数时对过滤后的学生做分组计数查询。
+        结果按数据版本缓存，数据未变化时不再重新计算。
+        """
+        if self.has_filter_params():
+            return Response(distribution_statistics(self.filter_queryset(self.get_queryset())))
+        return Response(distribution_statistics())
+    
+    @action(detail=False, methods=['get'])
+    def completion_timeseries(self, request):
+        """获取资料完成人数的时间序列（读取按小时/按天的汇总表）
+
+        参数：granularity=hour|day，start/end 时间范围，
+        batch=<批次> 或 group=<分组ID> 查看单个批次/分组，by=batch|group 返回每个批次/分组的序列。
+        """
+        granularity = request.query_params.get('granularity', 'hour')
+        if granularity not in dict(CompletionRollup.GRANULARITY_CHOICES):
+            return Response(
+                {'error': 'granularity 只能为 hour 或 day'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # 信息完整度统计
-        status_stats = {}
-        for status_choice in Student.INFO_STATUS_CHOICES:
-            status_key = status_choice[0]
-            status_stats[status_key] = queryset.filter(info_status=status_key).count()
+        rollups = CompletionRollup.objects.filter(granularity=granularity)
         
-        # 身高体重统计（排除空值）
-        height_data = queryset.exclude(height__isnull=True).values_list('height', flat=True)
-        weight_data = queryset.exclude(weight__isnull=True).values_list('weight', flat=True)
+        by = request.query_params.get('by')
+        batch = request.query_params.get('batch')
+        group = request.query_params.get('group')
+        if by:
+            if by not in ('batch', 'group'):
+                return Response(
+                    {'error': 'by 只能为 batch 或 group'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            dimension = by
+            rollups = rollups.filter(dimension=by)
+        elif batch:
+            dimension = 'batch'
+            rollups = rollups.filter(dimension='batch', key=batch)
+        elif group:
+            dimension = 'group'
+            rollups = rollups.filter(dimension='group', key=group)
+        else:
+            dimension = 'all'
+            rollups = rollups.filter(dimension='all')
         
-        avg_height = sum(height_data) / len(height_data) if height_data else 0
-        avg_weight = sum(weight_data) / len(weight_data) if weight_data else 0
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        if start:
+            rollups = rollups.filter(bucket__gte=parse_timestamp(start, 'start'))
+        if end:
+            rollups = rollups.filter(bucket__lt=parse_timestamp(end, 'end'))
         
-        # 导入批次统计
-        batch_stats = queryset.exclude(import_batch='').values('import_batch').distinct().count()
+        datetime_field = serializers.DateTimeField()
+        series = {}
+        for key, bucket, count in rollups.order_by('key', 'bucket').values_list('key', 'bucket', 'count'):
+            points = series.setdefault(key, [])
+            points.append({'bucket': datetime_field.to_representation(bucket), 'count': count})
         
         return Response({
-            'total_students': total_count,
-            'gender_distribution': {
-                'male': male_count,
-                'female': female_count
-            },
-            'residence_distribution': {
-                'resident': resident_count,
-                'non_resident': queryset.filter(residence_status='NON_RESIDENT').count(),
-                'unknown': queryset.filter(residence_status='UNKNOWN').count()
-            },
-            'uniform_purchase': {
-                'purchased': uniform_count,
-                'not_purchased': queryset.filter(uniform_purchase=False).count(),
-                'unknown': queryset.filter(uniform_purchase__isnull=True).count()
-            },
-            'info_completion': status_stats,
-            'physical_stats': {
-                'average_height': round(avg_height, 2),
-                'average_weight': round(avg_weight, 2),
-                'height_count': len(height_data),
-                'weight_count': len(weight_data)
-            },
-            'import_batches': batch_stats
+            'granularity': granularity,
+            'dimension': dimension,
+            'series': [
+                {
+                    'key': key,
+                    'total': sum(point['count'] for point in points),
+                    'points': points
+                }
+                for key, points in series.items()
+            ]
         })
     
     @action(detail=False, methods=['get'])
@@ -202,6 +294,35 @@ class StudentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    @action(detail=False, methods=['post'])
+    def bulk_update_profiles(self, request):
+        """批量更新学生扩展信息
+        
+        请求体为 [{"id": 1, "fields": {...}}, ...] 时为每个学生设置各自的取值（支持 ?partial_success=1），
+        为 {"filter": {...}, "fields": {...}} 时为符合条件的学生统一设置取值。
+        """
+        service = StudentProfileBulkUpdateService()
+        
+        if isinstance(request.data, list):
+            partial_success = parse_bool_param(request, 'partial_success')
+            serializer = StudentProfileBulkItemSerializer(
+                data=request.data, many=True,
+                context={**self.get_serializer_context(), 'partial_success': partial_success}
+            )
+            if not serializer.is_valid():
+                errors = getattr(serializer, 'item_errors', None) or serializer.errors
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            
+            result = service.update_each(serializer.validated_data)
+            result.update(error_count=len(serializer.item_errors), errors=serializer.item_errors)
+            if not result['updated_count'] and serializer.item_errors:
+                return Response(result, status=status.HTTP_400_BAD_REQUEST)
+            return Response(result)
+        
+        serializer = StudentProfileBulkFilterUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(service.update_matching(serializer.get_queryset(), serializer.validated_data['fields']))
+    
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         """批量创建学生信息"""
@@ -211,39 +332,51 @@ class StudentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        serializer = StudentSerializer(data=request.data, many=True)
-        if serializer.is_valid():
+        # ?partial_success=1 时跳过有错误的条目，其余照常创建
+        partial_success = parse_bool_param(request, 'partial_success')
+        serializer = StudentBulkCreateSerializer(
+            data=request.data, many=True, context={**self.get_serializer_context(), 'partial_success': partial_success}
+        )
+        if not serializer.is_valid():
+            # item_errors 保留整数形式的位置（serializer.errors 会把它们转为字符串）
+            errors = getattr(serializer, 'item_errors', None) or serializer.errors
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
             serializer.save()
+        except serializers.ValidationError:
+            # 写入前重新检查唯一性时发现的冲突（校验之后其他请求插入了相同的身份证号或通知书编号）
+            return Response(serializer.item_errors, status=status.HTTP_400_BAD_REQUEST)
+        if not partial_success:
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        created = serializer.data
+        return Response({
+            'created_count': len(created),
+            'error_count': len(serializer.item_errors),
+            'created': created,
+            'errors': serializer.item_errors
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
     
     @action(detail=True, methods=['get'])
     def groups(self, request, pk=None):
-        """获取学生的分组信息"""
+        """获取学生的分组信息
+        
+        学生经 get_object 查找（与详情接口相同的查询集、过滤和权限检查），返回的分组信息读取门户缓存。
+        """
         student = self.get_object()
-        assignments = student.group_assignments.filter(is_active=True).select_related('group_info')
-        
-        groups_data = []
-        for assignment in assignments:
-            groups_data.append({
-                'assignment_id': assignment.id,
-                'group_info': {
-                    'id': assignment.group_info.id,
-                    'group_name': assignment.group_info.group_name,
-                    'group_teacher': assignment.group_info.group_teacher,
-                    'teacher_phone': assignment.group_info.teacher_phone,
-                    'report_location': assignment.group_info.report_location,
-                },
-                'assigned_at': assignment.assigned_at,
-                'remarks': assignment.remarks
-            })
+        entry = get_portal_entry(student.pk)
+        if entry is None:
+            raise Http404('学生信息不存在')
         
         return Response({
-            'student': StudentListSerializer(student).data,
-            'groups': groups_data
+            'student': entry['student_summary'],
+            'groups': entry['groups']
         })
     
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], throttle_classes=[PortalIPThrottle, PortalGlobalThrottle])
+    @concurrency_limit('portal')
+    @read_replica
     def lookup_by_name_and_id_suffix(self, request):
         """通过姓名和身份证后6位查询学生信息"""
         name = request.data.get('name', '').strip()
@@ -262,45 +395,26 @@ class StudentViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # 查找匹配的学生
-            students = Student.objects.filter(
-                name=name,
-                id_card_number__endswith=id_suffix
-            )
+            # 查找匹配的学生（优先读取门户缓存）
+            student_ids, entry = lookup_portal_entry(name, id_suffix)
             
-            if not students.exists():
+            if not student_ids:
                 return Response(
                     {'error': '未找到匹配的学生信息，请检查姓名和身份证后6位是否正确'}, 
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            if students.count() > 1:
+            if len(student_ids) > 1:
                 return Response(
                     {'error': '找到多个匹配的学生，请联系管理员'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            student = students.first()
-            serializer = StudentListSerializer(student)
-            
-            # 生成安全访问token
-            import hashlib
-            import time
-            import secrets
-            
-            # 创建包含学生ID、时间戳和随机数的token
-            timestamp = str(int(time.time()))
-            random_str = secrets.token_urlsafe(16)
-            token_data = f"{student.id}:{timestamp}:{random_str}"
-            
-            # 使用学生身份证号作为密钥的一部分来加密token
-            secret_key = f"{student.id_card_number}:{student.name}:SIQCS_SECRET"
-            token = hashlib.sha256(f"{token_data}:{secret_key}".encode()).hexdigest()
-            
+            # 生成签名访问token（只携带学生ID，分组信息验证时从门户缓存读取）
             return Response({
                 'message': '查询成功',
-                'student': serializer.data,
-                'access_token': f"{student.id}:{timestamp}:{random_str}:{token}"
+                'student': entry['student_summary'],
+                'access_token': make_access_token(entry)
             })
             
         except Exception as e:
@@ -309,7 +423,8 @@ class StudentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], throttle_classes=[PortalIPThrottle, PortalGlobalThrottle])
+    @concurrency_limit('portal')
     def verify_access(self, request):
         """验证访问token并返回学生信息"""
         token = request.query_params.get('token', '')
@@ -321,52 +436,31 @@ class StudentViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # 解析token
-            parts = token.split(':')
-            if len(parts) != 4:
-                return Response(
-                    {'error': '无效的访问token'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            student_id, timestamp, random_str, provided_token = parts
-            
-            # 检查学生是否存在
+            # 先校验签名和有效期（24小时），伪造或过期的token不会触发数据库查询
             try:
-                student = Student.objects.get(id=int(student_id))
-            except (Student.DoesNotExist, ValueError):
+                payload = read_access_token(token)
+            except signing.SignatureExpired:
                 return Response(
-                    {'error': '学生信息不存在'}, 
-                    status=status.HTTP_404_NOT_FOUND
+                    {'error': '访问token已过期，请重新查询'}, 
+                    status=status.HTTP_403_FORBIDDEN
                 )
-            
-            # 验证token
-            import hashlib
-            import time
-            
-            token_data = f"{student_id}:{timestamp}:{random_str}"
-            secret_key = f"{student.id_card_number}:{student.name}:SIQCS_SECRET"
-            expected_token = hashlib.sha256(f"{token_data}:{secret_key}".encode()).hexdigest()
-            
-            if provided_token != expected_token:
+            except signing.BadSignature:
                 return Response(
                     {'error': '访问token无效'}, 
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            # 检查token是否过期（24小时有效期）
-            current_time = int(time.time())
-            token_time = int(timestamp)
-            if current_time - token_time > 24 * 3600:  # 24小时
+            # 检查学生是否存在（优先读取门户缓存）
+            entry = get_portal_entry(payload['s'])
+            if entry is None:
                 return Response(
-                    {'error': '访问token已过期，请重新查询'}, 
-                    status=status.HTTP_403_FORBIDDEN
+                    {'error': '学生信息不存在'}, 
+                    status=status.HTTP_404_NOT_FOUND
                 )
             
             # 返回学生信息
-            serializer = StudentSerializer(student)
             return Response({
-                'student': serializer.data,
+                'student': entry['student'],
                 'valid': True
             })
             
@@ -385,21 +479,14 @@ class StudentViewSet(viewsets.ModelViewSet):
         
         if delete_all:
             # 删除所有学生
-            deleted_count = Student.objects.count()
-            Student.objects.all().delete()
-            return Response({
-                'message': f'成功删除 {deleted_count} 名学生',
-                'deleted_count': deleted_count
-            })
+            return self._delete_students(Student.objects.all(), lambda count: f'成功删除 {count} 名学生')
         
         if import_batch:
             # 按批次删除
-            deleted_count = Student.objects.filter(import_batch=import_batch).count()
-            Student.objects.filter(import_batch=import_batch).delete()
-            return Response({
-                'message': f'成功删除批次 "{import_batch}" 的 {deleted_count} 名学生',
-                'deleted_count': deleted_count
-            })
+            return self._delete_students(
+                Student.objects.filter(import_batch=import_batch),
+                lambda count: f'成功删除批次 "{import_batch}" 的 {count} 名学生'
+            )
         
         if student_ids:
             # 按ID列表删除
@@ -409,34 +496,136 @@ class StudentViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            deleted_count = Student.objects.filter(id__in=student_ids).count()
-            Student.objects.filter(id__in=student_ids).delete()
-            return Response({
-                'message': f'成功删除 {deleted_count} 名学生',
-                'deleted_count': deleted_count
-            })
+            return self._delete_students(
+                Student.objects.filter(id__in=student_ids), lambda count: f'成功删除 {count} 名学生'
+            )
         
         return Response(
             {'error': '请提供要删除的学生ID列表、导入批次或设置删除全部'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    @staticmethod
+    def _delete_students(queryset, message):
+        """分块删除学生及其分组分配，返回删除结果及每块提交的删除数量（取自 DELETE 语句的影响行数）
+        
+        块之间互不回滚，中途出现数据库错误时返回 500 和失败前已经删除的数量。
+        """
+        from groups.models import StudentGroupAssignment
+        
+        progress = DeletionProgress({Student: 'students', StudentGroupAssignment: 'assignments'})
+        try:
+            queryset.delete_in_chunks(progress=progress)
+        except DatabaseError as e:
+            return Response({
+                'error': f'删除未完成: {str(e)}',
+                'deleted_count': progress.totals['students'],
+                'deleted_assignments': progress.totals['assignments'],
+                'chunks': progress.chunks
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response({
+            'message': message(progress.totals['students']),
+            'deleted_count': progress.totals['students'],
+            'deleted_assignments': progress.totals['assignments'],
+            'chunks': progress.chunks
+        })
+    
     @action(detail=False, methods=['get'])
     def import_batches(self, request):
         """获取所有导入批次"""
         batches = Student.objects.exclude(
             Q(import_batch__isnull=True) | Q(import_batch='')
-        ).values_list('import_batch', flat=True).distinct().order_by('import_batch')
-        
-        batch_stats = []
-        for batch in batches:
-            count = Student.objects.filter(import_batch=batch).count()
-            batch_stats.append({
-                'batch_name': batch,
-                'student_count': count
-            })
+        ).values('import_batch').annotate(student_count=Count('id')).order_by('import_batch')
+        
+        batch_stats = [
+            {
+                'batch_name': batch['import_batch'],
+                'student_count': batch['student_count']
+            }
+            for batch in batches
+        ]
         
         return Response({
             'batches': batch_stats,
             'total_batches': len(batch_stats)
         })
+    
+    # 批次统计允许的排序字段（参数名 -> 查询字段）
+    BATCH_ORDERING_FIELDS = {
+        'batch_name': 'import_batch',
+        'student_count': 'student_count',
+        'complete_count': 'complete_count',
+        'assigned_count': 'assigned_count',
+        'first_created_at': 'first_created_at',
+        'last_created_at': 'last_created_at',
+    }
+    
+    @action(detail=False, methods=['get'])
+    def batch_statistics(self, request):
+        """按导入批次统计人数、完成情况、分组情况及导入时间（一次分组查询，支持分页和排序）
+
+        支持列表接口的过滤参数；排序参数 ordering 可取 BATCH_ORDERING_FIELDS 中的字段，前缀 - 表示倒序。
+        """
+        from groups.models import StudentGroupAssignment
+        
+        ordering = request.query_params.get('ordering', 'batch_name')
+        order_field = self.BATCH_ORDERING_FIELDS.get(ordering.lstrip('-'))
+        if order_field is None:
+            return Response(
+                {'error': f'不支持的排序字段，可选: {", ".join(self.BATCH_ORDERING_FIELDS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if ordering.startswith('-'):
+            order_field = f'-{order_field}'
+        
+        has_active_group = Exists(
+            StudentGroupAssignment.objects.filter(student=OuterRef('pk'), is_active=True)
+        )
+        
+        aggregates = {
+            'student_count': Count('id'),
+            'assigned_count': Count('id', filter=Q(has_active_group)),
+            'first_created_at': Min('created_at'),
+            'last_created_at': Max('created_at'),
+        }
+        for status_key, _ in Student.INFO_STATUS_CHOICES:
+            aggregates[f'{status_key.lower()}_count'] = Count('id', filter=Q(info_status=status_key))
+        
+        batches = self.filter_queryset(self.get_queryset()).exclude(
+            import_batch=''
+        ).order_by().values('import_batch').annotate(**aggregates).order_by(order_field, 'import_batch')
+        
+        page = self.paginate_queryset(batches)
+        rows = page if page is not None else batches
+        datetime_field = serializers.DateTimeField()
+        
+        results = [
+            {
+                'batch_name': batch['import_batch'],
+                'student_count': batch['student_count'],
+                'info_completion': {
+                    status_key: batch[f'{status_key.lower()}_count']
+                    for status_key, _ in Student.INFO_STATUS_CHOICES
+                },
+                'assigned_count': batch['assigned_count'],
+                'unassigned_count': batch['student_count'] - batch['assigned_count'],
+                'first_created_at': datetime_field.to_representation(batch['first_created_at']),
+                'last_created_at': datetime_field.to_representation(batch['last_created_at']),
+            }
+            for batch in rows
+        ]
+        
+        if page is not None:
+            return self.get_paginated_response(results)
+        return Response(results)
+
+
+class TombstoneViewSet(viewsets.ReadOnlyModelViewSet):
+    """删除记录API视图集（配合 updated_since 增量同步硬删除）"""
+    
+    queryset = Tombstone.objects.all()
+    serializer_class = TombstoneSerializer
+    filter_backends = [DjangoFilterBackend, UpdatedSinceFilter]
+    filterset_fields = ['kind']
+    updated_since_field = 'deleted_at'
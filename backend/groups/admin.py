@@ -6,15 +6,19 @@ from .models import GroupInfo, StudentGroupAssignment
 class GroupInfoAdmin(admin.ModelAdmin):
     list_display = [
         'group_name', 'group_teacher', 
-        'teacher_phone', 'report_location', 'student_count', 'created_at'
+        'teacher_phone', 'report_location', 'capacity', 'student_count', 'created_at'
     ]
     list_filter = ['group_name', 'group_teacher', 'created_at']
     search_fields = ['group_name', 'group_teacher']
     readonly_fields = ['created_at', 'updated_at']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_student_count()
+    
     def student_count(self, obj):
-        return obj.student_assignments.filter(is_active=True).count()
+        return obj.student_count
     student_count.short_description = '学生数量'
+    student_count.admin_order_field = 'student_count'
 
 
 @admin.register(StudentGroupAssignment)
@@ -0,0 +1,218 @@
+"""自动分组
+
+把尚未分组的学生分配到各分组，遵守分组容量，并使每个分组的性别、住校情况（以及可选的导入批次、
+生源地区）构成与全体待分配学生一致：
+
+1. 按容量“注水”确定每个分组新增的人数，使各分组分配后的人数尽量相同；
+2. 学生按均衡维度的取值组合分层并依次排列（balance_by 中靠前的维度优先），层内随机打乱；
+3. 生成一个各分组名额均匀分散的分组序列，与排好的学生一一对应，
+   每个分组中各层（及靠前维度的每个取值）的人数与其新增人数成比例，误差在 1 人左右。
+
+全部计算在 NumPy 数组上完成，与学生、分组数量基本成线性关系；相同的 seed 得到相同的方案，
+预览后用同一 seed 提交即可得到与预览一致的结果。
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Substr
+from core.db import retry_on_locked
+from core.models import Student
+from .models import GroupInfo, StudentGroupAssignment
+
+
+# 可用于均衡的维度：{名称: 学生字段}，region 为身份证号前6位（区县代码）
+BALANCE_DIMENSIONS = {
+    'gender': 'gender',
+    'residence_status': 'residence_status',
+    'import_batch': 'import_batch',
+    'region': 'region',
+}
+DEFAULT_BALANCE_BY = ['gender', 'residence_status']
+
+
+def _fill_levels(current, remaining, total):
+    """注水：在容量限制内分配 total 个名额，使各分组分配后的人数尽量相同，返回各分组新增人数"""
+    total = min(total, int(remaining.sum()))
+    if total <= 0:
+        return np.zeros(len(current), dtype=np.int64)
+
+    def added(level):
+        return np.clip(level - current, 0, remaining)
+
+    # 二分查找最高的水位 level，使 sum(added(level)) <= total
+    low, high = int(current.min()), int(current.max()) + total
+    while low < high:
+        middle = (low + high + 1) // 2
+        if added(middle).sum() <= total:
+            low = middle
+        else:
+            high = middle - 1
+
+    counts = added(low)
+    # 剩余名额给恰好处于水位且仍有容量的分组各加一人
+    extra = total - int(counts.sum())
+    if extra:
+        candidates = np.flatnonzero((counts < remaining) & (current + counts == low))
+        counts[candidates[:extra]] += 1
+    return counts
+
+
+def _apportion(sizes, total):
+    """最大余数法：按 sizes 的比例把 total 拆分为整数（不超过 sizes）"""
+    if total >= sizes.sum():
+        return sizes.copy()
+    exact = sizes * (total / sizes.sum())
+    counts = np.floor(exact).astype(np.int64)
+    extra = total - int(counts.sum())
+    counts[np.argsort(counts - exact, kind='stable')[:extra]] += 1
+    return counts
+
+
+def _deal(group_counts, rng):
+    """生成分组下标序列，每个分组出现 group_counts 次，且均匀分散在整个序列中
+
+    第 g 个分组的第 j 个名额位于 (j + 0.5) / group_counts[g] 处，同一位置的分组按随机顺序排列。
+    序列的任意连续一段中，各分组所占名额与其总人数成比例（误差不超过 1 人）。
+    """
+    total = int(group_counts.sum())
+    groups = np.repeat(np.arange(len(group_counts)), group_counts)
+    starts = np.concatenate([[0], np.cumsum(group_counts)[:-1]])
+    positions = (np.arange(total) - starts[groups] + 0.5) / group_counts[groups]
+    tie_breaker = rng.permutation(len(group_counts))[groups]
+    return groups[np.lexsort((tie_breaker, positions))]
+
+
+def plan_assignment(strata, current, remaining, seed=None):
+    """计算分配方案
+
+    strata 为每个学生所在层的编号（0..层数-1），current 为各分组现有人数，
+    remaining 为各分组剩余容量。返回每个学生分配到的分组下标，容量不足未能分配的为 -1。
+    """
+    strata = np.asarray(strata, dtype=np.int64)
+    current = np.asarray(current, dtype=np.int64)
+    remaining = np.asarray(remaining, dtype=np.int64)
+    result = np.full(len(strata), -1, dtype=np.int64)
+    if not len(strata) or not len(current):
+        return result
+
+    rng = np.random.default_rng(seed)
+    stratum_sizes = np.bincount(strata)
+    group_counts = _fill_levels(current, remaining, len(strata))
+    stratum_counts = _apportion(stratum_sizes, int(group_counts.sum()))
+
+    # 学生先随机打乱再按层稳定排序，容量不足时每层只取前 stratum_counts 个
+    order = rng.permutation(len(strata))
+    order = order[np.argsort(strata[order], kind='stable')]
+    sorted_strata = strata[order]
+    starts = np.concatenate([[0], np.cumsum(stratum_sizes)[:-1]])
+    rank = np.arange(len(order)) - starts[sorted_strata]
+    chosen = order[rank < stratum_counts[sorted_strata]]
+
+    # 按层排好的学生依次对应均匀分散的分组序列：每层（以及按排序优先的维度合并的各层）
+    # 在各分组中的人数都与分组新增人数成比例
+    result[chosen] = _deal(group_counts, rng)
+    return result
+
+
+def unassigned_students(queryset=None):
+    """没有有效分组分配的学生"""
+    queryset = Student.objects.all() if queryset is None else queryset
+    return queryset.exclude(Exists(
+        StudentGroupAssignment.objects.filter(student_id=OuterRef('pk'), is_active=True)
+    ))
+
+
+def build_plan(students=None, groups=None, balance_by=None, seed=None):
+    """为学生（默认全部未分组学生）和分组（默认全部分组）生成分配方案
+
+    返回 {'student_ids', 'group_indexes'（与学生一一对应的分组下标，未分配为 -1）,
+    'values'（各均衡维度的取值）, 'groups'（分组列表）, 'current'（分组现有人数）}。
+    """
+    balance_by = DEFAULT_BALANCE_BY if balance_by is None else balance_by
+    students = unassigned_students(students).annotate(region=Substr('id_card_number', 1, 6))
+    groups = (GroupInfo.objects.all() if groups is None else groups).with_student_count().order_by('pk')
+
+    fields = [BALANCE_DIMENSIONS[name] for name in balance_by]
+    rows = list(students.order_by('pk').values_list('pk', *fields))
+    group_list = list(groups)
+
+    student_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    values = {name: [row[index + 1] for row in rows] for index, name in enumerate(balance_by)}
+    if balance_by and rows:
+        keys = ['\x1f'.join(str(value) for value in row[1:]) for row in rows]
+        strata = np.unique(np.array(keys), return_inverse=True)[1]
+    else:
+        strata = np.zeros(len(rows), dtype=np.int64)
+
+    current = np.array([group.student_count for group in group_list], dtype=np.int64)
+    remaining = np.array([
+        len(rows) if group.capacity is None else max(group.capacity - group.student_count, 0)
+        for group in group_list
+    ], dtype=np.int64)
+
+    plan = plan_assignment(strata, current, remaining, seed)
+    return {
+        'student_ids': student_ids,
+        'group_indexes': plan,
+        'values': values,
+        'groups': group_list,
+        'current': current,
+    }
+
+
+def plan_items(plan, remarks=''):
+    """把分配方案转换为 StudentGroupAssignmentQuerySet.bulk_assign 的输入"""
+    group_ids = [group.pk for group in plan['groups']]
+    return [
+        {'student_id': int(student_id), 'group_info_id': group_ids[index], 'remarks': remarks}
+        for student_id, index in zip(plan['student_ids'], plan['group_indexes']) if index >= 0
+    ]
+
+
+@retry_on_locked
+def commit_plan(students=None, groups=None, balance_by=None, seed=None, remarks=''):
+    """在一个事务内重新生成方案并批量写入，避免预览与提交之间其他写操作造成重复分配
+
+    返回 (方案, 新建分配数量, 重新启用的分配数量)。
+    """
+    with transaction.atomic():
+        plan = build_plan(students, groups, balance_by, seed)
+        assignments, reactivated = StudentGroupAssignment.objects.bulk_assign(plan_items(plan, remarks))
+    return plan, len(assignments) - reactivated, reactivated
+
+
+def summarize_plan(plan):
+    """分配方案概要：总人数及每个分组新增人数、分配后人数和各均衡维度的构成"""
+    indexes = plan['group_indexes']
+    assigned = indexes >= 0
+    group_count = len(plan['groups'])
+    added = np.bincount(indexes[assigned], minlength=group_count)
+
+    composition = {}
+    for name, values in plan['values'].items():
+        labels, codes = np.unique(np.array([str(value) for value in values]), return_inverse=True)
+        counts = np.zeros((group_count, len(labels)), dtype=np.int64)
+        np.add.at(counts, (indexes[assigned], codes[assigned]), 1)
+        composition[name] = (labels, counts)
+
+    groups = []
+    for index, group in enumerate(plan['groups']):
+        groups.append({
+            'id': group.pk,
+            'group_name': group.group_name,
+            'capacity': group.capacity,
+            'current_count': int(plan['current'][index]),
+            'assigned_count': int(added[index]),
+            'final_count': int(plan['current'][index] + added[index]),
+            'composition': {
+                name: {label: int(count) for label, count in zip(labels, counts[index]) if count}
+                for name, (labels, counts) in composition.items()
+            },
+        })
+
+    return {
+        'student_count': len(indexes),
+        'assigned_count': int(assigned.sum()),
+        'unassigned_count': int((~assigned).sum()),
+        'groups': groups,
+    }
@@ -0,0 +1,34 @@
+"""分组名单（GET /api/groups/{id}/students/）的过滤、搜索和排序
+
+名单的查询集为学生（附带分配信息），与分组列表本身的过滤配置不同，
+这些过滤器从视图的 roster_* 属性读取配置，全部在 SQL 中完成。
+"""
+from django_filters import rest_framework as django_filters
+from rest_framework import filters
+from core.models import Student
+
+
+class GroupRosterFilterSet(django_filters.FilterSet):
+    """分组名单过滤：性别、住校情况、校服购买、信息完整度、导入批次"""
+
+    class Meta:
+        model = Student
+        fields = ['gender', 'residence_status', 'uniform_purchase', 'info_status', 'import_batch']
+
+
+class RosterFilterBackend(django_filters.DjangoFilterBackend):
+    def get_filterset_class(self, view, queryset=None):
+        return GroupRosterFilterSet
+
+
+class RosterSearchFilter(filters.SearchFilter):
+    def get_search_fields(self, view, request):
+        return view.roster_search_fields
+
+
+class RosterOrderingFilter(filters.OrderingFilter):
+    def get_default_ordering(self, view):
+        return view.roster_ordering
+
+    def get_valid_fields(self, queryset, view, context=None):
+        return [(field, field) for field in view.roster_ordering_fields]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 03:09
+
+from django.db import migrations, models
+
+
+def backfill_assignment_updated_at(apps, schema_editor):
+    """已有分配记录的更新时间取分配时间"""
+    StudentGroupAssignment = apps.get_model('groups', 'StudentGroupAssignment')
+    StudentGroupAssignment.objects.update(updated_at=models.F('assigned_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0002_alter_groupinfo_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentgroupassignment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='更新时间'),
+        ),
+        migrations.RunPython(backfill_assignment_updated_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='groupinfo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='更新时间'),
+        ),
+    ]
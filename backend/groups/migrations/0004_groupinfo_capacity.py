@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0003_studentgroupassignment_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupinfo',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='分组最多容纳的学生数，为空表示不限', null=True, verbose_name='容量'),
+        ),
+    ]
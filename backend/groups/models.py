@@ -1,6 +1,116 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import RegexValidator
-from core.models import Student
+from django.utils import timezone
+from core.db import chunked, retry_on_locked
+from core.models import Student, Tombstone
+
+
+# 批量写入每批的行数
+BULK_WRITE_BATCH_SIZE = 500
+
+
+class GroupInfoQuerySet(models.QuerySet):
+    """分组查询集"""
+    
+    def with_student_count(self):
+        """标注分组的有效学生数量（student_count），避免逐个分组查询"""
+        return self.annotate(
+            student_count=models.Count(
+                'student_assignments',
+                filter=models.Q(student_assignments__is_active=True)
+            )
+        )
+    
+    @retry_on_locked
+    def delete(self):
+        """删除分组，同时为分组及级联删除的分配记录写入删除记录"""
+        from core.portal import invalidate_group_portal_entries
+        
+        with transaction.atomic(using=self.db):
+            group_ids = list(self.values_list('id', flat=True))
+            invalidate_group_portal_entries(group_ids)
+            Tombstone.record(
+                'assignment',
+                StudentGroupAssignment.objects.filter(group_info_id__in=group_ids).values_list('id', flat=True)
+            )
+            Tombstone.record('group', group_ids)
+            return super().delete()
+    
+    def delete_in_chunks(self, chunk_size=None, progress=None):
+        """分块删除分组及其分配记录（每块一个短事务），适用于大批量删除，参见 core.deletion"""
+        from core.deletion import DELETE_CHUNK_SIZE, delete_groups
+        
+        return delete_groups(self, chunk_size=chunk_size or DELETE_CHUNK_SIZE, progress=progress)
+
+
+class StudentGroupAssignmentQuerySet(models.QuerySet):
+    """学生分组分配查询集"""
+    
+    def existing_pairs(self, student_ids, group_ids):
+        """查询学生与分组之间已有的分配记录（有效或已失效），返回 {(学生ID, 分组ID): 分配记录}"""
+        existing = {}
+        if not group_ids:
+            return existing
+        group_chunks = list(chunked(group_ids))
+        for student_chunk in chunked(student_ids):
+            for group_chunk in group_chunks:
+                for assignment in self.filter(
+                    student_id__in=student_chunk, group_info_id__in=group_chunk
+                ).order_by().only('id', 'student_id', 'group_info_id', 'is_active', 'assigned_at'):
+                    existing[(assignment.student_id, assignment.group_info_id)] = assignment
+        return existing
+    
+    @retry_on_locked
+    def bulk_assign(self, items, existing_assignments=None):
+        """批量分配：新分配分批 bulk_create 插入，已失效的同一学生、分组分配（联合唯一）重新设为有效
+        
+        items 为 [{'student_id', 'group_info_id', 'remarks'}]，调用方应已排除有效分配冲突；
+        existing_assignments 为 existing_pairs 的结果，未提供时查询一次。
+        数据版本号和门户缓存失效整批只处理一次。返回 (按 items 顺序的分配记录, 重新启用的数量)。
+        """
+        from core.cache import bump_model_versions
+        from core.portal import invalidate_portal_entries
+        
+        if existing_assignments is None:
+            existing_assignments = self.existing_pairs(
+                {item['student_id'] for item in items}, {item['group_info_id'] for item in items}
+            )
+        
+        now = timezone.now()
+        assignments = []
+        new_assignments = []
+        reactivated = []
+        for item in items:
+            assignment = existing_assignments.get((item['student_id'], item['group_info_id']))
+            if assignment is None:
+                assignment = self.model(**item)
+                new_assignments.append(assignment)
+            else:
+                assignment.is_active = True
+                assignment.remarks = item.get('remarks', '')
+                assignment.updated_at = now
+                reactivated.append(assignment)
+            assignments.append(assignment)
+        
+        with transaction.atomic(using=self.db):
+            # bulk_create 为传入的对象设置主键，返回结果保持提交顺序
+            self.bulk_create(new_assignments, batch_size=BULK_WRITE_BATCH_SIZE)
+            self.bulk_update(reactivated, ['is_active', 'remarks', 'updated_at'], batch_size=BULK_WRITE_BATCH_SIZE)
+            
+            # bulk_create / bulk_update 不发送 post_save 信号
+            bump_model_versions(self.model)
+            invalidate_portal_entries({item['student_id'] for item in items})
+        return assignments, len(reactivated)
+    
+    @retry_on_locked
+    def delete(self):
+        """删除分配记录并写入删除记录"""
+        from core.portal import invalidate_portal_entries
+        
+        with transaction.atomic(using=self.db):
+            invalidate_portal_entries(set(self.values_list('student_id', flat=True)))
+            Tombstone.record('assignment', list(self.values_list('id', flat=True)))
+            return super().delete()
 
 
 class GroupInfo(models.Model):
@@ -21,10 +131,13 @@ class GroupInfo(models.Model):
         validators=[phone_validator]
     )
     report_location = models.CharField('报到地点', max_length=200)
+    capacity = models.PositiveIntegerField('容量', null=True, blank=True, help_text='分组最多容纳的学生数，为空表示不限')
     
     # 系统字段
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
-    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True, db_index=True)
+    
+    objects = GroupInfoQuerySet.as_manager()
     
     class Meta:
         verbose_name = '分组信息'
@@ -33,6 +146,27 @@ class GroupInfo(models.Model):
     
     def __str__(self):
         return f"{self.group_name}"
+    
+    def roster(self):
+        """分组名单：有效分配到本分组的学生，附带分配ID、分配时间和分配备注"""
+        return Student.objects.filter(
+            group_assignments__group_info=self, group_assignments__is_active=True
+        ).annotate(
+            assignment_id=models.F('group_assignments__id'),
+            assigned_at=models.F('group_assignments__assigned_at'),
+            assignment_remarks=models.F('group_assignments__remarks'),
+        ).order_by('-assigned_at', 'pk')
+    
+    @retry_on_locked
+    def delete(self, *args, **kwargs):
+        """删除分组时记录删除信息（含级联删除的分配记录）"""
+        from core.portal import invalidate_group_portal_entries
+        
+        with transaction.atomic():
+            invalidate_group_portal_entries([self.pk])
+            Tombstone.record('assignment', self.student_assignments.values_list('id', flat=True))
+            Tombstone.record('group', [self.pk])
+            return super().delete(*args, **kwargs)
 
 
 class StudentGroupAssignment(models.Model):
@@ -55,6 +189,9 @@ class StudentGroupAssignment(models.Model):
     assigned_at = models.DateTimeField('分配时间', auto_now_add=True)
     is_active = models.BooleanField('是否有效', default=True)
     remarks = models.TextField('备注', blank=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True, db_index=True)
+    
+    objects = StudentGroupAssignmentQuerySet.as_manager()
     
     class Meta:
         verbose_name = '学生分组分配'
@@ -64,3 +201,13 @@ class StudentGroupAssignment(models.Model):
     
     def __str__(self):
         return f"{self.student.name} -> {self.group_info.group_name}"
+    
+    @retry_on_locked
+    def delete(self, *args, **kwargs):
+        """删除分配记录时记录删除信息"""
+        from core.portal import invalidate_portal_entries
+        
+        with transaction.atomic():
+            invalidate_portal_entries([self.student_id])
+            Tombstone.record('assignment', [self.pk])
+            return super().delete(*args, **kwargs)
@@ -1,6 +1,9 @@
 from rest_framework import serializers
+from .auto_assign import BALANCE_DIMENSIONS, DEFAULT_BALANCE_BY
 from .models import GroupInfo, StudentGroupAssignment
-from core.serializers import StudentListSerializer
+from core.db import chunked
+from core.models import Student
+from core.serializers import BulkItemListSerializer, StudentListSerializer
 
 
 class GroupInfoSerializer(serializers.ModelSerializer):
@@ -12,14 +15,17 @@ class GroupInfoSerializer(serializers.ModelSerializer):
         model = GroupInfo
         fields = [
             'id', 'group_name', 'group_teacher',
-            'teacher_phone', 'report_location', 'student_count',
+            'teacher_phone', 'report_location', 'capacity', 'student_count',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
     
     def get_student_count(self, obj):
-        """获取分组中的学生数量"""
-        return obj.student_assignments.filter(is_active=True).count()
+        """获取分组中的学生数量（优先使用查询集标注的 student_count）"""
+        student_count = getattr(obj, 'student_count', None)
+        if student_count is None:
+            student_count = obj.student_assignments.filter(is_active=True).count()
+        return student_count
     
     def validate_teacher_phone(self, value):
         """验证教师手机号格式"""
@@ -38,9 +44,9 @@ class StudentGroupAssignmentSerializer(serializers.ModelSerializer):
         model = StudentGroupAssignment
         fields = [
             'id', 'student', 'student_info', 'group_info', 'group_info_detail',
-            'assigned_at', 'is_active', 'remarks'
+            'assigned_at', 'updated_at', 'is_active', 'remarks'
         ]
-        read_only_fields = ['assigned_at']
+        read_only_fields = ['assigned_at', 'updated_at']
     
     def validate(self, data):
         """验证学生分组分配"""
@@ -58,27 +64,114 @@ class StudentGroupAssignmentSerializer(serializers.ModelSerializer):
         return data
 
 
-class GroupStudentListSerializer(serializers.ModelSerializer):
-    """分组学生列表序列化器"""
+class StudentGroupAssignmentBulkListSerializer(BulkItemListSerializer):
+    """学生分组批量分配列表序列化器
+    
+    学生、分组主键各用一次查询确认存在，已有分配用一次查询检查冲突：
+    学生已有效分配到该分组的条目报错，已存在但已失效的分配（学生与分组联合唯一）重新设为有效，
+    其余分批 bulk_create 插入。错误返回方式及 partial_success 的含义见 BulkItemListSerializer。
+    """
+    
+    item_label = '分配信息'
+    
+    def check_items(self, valid, errors):
+        student_ids = {attrs['student_id'] for index, attrs in valid}
+        group_ids = {attrs['group_info_id'] for index, attrs in valid}
+        existing_students = set()
+        for chunk in chunked(student_ids):
+            existing_students.update(Student.objects.filter(id__in=chunk).order_by().values_list('id', flat=True))
+        existing_groups = set()
+        for chunk in chunked(group_ids):
+            existing_groups.update(GroupInfo.objects.filter(id__in=chunk).order_by().values_list('id', flat=True))
+        
+        # 已有的分配记录（有效或已失效）：{(学生ID, 分组ID): 分配记录}
+        self.existing_assignments = StudentGroupAssignment.objects.existing_pairs(
+            student_ids & existing_students, existing_groups
+        )
+        
+        first_seen = {}
+        for index, attrs in valid:
+            if index in errors:
+                continue
+            pair = (attrs['student_id'], attrs['group_info_id'])
+            item_errors = {}
+            if pair[0] not in existing_students:
+                item_errors['student'] = ['学生不存在']
+            if pair[1] not in existing_groups:
+                item_errors['group_info'] = ['分组不存在']
+            if not item_errors:
+                assignment = self.existing_assignments.get(pair)
+                if assignment is not None and assignment.is_active:
+                    item_errors['non_field_errors'] = ['该学生已经分配到此分组']
+                elif pair in first_seen:
+                    item_errors['non_field_errors'] = [f'与索引 {first_seen[pair]} 的条目重复']
+                else:
+                    first_seen[pair] = index
+            if item_errors:
+                errors[index] = item_errors
+    
+    def create(self, validated_data):
+        """插入新的分配并重新启用已失效的分配（参见 StudentGroupAssignmentQuerySet.bulk_assign）"""
+        assignments, self.reactivated_count = StudentGroupAssignment.objects.bulk_assign(
+            validated_data, self.existing_assignments
+        )
+        return assignments
+
+
+class StudentGroupAssignmentBulkSerializer(serializers.ModelSerializer):
+    """学生分组批量分配序列化器（紧凑格式，不嵌套学生及分组信息）"""
     
-    students = serializers.SerializerMethodField()
+    student = serializers.IntegerField(source='student_id')
+    group_info = serializers.IntegerField(source='group_info_id')
     
     class Meta:
-        model = GroupInfo
-        fields = [
-            'id', 'group_name', 'group_teacher',
-            'teacher_phone', 'report_location', 'students'
-        ]
+        model = StudentGroupAssignment
+        fields = ['id', 'student', 'group_info', 'assigned_at', 'remarks']
+        read_only_fields = ['assigned_at']
+        list_serializer_class = StudentGroupAssignmentBulkListSerializer
+        # 唯一性及冲突由 StudentGroupAssignmentBulkListSerializer 集合化检查
+        validators = []
+
+
+class StudentGroupAssignmentCompactSerializer(serializers.ModelSerializer):
+    """学生分组分配紧凑序列化器（学生、分组只输出ID，详情通过 included 单独返回）"""
     
-    def get_students(self, obj):
-        """获取分组中的所有学生"""
-        assignments = obj.student_assignments.filter(is_active=True).select_related('student')
-        return [
-            {
-                'assignment_id': assignment.id,
-                'student': StudentListSerializer(assignment.student).data,
-                'assigned_at': assignment.assigned_at,
-                'remarks': assignment.remarks
-            }
-            for assignment in assignments
-        ]
+    class Meta:
+        model = StudentGroupAssignment
+        fields = ['id', 'student', 'group_info', 'assigned_at', 'updated_at', 'is_active', 'remarks']
+
+
+class AutoAssignSerializer(serializers.Serializer):
+    """自动分组参数"""
+    
+    group_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    import_batches = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+    balance_by = serializers.ListField(
+        child=serializers.ChoiceField(choices=list(BALANCE_DIMENSIONS)), default=DEFAULT_BALANCE_BY
+    )
+    seed = serializers.IntegerField(min_value=0, max_value=2 ** 32 - 1, required=False)
+    dry_run = serializers.BooleanField(default=True)
+    remarks = serializers.CharField(default='自动分配', allow_blank=True)
+    
+    def validate_group_ids(self, value):
+        """分组ID必须全部存在，不存在的ID一并列出"""
+        group_ids = list(dict.fromkeys(value))
+        existing = set()
+        for chunk in chunked(group_ids):
+            existing.update(GroupInfo.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+        missing = [group_id for group_id in group_ids if group_id not in existing]
+        if missing:
+            raise serializers.ValidationError(f'分组不存在：{", ".join(map(str, missing))}')
+        return group_ids
+    
+    def validate_balance_by(self, value):
+        return list(dict.fromkeys(value))
+
+
+class GroupRosterEntrySerializer(serializers.Serializer):
+    """分组名单条目序列化器（学生查询集附带 GroupInfo.roster() 注解的分配信息）"""
+    
+    assignment_id = serializers.IntegerField(read_only=True)
+    student = StudentListSerializer(source='*', read_only=True)
+    assigned_at = serializers.DateTimeField(read_only=True)
+    remarks = serializers.CharField(source='assignment_remarks', read_only=True)
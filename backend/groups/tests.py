@@ -1,3 +1,289 @@
-from django.test import TestCase
+from unittest import mock
+import numpy as np
+from django.core.cache import caches
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from core.db import LOOKUP_CHUNK_SIZE, chunked
+from core.models import Student, Tombstone
+from core.tests import SIQCSTestCase, id_card, make_group, make_student
+from .auto_assign import plan_assignment
+from .models import GroupInfo, StudentGroupAssignment
+from .views import RosterPagination, StudentGroupAssignmentViewSet
 
-# Create your tests here.
+
+class ChunkedTests(SIQCSTestCase):
+    def test_splits_values_into_lookup_chunks(self):
+        chunks = list(chunked(range(LOOKUP_CHUNK_SIZE * 2 + 1)))
+        self.assertEqual([len(chunk) for chunk in chunks], [LOOKUP_CHUNK_SIZE, LOOKUP_CHUNK_SIZE, 1])
+        self.assertEqual(list(chunked([])), [])
+
+
+class PlanAssignmentTests(SIQCSTestCase):
+    def test_groups_are_filled_to_equal_levels_within_capacity(self):
+        plan = plan_assignment(np.zeros(10, dtype=np.int64), current=[5, 0, 2], remaining=[10, 3, 10], seed=1)
+        added = np.bincount(plan, minlength=3)
+        self.assertEqual(added.tolist(), [2, 3, 5])
+        self.assertEqual((added + [5, 0, 2]).tolist(), [7, 3, 7])
+
+        # 容量不足时多余的学生不分配
+        plan = plan_assignment(np.zeros(10, dtype=np.int64), current=[0, 0], remaining=[2, 3], seed=1)
+        self.assertEqual(np.bincount(plan[plan >= 0]).tolist(), [2, 3])
+        self.assertEqual(int((plan == -1).sum()), 5)
+
+    def test_strata_are_apportioned_to_each_group(self):
+        strata = np.repeat([0, 1, 2], [60, 30, 10])
+        plan = plan_assignment(strata, current=[0] * 4, remaining=[100] * 4, seed=7)
+        self.assertEqual(np.bincount(plan).tolist(), [25] * 4)
+        for group in range(4):
+            counts = np.bincount(strata[plan == group], minlength=3)
+            for stratum, expected in enumerate([15, 7.5, 2.5]):
+                self.assertLessEqual(abs(counts[stratum] - expected), 1)
+
+    def test_short_capacity_keeps_stratum_proportions(self):
+        strata = np.repeat([0, 1], [80, 20])
+        plan = plan_assignment(strata, current=[0, 0], remaining=[25, 25], seed=3)
+        self.assertEqual(np.bincount(strata[plan >= 0]).tolist(), [40, 10])
+
+    def test_same_seed_gives_same_plan(self):
+        strata = np.arange(50) % 3
+        first = plan_assignment(strata, [0, 0, 0], [20, 20, 20], seed=42)
+        self.assertEqual(first.tolist(), plan_assignment(strata, [0, 0, 0], [20, 20, 20], seed=42).tolist())
+        self.assertEqual(plan_assignment([], [0], [10]).tolist(), [])
+        self.assertEqual(plan_assignment([0, 0], [], []).tolist(), [-1, -1])
+
+
+class AutoAssignTests(SIQCSTestCase):
+    url = '/api/groups/auto_assign/'
+
+    def setUp(self):
+        super().setUp()
+        self.groups = [make_group(index, capacity=4) for index in range(3)]
+        for index in range(8):
+            make_student(index, gender='MF'[index % 2])
+
+    def test_preview_and_commit_with_same_seed_agree(self):
+        response = self.client.post(self.url, {'seed': 5}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        preview = response.json()
+        self.assertEqual(preview['assigned_count'], 8)
+        self.assertFalse(StudentGroupAssignment.objects.exists())
+        for group in preview['groups']:
+            self.assertLessEqual(group['final_count'], 4)
+            self.assertLessEqual(abs(group['composition']['gender'].get('M', 0) - group['assigned_count'] / 2), 1)
+
+        response = self.client.post(self.url, {'seed': 5, 'dry_run': False}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['groups'], preview['groups'])
+        self.assertEqual(response.json()['created_count'], 8)
+        for group in preview['groups']:
+            self.assertEqual(
+                StudentGroupAssignment.objects.filter(group_info_id=group['id']).count(), group['assigned_count']
+            )
+
+    def test_unknown_group_ids_are_rejected(self):
+        response = self.client.post(
+            self.url, {'group_ids': [self.groups[0].pk, 0, -1, 0], 'dry_run': False}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'group_ids': ['分组不存在：0, -1']})
+        self.assertFalse(StudentGroupAssignment.objects.exists())
+
+        response = self.client.post(self.url, {'group_ids': [self.groups[0].pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([group['id'] for group in response.json()['groups']], [self.groups[0].pk])
+        self.assertEqual(response.json()['unassigned_count'], 4)
+
+
+class GroupRosterTests(SIQCSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.group = make_group(1)
+        self.url = f'/api/groups/{self.group.pk}/students/'
+        for index in range(25):
+            StudentGroupAssignment.objects.create(
+                student=make_student(index, gender='MF'[index % 2]), group_info=self.group
+            )
+
+    def test_roster_is_always_paginated(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['count'], 25)
+        self.assertEqual(len(data['results']), 20)
+        self.assertIsNotNone(data['next'])
+        self.assertEqual(data['group']['id'], self.group.pk)
+        self.assertEqual(data['group']['student_count'], 25)
+
+        data = self.client.get(self.url, {'page': 2}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next'])
+
+    def test_page_size_opts_into_larger_pages(self):
+        data = self.client.get(self.url, {'page_size': 100}).json()
+        self.assertEqual(len(data['results']), 25)
+        self.assertIsNone(data['next'])
+        with mock.patch.object(RosterPagination, 'max_page_size', 10):
+            self.assertEqual(len(self.client.get(self.url, {'page_size': 100}).json()['results']), 10)
+
+    def test_filters_and_ordering_apply_before_pagination(self):
+        data = self.client.get(self.url, {'gender': 'F', 'ordering': 'name', 'page_size': 5}).json()
+        self.assertEqual(data['count'], 12)
+        names = [row['student']['name'] for row in data['results']]
+        self.assertEqual(names, sorted(names))
+        self.assertTrue(all(row['student']['gender_display'] == '女' for row in data['results']))
+
+
+class CompactAssignmentListTests(SIQCSTestCase):
+    url = '/api/assignments/'
+
+    def setUp(self):
+        super().setUp()
+        self.groups = [make_group(index) for index in range(2)]
+        for index in range(6):
+            StudentGroupAssignment.objects.create(student=make_student(index), group_info=self.groups[index % 2])
+
+    def test_compact_format_side_loads_distinct_records(self):
+        nested = self.client.get(self.url).json()
+        for params in [{'format': 'compact'}, {'include': 'students,groups'}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(data['count'], 6)
+                self.assertEqual(
+                    [(row['id'], row['student'], row['group_info']) for row in data['results']],
+                    [(row['id'], row['student'], row['group_info']) for row in nested['results']]
+                )
+                self.assertEqual(sorted(data['included']['groups']), sorted(str(group.pk) for group in self.groups))
+                self.assertEqual(len(data['included']['students']), 6)
+                self.assertEqual(data['included']['groups'][str(self.groups[0].pk)]['student_count'], 3)
+                self.assertNotIn('student_info', data['results'][0])
+
+        data = self.client.get(self.url, {'include': 'groups'}).json()
+        self.assertEqual(list(data['included']), ['groups'])
+        self.assertEqual(self.client.get(self.url, {'include': 'teachers'}).status_code, 400)
+        # 其余 format 取值仍用于选择渲染器
+        self.assertEqual(self.client.get(self.url, {'format': 'json'}).status_code, 200)
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 404)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def count_queries():
+            caches['default'].clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(self.url, {'format': 'compact'}).status_code, 200)
+            return len(queries)
+
+        before = count_queries()
+        group = make_group(9)
+        for index in range(10, 20):
+            StudentGroupAssignment.objects.create(student=make_student(index), group_info=group)
+        self.assertEqual(count_queries(), before)
+
+    def test_unpaginated_response_includes_records(self):
+        with mock.patch.object(StudentGroupAssignmentViewSet, 'pagination_class', None):
+            data = self.client.get(self.url, {'format': 'compact'}).json()
+            self.assertIsInstance(self.client.get(self.url).json(), list)
+        self.assertEqual(len(data['results']), 6)
+        self.assertEqual(len(data['included']['students']), 6)
+        self.assertEqual(len(data['included']['groups']), 2)
+
+
+class BulkAssignTests(SIQCSTestCase):
+    url = '/api/assignments/bulk_assign/'
+
+    def setUp(self):
+        super().setUp()
+        self.groups = [make_group(index) for index in range(2)]
+        self.students = [make_student(index) for index in range(4)]
+
+    def item(self, student, group, **fields):
+        return {'student': student.pk, 'group_info': group.pk, **fields}
+
+    def test_errors_are_reported_by_position(self):
+        StudentGroupAssignment.objects.create(student=self.students[0], group_info=self.groups[0])
+        items = [
+            self.item(self.students[0], self.groups[0]),
+            {'student': 0, 'group_info': self.groups[0].pk},
+            {'student': self.students[1].pk, 'group_info': 0},
+            self.item(self.students[2], self.groups[1]),
+            self.item(self.students[2], self.groups[1]),
+            {'student': 'x'},
+        ]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = {error['index']: error['errors'] for error in response.json()}
+        self.assertEqual(sorted(errors), [0, 1, 2, 4, 5])
+        self.assertEqual(errors[1], {'student': ['学生不存在']})
+        self.assertEqual(errors[2], {'group_info': ['分组不存在']})
+        self.assertIn('索引 3', errors[4]['non_field_errors'][0])
+        self.assertEqual(StudentGroupAssignment.objects.count(), 1)
+
+        response = self.client.post(f'{self.url}?partial_success=1', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['created_count'], response.json()['error_count']), (1, 5))
+
+    def test_inactive_assignments_are_reactivated(self):
+        StudentGroupAssignment.objects.create(
+            student=self.students[0], group_info=self.groups[0], is_active=False, remarks='旧'
+        )
+        response = self.client.post(self.url, [
+            self.item(self.students[0], self.groups[0], remarks='重新分配'),
+            self.item(self.students[1], self.groups[0]),
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['created_count'], response.json()['reactivated_count']), (1, 1))
+        assignment = StudentGroupAssignment.objects.get(student=self.students[0])
+        self.assertTrue(assignment.is_active)
+        self.assertEqual(assignment.remarks, '重新分配')
+        self.assertEqual(StudentGroupAssignment.objects.count(), 2)
+
+    def test_large_batches_are_looked_up_in_chunks(self):
+        students = Student.objects.bulk_create([
+            Student(name=f'批量{index}', id_card_number=id_card(index + 100), notification_number=f'B{index}')
+            for index in range(LOOKUP_CHUNK_SIZE * 2 + 10)
+        ])
+        items = [self.item(student, self.groups[index % 2]) for index, student in enumerate(students)]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created_count'], len(students))
+        self.assertEqual(StudentGroupAssignment.objects.filter(is_active=True).count(), len(students))
+
+
+@mock.patch('core.deletion.DELETE_CHUNK_SIZE', 2)
+class GroupBulkDeleteTests(SIQCSTestCase):
+    url = '/api/groups/bulk_delete/'
+
+    def setUp(self):
+        super().setUp()
+        self.groups = [make_group(index) for index in range(3)]
+        for index in range(5):
+            StudentGroupAssignment.objects.create(student=make_student(index), group_info=self.groups[0])
+
+    def test_reports_counts_per_chunk(self):
+        response = self.client.delete(self.url, {'group_ids': [group.pk for group in self.groups[:2]]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['deleted_groups'], response.json()['deleted_assignments']), (2, 5))
+        self.assertEqual(response.json()['chunks'], [
+            {'groups': 0, 'assignments': 2}, {'groups': 0, 'assignments': 2},
+            {'groups': 0, 'assignments': 1}, {'groups': 2, 'assignments': 0},
+        ])
+        self.assertEqual(list(GroupInfo.objects.values_list('pk', flat=True)), [self.groups[2].pk])
+        self.assertEqual(Student.objects.count(), 5)
+        self.assertEqual(Tombstone.objects.filter(kind='assignment').count(), 5)
+
+        response = self.client.delete(self.url, {'group_names': [self.groups[2].group_name]}, format='json')
+        self.assertEqual(response.json()['deleted_groups'], 1)
+        self.assertEqual(self.client.delete(self.url, {'group_ids': 1}, format='json').status_code, 400)
+
+    def test_failure_reports_chunks_already_deleted(self):
+        record = Tombstone.record
+
+        def fail_on_groups(kind, object_ids):
+            if kind == 'group':
+                raise DatabaseError('disk I/O error')
+            return record(kind, object_ids)
+
+        with mock.patch.object(Tombstone, 'record', side_effect=fail_on_groups):
+            response = self.client.delete(self.url, {'delete_all': True}, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual((response.json()['deleted_groups'], response.json()['deleted_assignments']), (0, 5))
+        self.assertEqual(GroupInfo.objects.count(), 3)
+        self.assertFalse(StudentGroupAssignment.objects.exists())
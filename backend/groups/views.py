@@ -1,31 +1,70 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Q
+from django.db import DatabaseError
+from django.db.models import Prefetch
 from django.http import HttpResponse
 import os
+import secrets
 import tempfile
+from .auto_assign import build_plan, commit_plan, summarize_plan
 from .models import GroupInfo, StudentGroupAssignment
+from .filters import RosterFilterBackend, RosterOrderingFilter, RosterSearchFilter
 from .serializers import (
+    AutoAssignSerializer,
     GroupInfoSerializer, 
     StudentGroupAssignmentSerializer,
-    GroupStudentListSerializer
+    StudentGroupAssignmentBulkSerializer,
+    StudentGroupAssignmentCompactSerializer,
+    GroupRosterEntrySerializer
 )
+from core.cache import cached_action
+from core.conditional import ConditionalGetMixin, conditional_get
+from core.db import RetryOnLockedMixin
+from core.deletion import DeletionProgress
+from core.filters import UpdatedSinceFilter, parse_bool_param
+from core.models import Student
+from core.serializers import StudentListSerializer
 from core.services import GroupImportService, ExcelTemplateGenerator
 
 
-class GroupInfoViewSet(viewsets.ModelViewSet):
+class RosterPagination(PageNumberPagination):
+    """分组名单分页：默认页大小与其他列表相同，可用 ?page_size= 取更大的页（不超过 max_page_size）"""
+    
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class GroupInfoViewSet(RetryOnLockedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """分组信息API视图集"""
     
-    queryset = GroupInfo.objects.all()
+    queryset = GroupInfo.objects.with_student_count()
     serializer_class = GroupInfoSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, UpdatedSinceFilter, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['group_name', 'group_teacher']
     search_fields = ['group_name', 'group_teacher', 'report_location']
-    ordering_fields = ['group_name', 'created_at']
+    ordering_fields = ['group_name', 'created_at', 'updated_at']
     ordering = ['group_name']
+    conditional_models = [GroupInfo, StudentGroupAssignment]
+    cached_actions = ['list']
+    
+    # 分组名单（students 动作）的过滤、搜索和排序配置
+    roster_filter_backends = [RosterFilterBackend, RosterSearchFilter, RosterOrderingFilter]
+    roster_search_fields = ['name', 'id_card_number', 'notification_number', 'import_batch']
+    roster_ordering_fields = ['name', 'assigned_at', 'created_at', 'updated_at', 'profile_completed_at', 'id']
+    roster_ordering = ['-assigned_at', 'id']
+    
+    def filter_queryset(self, queryset):
+        # students 动作的查询参数作用于名单，不用于查找分组本身
+        if self.action == 'students':
+            return queryset
+        return super().filter_queryset(queryset)
     
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def import_excel(self, request):
@@ -69,6 +108,7 @@ class GroupInfoViewSet(viewsets.ModelViewSet):
                 os.unlink(temp_file_path)
     
     @action(detail=False, methods=['get'])
+    @cached_action(models=[])
     def download_template(self, request):
         """下载分组信息导入模板"""
         # 创建临时文件
@@ -95,28 +135,39 @@ class GroupInfoViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def students(self, request, pk=None):
-        """获取分组中的学生列表"""
+        """获取分组中的学生列表
+        
+        支持 ?gender=、?residence_status=、?uniform_purchase=、?info_status=、?import_batch= 过滤，
+        ?search= 搜索和 ?ordering= 排序；始终分页返回 {count, next, previous, results, group}，
+        ?page_size= 可取更大的页（见 RosterPagination）。
+        """
         group = self.get_object()
-        serializer = GroupStudentListSerializer(group)
-        return Response(serializer.data)
+        roster = group.roster()
+        for backend in self.roster_filter_backends:
+            roster = backend().filter_queryset(request, roster, self)
+        
+        paginator = RosterPagination()
+        page = paginator.paginate_queryset(roster, request, view=self)
+        response = paginator.get_paginated_response(GroupRosterEntrySerializer(page, many=True).data)
+        response.data['group'] = GroupInfoSerializer(group).data
+        return response
     
     @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_action
     def statistics(self, request):
         """获取分组统计信息"""
-        queryset = self.get_queryset()
+        groups = list(self.get_queryset())
         
         # 分组统计
-        total_groups = queryset.count()
-        groups_with_students = queryset.annotate(
-            student_count=Count('student_assignments', filter=Q(student_assignments__is_active=True))
-        )
+        total_groups = len(groups)
         
         # 教师统计
-        teachers = queryset.values('group_teacher').distinct().count()
+        teachers = len({group.group_teacher for group in groups})
         
         # 学生分布统计
         group_student_stats = []
-        for group in groups_with_students:
+        for group in groups:
             group_student_stats.append({
                 'group_name': group.group_name,
                 'group_teacher': group.group_teacher,
@@ -131,6 +182,40 @@ class GroupInfoViewSet(viewsets.ModelViewSet):
             'group_details': group_student_stats
         })
     
+    @action(detail=False, methods=['post'])
+    def auto_assign(self, request):
+        """自动分组：把未分组学生按容量分配到各分组，并均衡性别、住校情况等构成
+        
+        dry_run 为真（默认）时只返回预览；返回的 seed 随提交请求一并传回，可得到与预览相同的方案。
+        """
+        serializer = AutoAssignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        seed = params.get('seed')
+        if seed is None:
+            seed = secrets.randbelow(2 ** 32)
+        students = groups = None
+        if 'import_batches' in params:
+            students = Student.objects.filter(import_batch__in=params['import_batches'])
+        if 'group_ids' in params:
+            groups = GroupInfo.objects.filter(pk__in=params['group_ids'])
+        
+        if params['dry_run']:
+            plan = build_plan(students, groups, params['balance_by'], seed)
+            return Response({'seed': seed, 'dry_run': True, **summarize_plan(plan)})
+        
+        plan, created_count, reactivated_count = commit_plan(
+            students, groups, params['balance_by'], seed, params['remarks']
+        )
+        return Response({
+            'seed': seed,
+            'dry_run': False,
+            'created_count': created_count,
+            'reactivated_count': reactivated_count,
+            **summarize_plan(plan)
+        }, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'])
     def assign_student(self, request, pk=None):
         """为分组分配学生"""
@@ -145,7 +230,6 @@ class GroupInfoViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            from core.models import Student
             student = Student.objects.get(id=student_id)
         except Student.DoesNotExist:
             return Response(
@@ -170,6 +254,8 @@ class GroupInfoViewSet(viewsets.ModelViewSet):
             group_info=group,
             remarks=remarks
         )
+        # 重新读取分组以获得包含新分配的学生数量
+        assignment.group_info = self.get_queryset().get(pk=group.pk)
         
         serializer = StudentGroupAssignmentSerializer(assignment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -210,20 +296,11 @@ class GroupInfoViewSet(viewsets.ModelViewSet):
         delete_all = request.data.get('delete_all', False)
         
         if delete_all:
-            # 删除所有分组
-            assignment_count = StudentGroupAssignment.objects.count()
-            group_count = GroupInfo.objects.count()
-            
-            # 先删除所有分配记录
-            StudentGroupAssignment.objects.all().delete()
-            # 再删除所有分组
-            GroupInfo.objects.all().delete()
-            
-            return Response({
-                'message': f'成功删除所有分组（{group_count}个）和分配记录（{assignment_count}条）',
-                'deleted_groups': group_count,
-                'deleted_assignments': assignment_count
-            })
+            # 删除所有分组（先分块删除分配记录，再删除分组）
+            return self._delete_groups(
+                GroupInfo.objects.all(),
+                lambda groups, assignments: f'成功删除所有分组（{groups}个）和分配记录（{assignments}条）'
+            )
         
         if group_names:
             # 按分组名称删除
@@ -233,20 +310,10 @@ class GroupInfoViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            groups = GroupInfo.objects.filter(group_name__in=group_names)
-            assignment_count = StudentGroupAssignment.objects.filter(group_info__in=groups).count()
-            group_count = groups.count()
-            
-            # 先删除相关的分配记录
-            StudentGroupAssignment.objects.filter(group_info__in=groups).delete()
-            # 再删除分组
-            groups.delete()
-            
-            return Response({
-                'message': f'成功删除 {group_count} 个分组和 {assignment_count} 条分配记录',
-                'deleted_groups': group_count,
-                'deleted_assignments': assignment_count
-            })
+            return self._delete_groups(
+                GroupInfo.objects.filter(group_name__in=group_names),
+                lambda groups, assignments: f'成功删除 {groups} 个分组和 {assignments} 条分配记录'
+            )
         
         if group_ids:
             # 按ID列表删除
@@ -256,41 +323,140 @@ class GroupInfoViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            groups = GroupInfo.objects.filter(id__in=group_ids)
-            assignment_count = StudentGroupAssignment.objects.filter(group_info__in=groups).count()
-            group_count = groups.count()
-            
-            # 先删除相关的分配记录
-            StudentGroupAssignment.objects.filter(group_info__in=groups).delete()
-            # 再删除分组
-            groups.delete()
-            
-            return Response({
-                'message': f'成功删除 {group_count} 个分组和 {assignment_count} 条分配记录',
-                'deleted_groups': group_count,
-                'deleted_assignments': assignment_count
-            })
+            return self._delete_groups(
+                GroupInfo.objects.filter(id__in=group_ids),
+                lambda groups, assignments: f'成功删除 {groups} 个分组和 {assignments} 条分配记录'
+            )
         
         return Response(
             {'error': '请提供要删除的分组ID列表、分组名称列表或设置删除全部'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
+    
+    @staticmethod
+    def _delete_groups(queryset, message):
+        """分块删除分组及其分配记录，返回删除结果及每块提交的删除数量（取自 DELETE 语句的影响行数）
+        
+        块之间互不回滚，中途出现数据库错误时返回 500 和失败前已经删除的数量。
+        """
+        progress = DeletionProgress({GroupInfo: 'groups', StudentGroupAssignment: 'assignments'})
+        try:
+            queryset.delete_in_chunks(progress=progress)
+        except DatabaseError as e:
+            return Response({
+                'error': f'删除未完成: {str(e)}',
+                'deleted_groups': progress.totals['groups'],
+                'deleted_assignments': progress.totals['assignments'],
+                'chunks': progress.chunks
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response({
+            'message': message(progress.totals['groups'], progress.totals['assignments']),
+            'deleted_groups': progress.totals['groups'],
+            'deleted_assignments': progress.totals['assignments'],
+            'chunks': progress.chunks
+        })
+
+
+# ?format=compact 选择分配列表的紧凑格式，而不是渲染器
+COMPACT_FORMAT = 'compact'
+
+
+class CompactFormatNegotiation(DefaultContentNegotiation):
+    """内容协商：format 为 compact 时不按格式筛选渲染器（仍按 Accept 选择），其余取值照常处理"""
+    
+    def filter_renderers(self, renderers, format):
+        if format == COMPACT_FORMAT:
+            return renderers
+        return super().filter_renderers(renderers, format)
 
 
-class StudentGroupAssignmentViewSet(viewsets.ModelViewSet):
+class StudentGroupAssignmentViewSet(RetryOnLockedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """学生分组分配API视图集"""
     
     queryset = StudentGroupAssignment.objects.all()
     serializer_class = StudentGroupAssignmentSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, UpdatedSinceFilter, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['group_info__group_name', 'is_active']
     search_fields = ['student__name', 'student__id_card_number', 'group_info__group_name']
-    ordering_fields = ['assigned_at']
+    ordering_fields = ['assigned_at', 'updated_at']
     ordering = ['-assigned_at']
+    conditional_models = [StudentGroupAssignment, Student, GroupInfo]
+    content_negotiation_class = CompactFormatNegotiation
+    
+    # ?include= 可选的附带数据
+    include_choices = ['students', 'groups']
+    
+    def get_includes(self):
+        """解析 ?include=students,groups；?format=compact 等同于附带全部数据；都未提供时返回 None（使用嵌套格式）"""
+        if self.action != 'list':
+            return None
+        value = self.request.query_params.get('include')
+        if value is None:
+            format = self.format_kwarg or self.request.query_params.get(api_settings.URL_FORMAT_OVERRIDE)
+            return list(self.include_choices) if format == COMPACT_FORMAT else None
+        includes = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in includes if name not in self.include_choices]
+        if unknown:
+            raise ValidationError({
+                'include': f"不支持的附带数据: {', '.join(unknown)}，可选 {', '.join(self.include_choices)}"
+            })
+        return includes
     
     def get_queryset(self):
-        """优化查询，减少数据库访问"""
-        return super().get_queryset().select_related('student', 'group_info')
+        """优化查询，减少数据库访问（分组信息连同学生数量一次预取）"""
+        queryset = super().get_queryset()
+        if self.get_includes() is not None:
+            # 紧凑格式只读取分配表，附带的学生、分组在分页后一次预取
+            return queryset
+        return queryset.select_related('student').prefetch_related(
+            Prefetch('group_info', queryset=GroupInfo.objects.with_student_count())
+        )
+    
+    def get_serializer_class(self):
+        if self.get_includes() is not None:
+            return StudentGroupAssignmentCompactSerializer
+        return super().get_serializer_class()
+    
+    def list(self, request, *args, **kwargs):
+        """紧凑格式：分配记录只含学生、分组ID，去重后的学生、分组详情放在 included 中
+        
+        分页时 included 与 count、next 等并列；未分页时返回 {"results", "included"}。
+        """
+        response = super().list(request, *args, **kwargs)
+        includes = self.get_includes()
+        if includes is None or response.status_code != 200:
+            return response
+        if isinstance(response.data, dict):
+            # 分页时 paginate_queryset 已取出本页记录
+            response.data['included'] = self._get_included(self.paginator.page.object_list, includes)
+        else:
+            # 未分页时序列化器已遍历查询集，结果缓存在查询集上
+            assignments = response.data.serializer.instance
+            response.data = {'results': response.data, 'included': self._get_included(assignments, includes)}
+        return response
+    
+    def _get_included(self, assignments, includes):
+        """按ID去重后查询本页分配记录关联的学生、分组（每类一次查询）并序列化
+        
+        键为字符串形式的ID，JSON 与 MessagePack 响应的结构相同。
+        """
+        included = {}
+        if 'students' in includes:
+            students = Student.objects.filter(
+                pk__in={assignment.student_id for assignment in assignments}
+            ).order_by('pk')
+            included['students'] = {
+                str(student['id']): student for student in StudentListSerializer(students, many=True).data
+            }
+        if 'groups' in includes:
+            groups = GroupInfo.objects.with_student_count().filter(
+                pk__in={assignment.group_info_id for assignment in assignments}
+            ).order_by('pk')
+            included['groups'] = {
+                str(group['id']): group for group in GroupInfoSerializer(groups, many=True).data
+            }
+        return included
     
     @action(detail=False, methods=['post'])
     def bulk_assign(self, request):
@@ -303,11 +469,25 @@ class StudentGroupAssignmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        serializer = StudentGroupAssignmentSerializer(data=assignments_data, many=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # ?partial_success=1 时跳过有错误的条目，其余照常分配
+        partial_success = parse_bool_param(request, 'partial_success')
+        serializer = StudentGroupAssignmentBulkSerializer(
+            data=assignments_data, many=True,
+            context={**self.get_serializer_context(), 'partial_success': partial_success}
+        )
+        if not serializer.is_valid():
+            errors = getattr(serializer, 'item_errors', None) or serializer.errors
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer.save()
+        assigned = serializer.data
+        return Response({
+            'created_count': len(assigned) - serializer.reactivated_count,
+            'reactivated_count': serializer.reactivated_count,
+            'error_count': len(serializer.item_errors),
+            'assignments': assigned,
+            'errors': serializer.item_errors
+        }, status=status.HTTP_201_CREATED if assigned or not serializer.item_errors else status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def preview_import_assignments(self, request):
@@ -415,6 +595,7 @@ class StudentGroupAssignmentViewSet(viewsets.ModelViewSet):
                 os.unlink(temp_file_path)
     
     @action(detail=False, methods=['get'])
+    @cached_action(models=[])
     def download_assignment_template(self, request):
         """下载学生分组分配导入模板"""
         # 创建临时文件
@@ -0,0 +1,126 @@
+"""读写分离数据库路由
+
+只读请求（GET/HEAD/OPTIONS，以及用 read_replica 标记的只读接口）从 replica 读取，写操作始终写入 default。
+请求中一旦发生写操作，该请求剩余的读取都固定到 default（读己之写）；
+配置 REPLICA_LAG_TOLERANCE 后，还会通过 Cookie 把同一客户端随后一段时间内的请求固定到 default，
+避免刚提交的数据因副本延迟而“消失”。
+
+未配置 replica 数据库时路由不起作用；路由只依赖数据库别名，SQLite 与 PostgreSQL 副本均可使用。
+"""
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_DB_ALIAS = 'replica'
+REPLICA_PIN_COOKIE = 'siqcs_db_pin'
+
+# 会话、认证等数据始终读取主库（登录后立即读取会话，不能容忍复制延迟）
+PRIMARY_ONLY_APPS = {'admin', 'auth', 'contenttypes', 'sessions'}
+
+# 当前请求的路由状态：{'replica': 是否允许读副本, 'pinned': 是否已固定到主库, 'wrote': 是否发生写入}
+_routing_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def read_replica(view_method):
+    """将使用非安全方法的只读接口（如 POST 查询）标记为可以读取副本"""
+    def mark():
+        state = _routing_state.get()
+        if state is not None and not state['pinned']:
+            state['replica'] = True
+
+    if iscoroutinefunction(view_method):
+        @wraps(view_method)
+        async def async_wrapper(*args, **kwargs):
+            mark()
+            return await view_method(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(view_method)
+    def wrapper(*args, **kwargs):
+        mark()
+        return view_method(*args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """读操作按请求状态路由到 replica，写操作及迁移只针对 default"""
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if (state is None or not state['replica'] or state['pinned']
+                or model._meta.app_label in PRIMARY_ONLY_APPS or not replica_configured()):
+            return DEFAULT_DB_ALIAS
+        # 主库事务中的读取必须与写入在同一连接上
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state['pinned'] = state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本与主库数据相同，跨别名的关联视为同一数据库
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构通过复制（或 sync_replica 命令）获得
+        return db != REPLICA_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """为每个请求建立路由状态，并在写请求后设置固定到主库的 Cookie"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _routing_state.set(self._initial_state(request))
+        try:
+            response = self.get_response(request)
+            return self._process_response(response)
+        finally:
+            _routing_state.reset(token)
+
+    async def __acall__(self, request):
+        token = _routing_state.set(self._initial_state(request))
+        try:
+            response = await self.get_response(request)
+            return self._process_response(response)
+        finally:
+            _routing_state.reset(token)
+
+    @staticmethod
+    def _initial_state(request):
+        return {
+            'replica': request.method in ('GET', 'HEAD', 'OPTIONS'),
+            'pinned': REPLICA_PIN_COOKIE in request.COOKIES,
+            'wrote': False,
+        }
+
+    @staticmethod
+    def _process_response(response):
+        state = _routing_state.get()
+        tolerance = settings.REPLICA_LAG_TOLERANCE
+        # 只有本次请求发生写入时才设置（或延长）Cookie
+        if state['wrote'] and tolerance and replica_configured():
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, '1', max_age=tolerance, httponly=True, samesite='Lax'
+            )
+        return response
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 from dotenv import load_dotenv
 
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'siqcs_backend.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.VaryOnAcceptMiddleware',
 ]
 
 ROOT_URLCONF = 'siqcs_backend.urls'
@@ -83,13 +86,76 @@ WSGI_APPLICATION = 'siqcs_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite 生产调优：
+# - WAL 日志模式下读写互不阻塞，导入期间门户查询不会因写锁失败
+# - synchronous=NORMAL 在 WAL 模式下仍可保证崩溃一致性，减少每次提交的 fsync
+# - mmap_size / cache_size 扩大内存映射和页缓存（cache_size 为负数时单位为 KiB）
+# - timeout 即 busy_timeout，等待写锁的秒数；写事务以 BEGIN IMMEDIATE 开始，避免读锁升级时的死锁
+# 仍然出现的锁冲突由 core.db.retry_on_locked 重试
+
+SQLITE_INIT_COMMAND = ';'.join([
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+    f"PRAGMA cache_size={int(os.getenv('SQLITE_CACHE_SIZE', -64000))}",
+    'PRAGMA temp_store=MEMORY',
+])
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND,
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 20)),
+        },
+        # 测试数据库使用文件（同样启用 WAL），并发写入测试与线上的锁行为一致；
+        # 内存数据库的共享缓存模式下读取也会因表锁立即失败
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# 只读副本：设置 DATABASE_REPLICA_PATH 后启用（本地可用 sync_replica 命令从主库同步）；
+# 使用 PostgreSQL 等数据库时直接在此定义 'replica' 连接即可，路由无需修改
+if os.getenv('DATABASE_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DATABASE_REPLICA_PATH'),
+        # 测试时副本与主库使用同一个测试数据库
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['siqcs_backend.db_router.ReadReplicaRouter']
+
+# 客户端写入后在多少秒内的请求继续读取主库（应大于副本的最大复制延迟，0 表示只在当前请求内固定）
+REPLICA_LAG_TOLERANCE = int(os.getenv('REPLICA_LAG_TOLERANCE', 5))
+
+
+# Cache
+# 默认使用文件缓存，多个工作进程共享，无需额外部署 Redis；
+# 缓存失效依赖数据库中的数据版本号（core.DataVersion），可替换为任意共享缓存后端
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', str(BASE_DIR / 'django_cache')),
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    # 学生自助查询门户缓存（学生信息及分组），录取结果发布前可通过 warm_portal_cache 预热
+    'portal': {
+        'BACKEND': os.getenv('DJANGO_PORTAL_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('DJANGO_PORTAL_CACHE_LOCATION', str(BASE_DIR / 'django_cache' / 'portal')),
+        'TIMEOUT': 6 * 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -136,13 +202,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # 安装 orjson 时用其编码 JSON；安装 msgpack 时可通过 Accept: application/msgpack 获取 MessagePack
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.FastJSONRenderer',
+        *(['core.renderers.MessagePackRenderer'] if importlib.util.find_spec('msgpack') else []),
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
+    # 学生门户令牌桶限流速率（桶容量/补充周期），见 core.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        'portal_ip': os.getenv('PORTAL_IP_THROTTLE_RATE', '30/min'),
+        'portal_global': os.getenv('PORTAL_GLOBAL_THROTTLE_RATE', '200/s'),
+    },
+}
+
+# 每个工作进程内允许同时处理的门户请求数，超过时直接返回 503（0 表示不限制）
+CONCURRENCY_LIMITS = {
+    'portal': int(os.getenv('PORTAL_CONCURRENCY_LIMIT', '16')),
 }
+# 并发超限时建议客户端重试的等待秒数（Retry-After）
+CONCURRENCY_RETRY_AFTER = 1
 
 # CORS settings for frontend integration
 CORS_ALLOWED_ORIGINS = [
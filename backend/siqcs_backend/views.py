@@ -14,7 +14,11 @@ def api_root(request):
                 'list': '/api/students/',
                 'detail': '/api/students/{id}/',
                 'statistics': '/api/students/statistics/',
+                'distributions': '/api/students/distributions/',
+                'batch_statistics': '/api/students/batch_statistics/',
+                'completion_timeseries': '/api/students/completion_timeseries/',
                 'bulk_create': '/api/students/bulk_create/',
+                'export': '/api/students/export/',
                 'student_groups': '/api/students/{id}/groups/'
             },
             'groups': {
@@ -30,6 +34,9 @@ def api_root(request):
                 'detail': '/api/assignments/{id}/',
                 'bulk_assign': '/api/assignments/bulk_assign/'
             },
+            'tombstones': {
+                'list': '/api/tombstones/'
+            },
             'admin': '/admin/'
         }
     })
@@ -41,19 +41,29 @@ const GroupStudentsModal: React.FC<GroupStudentsModalProps> = ({
 }) => {
   const [groupData, setGroupData] = useState<GroupStudentList | null>(null);
   const [loading, setLoading] = useState(false);
+  // 分页状态记录所属分组，切换分组时回到第一页
+  const [pagination, setPagination] = useState({ groupId, current: 1, pageSize: 10 });
   const [addingStudent, setAddingStudent] = useState(false);
   const [availableStudents, setAvailableStudents] = useState<StudentListItem[]>([]);
   const [searchLoading, setSearchLoading] = useState(false);
   const [selectedStudentId, setSelectedStudentId] = useState<number | null>(null);
   const [remarks, setRemarks] = useState('');
 
+  // 在渲染阶段重置页码（React 会在执行副作用前用新状态重新渲染），切换分组时只按第一页请求一次
+  if (pagination.groupId !== groupId) {
+    setPagination(prev => ({ ...prev, groupId, current: 1 }));
+  }
+
   // 加载分组学生数据
   const loadGroupData = useCallback(async () => {
     if (!groupId || !visible) return;
     
     setLoading(true);
     try {
-      const data = await GroupService.getGroupStudents(groupId);
+      const data = await GroupService.getGroupStudents(groupId, {
+        page: pagination.current,
+        page_size: pagination.pageSize,
+      });
       setGroupData(data);
     } catch (error) {
       message.error('加载分组学生数据失败');
@@ -61,7 +71,7 @@ const GroupStudentsModal: React.FC<GroupStudentsModalProps> = ({
     } finally {
       setLoading(false);
     }
-  }, [groupId, visible]);
+  }, [groupId, visible, pagination.current, pagination.pageSize]);
 
   // 搜索可分配的学生
   const searchAvailableStudents = async (searchText: string) => {
@@ -121,7 +131,12 @@ const GroupStudentsModal: React.FC<GroupStudentsModalProps> = ({
     try {
       await GroupService.removeStudent(groupId, studentId);
       message.success('学生已从分组中移除');
-      loadGroupData();
+      // 移除的是当前页最后一条时回到上一页
+      if (groupData?.results.length === 1 && pagination.current > 1) {
+        setPagination(prev => ({ ...prev, current: prev.current - 1 }));
+      } else {
+        loadGroupData();
+      }
       onStudentChange();
     } catch (error: any) {
       message.error(error?.response?.data?.error || '移除失败');
@@ -215,7 +230,7 @@ const GroupStudentsModal: React.FC<GroupStudentsModalProps> = ({
 
   return (
     <Modal
-      title={groupData ? `分组学生管理 - ${groupData.group_name}` : '分组学生管理'}
+      title={groupData ? `分组学生管理 - ${groupData.group.group_name}` : '分组学生管理'}
       open={visible}
       onCancel={onCancel}
       footer={null}
@@ -228,16 +243,16 @@ const GroupStudentsModal: React.FC<GroupStudentsModalProps> = ({
           <Card size="small" style={{ marginBottom: 16 }}>
             <Row gutter={[16, 8]}>
               <Col span={8}>
-                <Text strong>分组教师:</Text> {groupData.group_teacher}
+                <Text strong>分组教师:</Text> {groupData.group.group_teacher}
               </Col>
               <Col span={8}>
-                <Text strong>联系方式:</Text> {groupData.teacher_phone}
+                <Text strong>联系方式:</Text> {groupData.group.teacher_phone}
               </Col>
               <Col span={8}>
-                <Text strong>学生人数:</Text> {groupData.students.length} 人
+                <Text strong>学生人数:</Text> {groupData.count} 人
               </Col>
               <Col span={24}>
-                <Text strong>报到地点:</Text> {groupData.report_location}
+                <Text strong>报到地点:</Text> {groupData.group.report_location}
               </Col>
             </Row>
           </Card>
@@ -297,11 +312,14 @@ const GroupStudentsModal: React.FC<GroupStudentsModalProps> = ({
           {/* 学生列表 */}
           <Table
             columns={columns}
-            dataSource={groupData.students}
+            dataSource={groupData.results}
             rowKey="assignment_id"
             loading={loading}
             pagination={{
-              pageSize: 10,
+              current: pagination.current,
+              pageSize: pagination.pageSize,
+              total: groupData.count,
+              onChange: (current, pageSize) => setPagination(prev => ({ ...prev, current, pageSize })),
               showSizeChanger: true,
               showQuickJumper: true,
               showTotal: (total, range) =>
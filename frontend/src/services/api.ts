@@ -12,6 +12,7 @@ import {
   GroupStatistics,
   GroupStudentList,
   StudentGroupAssignment,
+  BulkAssignResult,
   PreviewResult,
   DeleteResponse,
   ImportBatchesResponse,
@@ -287,9 +288,9 @@ export const GroupService = {
     return api.get('/groups/statistics/').then(res => res.data);
   },
 
-  // 获取分组中的学生列表
-  getGroupStudents: (groupId: number): Promise<GroupStudentList> => {
-    return api.get(`/groups/${groupId}/students/`).then(res => res.data);
+  // 获取分组中的学生列表（分页）
+  getGroupStudents: (groupId: number, params?: { page?: number; page_size?: number }): Promise<GroupStudentList> => {
+    return api.get(`/groups/${groupId}/students/`, { params }).then(res => res.data);
   },
 
   // 为分组分配学生
@@ -390,13 +391,14 @@ export const AssignmentService = {
     return api.get(`/assignments/?${searchParams.toString()}`).then(res => res.data);
   },
 
-  // 批量分配学生
+  // 批量分配学生（partialSuccess 为 true 时跳过有错误的条目，其余照常分配）
   bulkAssign: (assignments: Array<{
     student: number;
     group_info: number;
     remarks?: string;
-  }>): Promise<StudentGroupAssignment[]> => {
-    return api.post('/assignments/bulk_assign/', assignments).then(res => res.data);
+  }>, partialSuccess?: boolean): Promise<BulkAssignResult> => {
+    const query = partialSuccess ? '?partial_success=1' : '';
+    return api.post(`/assignments/bulk_assign/${query}`, assignments).then(res => res.data);
   },
 };
 
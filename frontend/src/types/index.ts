@@ -216,6 +216,30 @@ export interface StudentGroupAssignment {
   remarks: string;
 }
 
+// 批量接口中单个条目的错误（index 为条目在提交列表中的位置）
+export interface BulkItemError {
+  index: number;
+  errors: Record<string, string[]>;
+}
+
+// 批量分配返回的分配记录（紧凑格式，不嵌套学生及分组信息）
+export interface BulkAssignedItem {
+  id: number;
+  student: number;
+  group_info: number;
+  assigned_at: string;
+  remarks: string;
+}
+
+// 批量分配结果类型
+export interface BulkAssignResult {
+  created_count: number;
+  reactivated_count: number;
+  error_count: number;
+  assignments: BulkAssignedItem[];
+  errors: BulkItemError[];
+}
+
 // 分组统计信息类型
 export interface GroupStatistics {
   total_groups: number;
@@ -229,19 +253,17 @@ export interface GroupStatistics {
   }>;
 }
 
-// 分组学生列表类型
-export interface GroupStudentList {
-  id: number;
-  group_name: string;
-  group_teacher: string;
-  teacher_phone: string;
-  report_location: string;
-  students: Array<{
-    assignment_id: number;
-    student: StudentListItem;
-    assigned_at: string;
-    remarks: string;
-  }>;
+// 分组名单条目类型
+export interface GroupRosterEntry {
+  assignment_id: number;
+  student: StudentListItem;
+  assigned_at: string;
+  remarks: string;
+}
+
+// 分组学生列表类型（分页返回，group 为分组信息）
+export interface GroupStudentList extends ApiResponse<GroupRosterEntry> {
+  group: GroupInfo;
 }
 
 // 分组过滤器类型